@@ -0,0 +1,130 @@
+"""Login flood with and without admission control.
+
+    python -m benchmarks.bench_admission --attackers 64 --seconds 10
+
+`--attackers` clients send wrong-password logins for seeded users as fast as
+they can, backing off for Retry-After on a 503 (a credential-stuffing wave:
+every attempt that gets in costs one verify) while
+a probe client fetches /users/my-profile and / every `--probe-interval-ms`.
+Reports login latency for attempts that were served and for attempts shed
+with 503, and the probe's latency. Each mode runs in its own process
+(ADMISSION_ENABLED is read at import time).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from benchmarks.common import ROOT, bootstrap_env, prepare_app_database, summarize
+
+PASSWORD = "admission-pass"
+
+
+def _seed(db_path: str, users: int, rounds: int):
+    import bcrypt
+
+    hashed = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds=rounds)).decode()
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO users (full_name, user_name, email, password, role, is_active, time_registered, email_verified)"
+        " VALUES (?, ?, ?, ?, 'USER', 1, '2025-01-01 00:00:00', 1)",
+        ((f"Seed {i}", f"seed{i}", f"seed{i}@example.com", hashed) for i in range(users)),
+    )
+    conn.commit()
+    conn.close()
+
+
+async def _run(args) -> dict:
+    import httpx
+    import main
+
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    login_times = {"served": [], "shed": []}
+    probe_times = []
+    statuses = Counter()
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as probe:
+            response = await probe.post("/users/login", json={"user_name": "seed0", "password": PASSWORD})
+            response.raise_for_status()
+            deadline = time.perf_counter() + args.seconds
+
+            async def attacker(n: int):
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+                    i = n
+                    while time.perf_counter() < deadline:
+                        started = time.perf_counter()
+                        response = await client.post(
+                            "/users/login", json={"user_name": f"seed{i % args.users}", "password": "wrong-password"}
+                        )
+                        elapsed = time.perf_counter() - started
+                        statuses[response.status_code] += 1
+                        login_times["shed" if response.status_code == 503 else "served"].append(elapsed)
+                        if response.status_code == 503:
+                            #Clients share this process's event loop, so one that ignored
+                            #Retry-After would measure the client spinning, not the server
+                            await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+                        i += args.attackers
+
+            async def prober():
+                while time.perf_counter() < deadline:
+                    for path in ("/users/my-profile", "/"):
+                        started = time.perf_counter()
+                        (await probe.get(path)).raise_for_status()
+                        probe_times.append(time.perf_counter() - started)
+                    await asyncio.sleep(args.probe_interval_ms / 1000)
+
+            started = time.perf_counter()
+            await asyncio.gather(prober(), *(attacker(n) for n in range(args.attackers)))
+            elapsed = time.perf_counter() - started
+
+    return {
+        "login_served": summarize(login_times["served"]),
+        "login_shed": summarize(login_times["shed"]),
+        "served_per_s": round(len(login_times["served"]) / elapsed, 1),
+        "probe": summarize(probe_times),
+        "status_counts": {str(status): n for status, n in sorted(statuses.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--attackers", type=int, default=64, help="Concurrent flooding clients")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--bcrypt-rounds", type=int, default=10, help="Hash cost of the seeded users")
+    parser.add_argument("--probe-interval-ms", type=int, default=50)
+    parser.add_argument("--modes", default="false,true", help="Comma separated ADMISSION_ENABLED values")
+    parser.add_argument("--child", choices=("true", "false"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        db_path = bootstrap_env(
+            "admission.db", ADMISSION_ENABLED=args.child, RATE_LIMIT_ENABLED="false",
+            PASSWORD_SCHEME="bcrypt", PASSWORD_HASH_COST=args.bcrypt_rounds,
+        )
+        prepare_app_database()
+        _seed(db_path, args.users, args.bcrypt_rounds)
+        print(json.dumps(asyncio.run(_run(args))))
+        return
+
+    forwarded = []
+    for name in ("attackers", "seconds", "users", "bcrypt_rounds", "probe_interval_ms"):
+        forwarded += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+    print(f"{'admission':<10} {'served/s':>8} {'served p50':>10} {'p99 ms':>8} {'shed':>6} {'shed p99':>8}"
+          f" {'probe p50':>9} {'p99 ms':>8}  statuses")
+    for mode in args.modes.split(","):
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_admission", "--child", mode, *forwarded],
+                             cwd=ROOT, env=dict(os.environ), capture_output=True, text=True, check=True)
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{'on' if mode == 'true' else 'off':<10} {r['served_per_s']:>8} {r['login_served']['p50_ms']:>10}"
+              f" {r['login_served']['p99_ms']:>8} {r['login_shed']['count']:>6} {r['login_shed']['p99_ms']:>8}"
+              f" {r['probe']['p50_ms']:>9} {r['probe']['p99_ms']:>8}  {r['status_counts']}")
+
+
+if __name__ == "__main__":
+    main()
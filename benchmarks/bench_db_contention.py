@@ -0,0 +1,137 @@
+"""Parallel register/login/verify traffic against one SQLite file.
+
+    python -m benchmarks.bench_db_contention --profiles default,production --workers 4
+
+Every worker is a separate process running the app in-process, the same way
+`uvicorn --workers N` shares one users.db. `default` is the stock engine
+(rollback journal, no busy_timeout); `production` is the tuned DB_PROFILE.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import ROOT, bootstrap_env, prepare_app_database, summarize
+
+PASSWORD = "contention-pass"
+
+
+def _seed(users: int):
+    import bcrypt
+    from database.database_setup import SessionLocal
+    from models.user_model import User
+
+    prepare_app_database()
+
+    #Low-cost salts keep seeding fast and logins DB-bound rather than CPU-bound
+    with SessionLocal() as db:
+        db.add_all([
+            User(full_name=f"Seed {i}", user_name=f"seed{i}", email=f"seed{i}@example.com",
+                 password=bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds=4)).decode(),
+                 email_verified=True)
+            for i in range(users)
+        ])
+        db.commit()
+
+
+async def _run(worker: int, ops: int, concurrency: int, users: int) -> dict:
+    import httpx
+    import main
+    from config import limiter
+    from routes import user_registration
+    from security_utilities.email_verification import create_email_token
+
+    limiter.enabled = False
+
+    #Stub the outbox: only the user rows themselves contend
+    user_registration.queue_email = lambda *args, **kwargs: None
+
+    timings = {"register": [], "login": [], "verify": []}
+    errors = {"register": 0, "login": 0, "verify": 0}
+    counter = iter(range(ops))
+
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def one(i: int):
+            kind = ("register", "login", "verify")[i % 3]
+            seed = (worker * ops + i) % users
+            started = time.perf_counter()
+            if kind == "register":
+                resp = await client.post("/users/register", json={
+                    "full_name": f"W{worker} {i}",
+                    "user_name": f"w{worker}u{i}",
+                    "email": f"w{worker}u{i}@example.com",
+                    "password": PASSWORD,
+                })
+            elif kind == "login":
+                resp = await client.post("/users/login", json={"user_name": f"seed{seed}", "password": PASSWORD})
+            else:
+                resp = await client.get("/users/verify", params={"token": create_email_token(f"seed{seed}@example.com")})
+            timings[kind].append(time.perf_counter() - started)
+            if resp.status_code >= 500:
+                errors[kind] += 1
+
+        async def loop():
+            for i in counter:
+                await one(i)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(loop() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {"elapsed_s": elapsed, "timings": timings, "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", default="default,production")
+    parser.add_argument("--workers", type=int, default=4, help="Processes sharing the database")
+    parser.add_argument("--ops", type=int, default=30, help="Requests per worker")
+    parser.add_argument("--concurrency", type=int, default=4, help="In-flight requests per worker")
+    parser.add_argument("--users", type=int, default=200, help="Pre-seeded verified users")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--seed", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--db-path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.seed or args.child is not None:
+        #Registrations hash at the seeded cost too, and logins find nothing to rehash
+        bootstrap_env(db_path=args.db_path, PASSWORD_HASH_COST=4, ADMISSION_ENABLED="false")
+        if args.seed:
+            _seed(args.users)
+        else:
+            result = asyncio.run(_run(args.child, args.ops, args.concurrency, args.users))
+            print(json.dumps(result))
+        return
+
+    base = [sys.executable, "-m", "benchmarks.bench_db_contention",
+            "--ops", str(args.ops), "--concurrency", str(args.concurrency), "--users", str(args.users)]
+    print(f"{'profile':<11} {'op':<9} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p99 ms':>9} {'ops/s':>7}")
+    for profile in args.profiles.split(","):
+        env = dict(os.environ, DB_PROFILE=profile)
+        db_path = os.path.join(tempfile.mkdtemp(prefix="bench-"), "contention.db")
+        subprocess.run(base + ["--seed", "--db-path", db_path], cwd=ROOT, env=env, check=True, capture_output=True)
+
+        procs = [
+            subprocess.Popen(base + ["--child", str(w), "--db-path", db_path],
+                             cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True)
+            for w in range(args.workers)
+        ]
+        results = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procs]
+        wall = max(r["elapsed_s"] for r in results)
+
+        for kind in ("register", "login", "verify"):
+            samples = [t for r in results for t in r["timings"][kind]]
+            failed = sum(r["errors"][kind] for r in results)
+            stats = summarize(samples)
+            print(f"{profile:<11} {kind:<9} {stats['count']:>6} {failed:>6} {stats['p50_ms']:>9}"
+                  f" {stats['p99_ms']:>9} {len(samples) / wall:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
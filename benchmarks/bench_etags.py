@@ -0,0 +1,74 @@
+"""Polling cost with and without If-None-Match on the user resources.
+
+    python -m benchmarks.bench_etags --rows 10000 --requests 500
+
+Seeds `--rows` users, logs in as the admin, then polls each resource
+`--requests` times, first unconditionally (200 with the full body) and then
+with the ETag from the first answer (304, empty body):
+
+    my-profile      GET /users/my-profile, served from the principal cache
+    admin-user      GET /admin/users/{email}
+    admin-list      GET /admin/users?limit=100
+
+Reports latency and bytes sent per poll for both.
+"""
+import argparse
+import asyncio
+import sqlite3
+import time
+
+from benchmarks.common import bootstrap_env, prepare_app_database, summarize
+
+
+def _seed(db_path: str, rows: int):
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO users (full_name, user_name, email, password, role, is_active, time_registered, email_verified)"
+        " VALUES (?, ?, ?, 'x', 'USER', 1, ?, 1)",
+        ((f"User {i}", f"user{i}", f"user{i}@example.com", f"2025-01-01 00:00:00.{i:06d}") for i in range(rows)),
+    )
+    conn.commit()
+    conn.close()
+
+
+async def _run(args):
+    import httpx
+    import main
+
+    resources = {
+        "my-profile": ("/users/my-profile", None),
+        "admin-user": ("/admin/users/user1@example.com", None),
+        "admin-list": ("/admin/users", {"limit": 100}),
+    }
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            (await client.post("/users/login", json={"user_name": "admin", "password": "AdminPass123"})).raise_for_status()
+            print(f"{'resource':<11} {'mode':<6} {'status':>6} {'bytes':>7} {'p50 ms':>7} {'p99 ms':>7}")
+            for name, (path, params) in resources.items():
+                etag = (await client.get(path, params=params)).headers["etag"]
+                for mode, headers in (("full", {}), ("etag", {"If-None-Match": etag})):
+                    times = []
+                    for _ in range(args.requests):
+                        started = time.perf_counter()
+                        response = await client.get(path, params=params, headers=headers)
+                        times.append(time.perf_counter() - started)
+                    stats = summarize(times)
+                    print(f"{name:<11} {mode:<6} {response.status_code:>6} {len(response.content):>7}"
+                          f" {stats['p50_ms']:>7} {stats['p99_ms']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    db_path = bootstrap_env(RATE_LIMIT_ENABLED="false", PASSWORD_HASH_COST=4, UNVERIFIED_PURGE_ENABLED="false")
+    prepare_app_database()
+    _seed(db_path, args.rows)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Stream the admin user export over a large synthetic directory.
+
+    python -m benchmarks.bench_export --users 1000000 --format ndjson
+
+Seeds `--users` rows with raw sqlite3 executemany, then drains
+GET /admin/users/export through the in-process ASGI app and reports
+rows/s, bytes and peak RSS growth during the export.
+
+RSS also counts SQLite's memory-mapped database pages (SQLITE_MMAP_SIZE);
+run with SQLITE_MMAP_SIZE=0 to see only the exporter's own memory.
+"""
+import argparse
+import asyncio
+import resource
+import sqlite3
+import time
+
+from benchmarks.common import bootstrap_env, prepare_app_database
+
+
+def _seed(db_path: str, users: int):
+    conn = sqlite3.connect(db_path)
+    rows = (
+        (f"User {i}", f"user{i}", f"user{i}@example.com", f"$2b$12$synthetic{i:022d}",
+         ("USER", "ANONYMOUS_USER")[i % 2], i % 7 != 0, "2025-01-01 00:00:00.000000", i % 3 != 0)
+        for i in range(users)
+    )
+    conn.executemany(
+        "INSERT INTO users (full_name, user_name, email, password, role, is_active, time_registered, email_verified)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.commit()
+    conn.close()
+
+
+def _rss_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def _export(params: dict) -> tuple[int, int, float]:
+    """Drive the ASGI app directly; httpx's ASGITransport buffers whole bodies, hiding streaming."""
+    from urllib.parse import urlencode
+    import main
+    from security_utilities.auth import create_access_token
+    from security_utilities.revocation import new_token_id
+
+    token = create_access_token({"sub": "admin@example.com", "role": "admin", "fam": new_token_id()})
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/admin/users/export", "raw_path": b"/admin/users/export",
+        "root_path": "", "query_string": urlencode(params).encode(), "server": ("bench", 80),
+        "client": ("127.0.0.1", 1234), "headers": [(b"host", b"bench"), (b"cookie", f"access_token={token}".encode())],
+    }
+    counts = {"lines": 0, "bytes": 0, "status": None}
+    request_sent = False
+    never = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        #The client never disconnects; block like a real server would
+        await never.wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            counts["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            counts["bytes"] += len(body)
+            counts["lines"] += body.count(b"\n")
+
+    started = time.perf_counter()
+    await main.app(scope, receive, send)
+    if counts["status"] != 200:
+        raise RuntimeError(f"export returned {counts['status']}")
+    return counts["lines"], counts["bytes"], time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    parser.add_argument("--columns", default=None)
+    args = parser.parse_args()
+
+    db_path = bootstrap_env()
+    prepare_app_database()
+
+    started = time.perf_counter()
+    _seed(db_path, args.users)
+    print(f"seeded {args.users} users in {time.perf_counter() - started:.1f}s")
+
+    params = {"format": args.format}
+    if args.columns:
+        params["columns"] = args.columns
+    rss_before = _rss_mib()
+    lines, size, elapsed = asyncio.run(_export(params))
+    print(f"exported {lines} lines, {size / 2**20:.1f} MiB in {elapsed:.1f}s "
+          f"({lines / elapsed:,.0f} rows/s, {size / 2**20 / elapsed:.1f} MiB/s)")
+    print(f"peak RSS {_rss_mib():.0f} MiB (+{_rss_mib() - rss_before:.0f} MiB during export)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Register latency and event-loop responsiveness with and without the hashing pool.
+
+    python -m benchmarks.bench_hashing --modes inline,thread,process --requests 40
+
+Each mode runs in its own interpreter (HASH_EXECUTOR is read at import time).
+`inline` is the old behaviour: bcrypt on the event loop.
+
+The app is served by uvicorn on the interpreter's main thread. Registrations
+and the GET / probes come from a separate thread with its own event loop and
+connections, so a stalled server loop shows up in the probe latency instead
+of stalling the probe with it.
+"""
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.common import ROOT, bootstrap_env, prepare_app_database, summarize
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _drive(base_url: str, requests: int, concurrency: int) -> dict:
+    import httpx
+
+    register_times = []
+    health_times = []
+    counter = iter(range(requests))
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client, \
+            httpx.AsyncClient(base_url=base_url, timeout=120) as probe:
+
+        async def register_worker():
+            for i in counter:
+                started = time.perf_counter()
+                resp = await client.post("/users/register", json={
+                    "full_name": f"Bench {i}",
+                    "user_name": f"bench{i}",
+                    "email": f"bench{i}@example.com",
+                    "password": f"password-{i}",
+                })
+                resp.raise_for_status()
+                register_times.append(time.perf_counter() - started)
+
+        async def health_worker():
+            while not done.is_set():
+                started = time.perf_counter()
+                await probe.get("/")
+                health_times.append(time.perf_counter() - started)
+                await asyncio.sleep(0)
+
+        health = [asyncio.create_task(health_worker()) for _ in range(4)]
+        started = time.perf_counter()
+        await asyncio.gather(*(register_worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await asyncio.gather(*health)
+
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "register": summarize(register_times),
+        "register_per_s": round(len(register_times) / elapsed, 1),
+        "health": summarize(health_times),
+        "health_per_s": round(len(health_times) / elapsed, 1),
+    }
+
+
+def _run(requests: int, concurrency: int) -> dict:
+    import uvicorn
+    import main
+    from config import limiter
+    from routes import user_registration
+
+    prepare_app_database()
+    limiter.enabled = False
+
+    # Keep the outbox insert out of the measurement
+    user_registration.queue_email = lambda *args, **kwargs: None
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    outcome = {}
+
+    def client_thread():
+        try:
+            while not server.started:
+                time.sleep(0.05)
+            outcome["result"] = asyncio.run(_drive(f"http://127.0.0.1:{port}", requests, concurrency))
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            server.should_exit = True
+
+    driver = threading.Thread(target=client_thread, daemon=True)
+    driver.start()
+    server.run()
+    driver.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="inline,thread", help="Comma separated HASH_EXECUTOR values")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        #Admission control would shed the concurrent registrations this measures
+        bootstrap_env(HASH_EXECUTOR=args.child, ADMISSION_ENABLED="false")
+        result = _run(args.requests, args.concurrency)
+        print(json.dumps(result))
+        return
+
+    results = {}
+    for mode in args.modes.split(","):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_hashing", "--child", mode,
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    print(f"{'mode':<8} {'reg p50':>9} {'reg p99':>9} {'reg/s':>7} {'/ p99':>9} {'/ per s':>9}")
+    for mode, r in results.items():
+        print(f"{mode:<8} {r['register']['p50_ms']:>9} {r['register']['p99_ms']:>9} {r['register_per_s']:>7}"
+              f" {r['health']['p99_ms']:>9} {r['health_per_s']:>9}")
+
+
+if __name__ == "__main__":
+    main()
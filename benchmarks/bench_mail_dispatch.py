@@ -0,0 +1,89 @@
+"""Sign-up burst delivery against a local aiosmtpd sink.
+
+    python -m benchmarks.bench_mail_dispatch --emails 200
+
+`legacy` builds a Jinja environment and a FastMail client per email (the old
+email_service behaviour); `dispatcher` renders with the cached templates and
+sends `--batch-size` messages per MailDispatcher.send_batch, as the outbox
+worker does per drained batch. Reports wall time and how many SMTP
+connections the sink accepted.
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import bootstrap_env
+
+
+class SinkHandler:
+    def __init__(self):
+        self.messages = 0
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        self.sessions.add(id(session))
+        return "250 Message accepted for delivery"
+
+
+async def _legacy(config, emails: int):
+    from fastapi_mail import FastMail, MessageSchema
+    from jinja2 import Environment, FileSystemLoader
+
+    async def send(i):
+        env = Environment(loader=FileSystemLoader("templates"))
+        template = env.get_template("email_templates/verify_account.html")
+        body = template.render(email=f"u{i}@example.com", verification_link="http://x/verify?token=t")
+        message = MessageSchema(subject="Verify", recipients=[f"u{i}@example.com"], body=body, subtype="html")
+        await FastMail(config).send_message(message)
+
+    await asyncio.gather(*(send(i) for i in range(emails)))
+
+
+async def _dispatcher(config, emails: int, batch_size: int):
+    from services import email_service
+    from services.mail_dispatcher import MailDispatcher
+
+    dispatcher = MailDispatcher(config=config)
+    email_service.warm_templates()
+    for start in range(0, emails, batch_size):
+        messages = [email_service.render_verification_email(f"u{i}@example.com", "t")
+                    for i in range(start, min(start + batch_size, emails))]
+        await dispatcher.send_batch(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=50, help="Messages per send_batch (OUTBOX_BATCH_SIZE)")
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    bootstrap_env()
+    from aiosmtpd.controller import Controller
+    from config import mail_config
+
+    config = mail_config.model_copy(update={"MAIL_SERVER": "127.0.0.1", "MAIL_PORT": args.port})
+
+    results = {}
+    for name in ("legacy", "dispatcher"):
+        handler = SinkHandler()
+        controller = Controller(handler, hostname="127.0.0.1", port=args.port)
+        controller.start()
+        try:
+            started = time.perf_counter()
+            if name == "legacy":
+                asyncio.run(_legacy(config, args.emails))
+            else:
+                asyncio.run(_dispatcher(config, args.emails, args.batch_size))
+            results[name] = (time.perf_counter() - started, handler.messages, len(handler.sessions))
+        finally:
+            controller.stop()
+
+    print(f"{'mode':<11} {'emails':>7} {'connections':>12} {'seconds':>8} {'emails/s':>9}")
+    for name, (elapsed, messages, sessions) in results.items():
+        print(f"{name:<11} {messages:>7} {sessions:>12} {elapsed:>8.2f} {messages / elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Cost of the metrics layer: one histogram observation and a whole request.
+
+    python -m benchmarks.bench_metrics --requests 5000
+
+Request overhead compares GET / through the in-process app with
+METRICS_ENABLED on and off. Each mode runs in its own process, because the
+middleware is installed at import time.
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+
+from benchmarks.common import ROOT, bootstrap_env
+
+
+async def _requests(count: int) -> float:
+    import httpx
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(200):
+            await client.get("/")
+        started = time.perf_counter()
+        for _ in range(count):
+            await client.get("/")
+        return (time.perf_counter() - started) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--observations", type=int, default=200000)
+    parser.add_argument("--child", choices=("true", "false"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        bootstrap_env(METRICS_ENABLED=args.child)
+        print(json.dumps(asyncio.run(_requests(args.requests))))
+        return
+
+    bootstrap_env()
+    from services.metrics import http_request_seconds
+
+    started = time.perf_counter()
+    for i in range(args.observations):
+        http_request_seconds.observe(0.003, "GET", "/bench", "200")
+    observe_s = (time.perf_counter() - started) / args.observations
+    print(f"observe(): {observe_s * 1e9:.0f} ns")
+
+    per_request = {}
+    for enabled in ("false", "true"):
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_metrics", "--child", enabled,
+                              "--requests", str(args.requests)], cwd=ROOT, capture_output=True, text=True, check=True)
+        per_request[enabled] = json.loads(out.stdout.strip().splitlines()[-1])
+    print(f"GET /: {per_request['false'] * 1e6:.0f} us without metrics, {per_request['true'] * 1e6:.0f} us with "
+          f"(+{(per_request['true'] - per_request['false']) * 1e6:.0f} us)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""OFFSET vs keyset paging of /admin/users at increasing depth.
+
+    python -m benchmarks.bench_pagination --users 500000 --page-size 100
+
+Seeds `--users` rows, then times fetching page N both ways: the old
+`select(User).offset(N * size).limit(size)` and `build_page_query` resumed
+from the cursor of page N - 1. Keyset cost should stay flat as N grows.
+"""
+import argparse
+import asyncio
+import sqlite3
+import time
+
+from benchmarks.common import bootstrap_env, prepare_app_database
+
+
+def _seed(db_path: str, users: int):
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO users (full_name, user_name, email, password, role, is_active, time_registered, email_verified)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        ((f"User {i}", f"user{i}", f"user{i}@example.com", "x", ("USER", "ANONYMOUS_USER")[i % 2],
+          i % 7 != 0, f"2025-01-01 00:00:{i % 60:02d}.{i % 1000000:06d}", i % 3 != 0) for i in range(users)),
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+async def _time(db, query, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        (await db.execute(query)).all()
+    return (time.perf_counter() - started) / repeat
+
+
+async def _run(users: int, size: int, repeat: int):
+    from sqlalchemy import func, select
+    from database.database_setup import ReadSessionLocal
+    from models.user_model import User
+    from services.user_directory import approximate_total, build_page_query, encode_cursor
+
+    pages = [p for p in (1, 10, 100, 1000, 5000, users // size - 1) if p * size < users]
+    print(f"{'page':>6} {'offset ms':>10} {'keyset ms':>10}")
+    async with ReadSessionLocal() as db:
+        for page in pages:
+            #Cursor for page N is the last id of page N - 1
+            last = (await db.execute(select(User.id).order_by(User.id).offset(page * size - 1).limit(1))).one()
+            cursor = encode_cursor("id", False, last)
+            offset_query = select(User).order_by(User.id).offset(page * size).limit(size)
+            keyset_query = build_page_query(size, cursor=cursor)
+            offset_s = await _time(db, offset_query, repeat)
+            keyset_s = await _time(db, keyset_query, repeat)
+            print(f"{page:>6} {offset_s * 1000:>10.2f} {keyset_s * 1000:>10.2f}")
+
+        started = time.perf_counter()
+        (await db.execute(select(func.count()).select_from(User))).scalar()
+        exact = time.perf_counter() - started
+        started = time.perf_counter()
+        estimate = await approximate_total(db)
+        print(f"COUNT(*) {exact * 1000:.2f} ms, approximate_total {estimate} in "
+              f"{(time.perf_counter() - started) * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    db_path = bootstrap_env()
+    prepare_app_database()
+
+    _seed(db_path, args.users)
+    asyncio.run(_run(args.users, args.page_size, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Per-check cost and cross-process accuracy of rate limit storages.
+
+    python -m benchmarks.bench_rate_limit --checks 20000 --processes 4
+    python -m benchmarks.bench_rate_limit --redis-url redis://127.0.0.1:6379
+
+Overhead: time per sliding-window-counter hit() on one key set.
+Accuracy: `--processes` workers hammer one key limited to `--limit`/minute;
+a correct shared backend admits exactly `--limit` hits in total.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import ROOT, bootstrap_env
+
+
+def _limiter(uri: str):
+    import security_utilities.rate_limit_storage  # noqa: F401  registers shm://
+    from limits.storage import storage_from_string
+    from limits.strategies import SlidingWindowCounterRateLimiter
+
+    storage = storage_from_string(uri)
+    return storage, SlidingWindowCounterRateLimiter(storage)
+
+
+def _overhead(uri: str, checks: int, keys: int) -> float:
+    from limits import parse
+
+    storage, limiter = _limiter(uri)
+    item = parse(f"{checks * 10}/minute")
+    storage.reset()
+    started = time.perf_counter()
+    for i in range(checks):
+        limiter.hit(item, f"10.0.{i % keys // 256}.{i % 256}")
+    return (time.perf_counter() - started) / checks
+
+
+def _hammer(uri: str, limit: int, attempts: int) -> int:
+    from limits import parse
+
+    _, limiter = _limiter(uri)
+    item = parse(f"{limit}/minute")
+    return sum(limiter.hit(item, "203.0.113.7") for _ in range(attempts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checks", type=int, default=20000)
+    parser.add_argument("--keys", type=int, default=1000, help="Distinct client IPs in the overhead run")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--redis-url", help="Also measure a Redis-protocol server")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    bootstrap_env()
+    if args.child:
+        print(json.dumps(_hammer(args.child, args.limit, args.limit * 3)))
+        return
+
+    backends = {
+        "memory": "memory://",
+        "shm": f"shm://{os.path.join(tempfile.mkdtemp(prefix='bench-'), 'ratelimit.bin')}",
+    }
+    if args.redis_url:
+        backends["redis"] = args.redis_url
+
+    print(f"{'backend':<8} {'us/check':>9} {'admitted':>9} {'expected':>9}")
+    for name, uri in backends.items():
+        per_check = _overhead(uri, args.checks, args.keys)
+        _limiter(uri)[0].reset()
+        procs = [
+            subprocess.Popen([sys.executable, "-m", "benchmarks.bench_rate_limit", "--child", uri,
+                              "--limit", str(args.limit)], cwd=ROOT, stdout=subprocess.PIPE, text=True)
+            for _ in range(args.processes)
+        ]
+        admitted = sum(json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procs)
+        print(f"{name:<8} {per_check * 1e6:>9.2f} {admitted:>9} {args.limit:>9}")
+
+
+if __name__ == "__main__":
+    main()
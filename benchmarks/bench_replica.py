@@ -0,0 +1,168 @@
+"""Admin read throughput during write bursts: primary versus a snapshot replica.
+
+    python -m benchmarks.bench_replica --users 50000 --readers 8 --seconds 10
+
+A writer process commits bursts of `--burst-rows` registrations into the
+primary file, one transaction per burst, every `--burst-pause-ms`, as the
+sign-up workers of a busy deployment do. Meanwhile `--readers` admin clients
+page through GET /admin/users (keyset listing plus get_current_user) and
+GET /admin/users/{email}. Each mode runs in its own process, since the
+replica engine is chosen at import time:
+
+    primary     no replica configured: reads use the query-only pool on the
+                primary file
+    snapshot    REPLICA_SNAPSHOT_PATH, refreshed every --refresh-seconds with
+                the backup API
+
+The admin's read pin is dropped after login, so every read goes where an
+unpinned client's would. Reports reads/s, read latency, the writer's
+commits and, for the snapshot, the copy time and refresh count.
+Try `--db-profile default` for the rollback journal, where a writer blocks
+readers outright.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import ROOT, bootstrap_env, prepare_app_database, summarize
+
+
+def _seed(db_path: str, users: int):
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO users (full_name, user_name, email, password, role, is_active, time_registered, email_verified)"
+        " VALUES (?, ?, ?, 'x', 'USER', 1, ?, ?)",
+        ((f"Seed {i}", f"seed{i}", f"seed{i}@example.com", f"2025-01-01 00:00:00.{i:06d}", i % 2)
+         for i in range(users)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _write(args):
+    """Writer process: bursts of inserts, one transaction each. Prints commits and lock hold times."""
+    conn = sqlite3.connect(args.db_path, timeout=30, isolation_level=None)
+    deadline = time.perf_counter() + args.seconds
+    holds, n = [], 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            "INSERT INTO users (full_name, user_name, email, password, role, is_active, time_registered,"
+            " email_verified) VALUES (?, ?, ?, 'x', 'USER', 1, '2025-06-01 00:00:00', 0)",
+            ((f"Burst {n + i}", f"burst{n + i}", f"burst{n + i}@example.com") for i in range(args.burst_rows)),
+        )
+        conn.execute("COMMIT")
+        holds.append(time.perf_counter() - started)
+        n += args.burst_rows
+        time.sleep(args.burst_pause_ms / 1000)
+    conn.close()
+    print(json.dumps({"commits": len(holds), "rows": n, "hold": summarize(holds)}))
+
+
+async def _read(args) -> dict:
+    import httpx
+    import main
+    from database.database_setup import READ_PIN_COOKIE
+    from database.replica import snapshot_replica
+
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    times = []
+    errors = 0
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            (await client.post("/users/login", json={"user_name": "admin", "password": "AdminPass123"})).raise_for_status()
+            client.cookies.delete(READ_PIN_COOKIE)
+            writer = subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.bench_replica", "--writer", "--db-path", args.db_path,
+                 "--seconds", str(args.seconds), "--burst-rows", str(args.burst_rows),
+                 "--burst-pause-ms", str(args.burst_pause_ms)],
+                cwd=ROOT, stdout=subprocess.PIPE, text=True,
+            )
+            deadline = time.perf_counter() + args.seconds
+
+            async def reader(n: int):
+                nonlocal errors
+                i = n
+                while time.perf_counter() < deadline:
+                    if i % 2:
+                        path, params = f"/admin/users/seed{i % args.users}@example.com", None
+                    else:
+                        path, params = "/admin/users", {"limit": 50, "verified": bool(i % 4)}
+                    started = time.perf_counter()
+                    response = await client.get(path, params=params)
+                    times.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        errors += 1
+                    i += args.readers
+
+            started = time.perf_counter()
+            await asyncio.gather(*(reader(n) for n in range(args.readers)))
+            elapsed = time.perf_counter() - started
+            written = json.loads(writer.communicate()[0].strip().splitlines()[-1])
+
+        stats = snapshot_replica.stats() if snapshot_replica else None
+    return {
+        "reads": summarize(times),
+        "reads_per_s": round(len(times) / elapsed, 1),
+        "errors": errors,
+        "writer": written,
+        "snapshot": stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--readers", type=int, default=8, help="Concurrent admin read clients")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--burst-rows", type=int, default=500, help="Rows per writer transaction")
+    parser.add_argument("--burst-pause-ms", type=int, default=20)
+    parser.add_argument("--refresh-seconds", type=float, default=2)
+    parser.add_argument("--db-profile", default="production")
+    parser.add_argument("--modes", default="primary,snapshot")
+    parser.add_argument("--child", choices=("primary", "snapshot"), help=argparse.SUPPRESS)
+    parser.add_argument("--writer", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--db-path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.writer:
+        _write(args)
+        return
+
+    if args.child:
+        overrides = dict(DB_PROFILE=args.db_profile, RATE_LIMIT_ENABLED="false", PASSWORD_HASH_COST=4,
+                         UNVERIFIED_PURGE_ENABLED="false", REPLICA_REFRESH_SECONDS=args.refresh_seconds)
+        if args.child == "snapshot":
+            overrides["REPLICA_SNAPSHOT_PATH"] = f"{args.db_path}.replica"
+        db_path = bootstrap_env(db_path=args.db_path, **overrides)
+        prepare_app_database()
+        _seed(db_path, args.users)
+        print(json.dumps(asyncio.run(_read(args))))
+        return
+
+    forwarded = []
+    for name in ("users", "readers", "seconds", "burst_rows", "burst_pause_ms", "refresh_seconds", "db_profile"):
+        forwarded += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+    print(f"{'mode':<9} {'reads/s':>8} {'p50 ms':>7} {'p99 ms':>7} {'errors':>6} {'commits':>7}"
+          f" {'hold p99':>8}  snapshot")
+    for mode in args.modes.split(","):
+        db_path = os.path.join(tempfile.mkdtemp(prefix="bench-"), "replica.db")
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_replica", "--child", mode,
+                              "--db-path", db_path, *forwarded],
+                             cwd=ROOT, env=dict(os.environ), capture_output=True, text=True, check=True)
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        snapshot = r["snapshot"]
+        detail = f"{snapshot['refreshes']} copies, last {snapshot['last_copy_ms']} ms" if snapshot else "-"
+        print(f"{mode:<9} {r['reads_per_s']:>8} {r['reads']['p50_ms']:>7} {r['reads']['p99_ms']:>7} {r['errors']:>6}"
+              f" {r['writer']['commits']:>7} {r['writer']['hold']['p99_ms']:>8}  {detail}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Import cost of the app and time from process start to first served request.
+
+    python -m benchmarks.bench_startup --runs 5 --top 15
+    python -m benchmarks.bench_startup --workers 4
+
+Import: runs `python -X importtime -c "import main"` and reports the total
+plus the slowest top-level imports by cumulative time. Importing main must
+not touch the database, so this is also the per-worker and per-test cost.
+
+First request: starts uvicorn and polls GET / until it answers. The cold
+run starts on an empty database, so migrations and the admin seed run in
+the lifespan. The warm run restarts on that database, where startup only
+does its read-only checks.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmarks.common import ROOT, bootstrap_env
+
+
+def _import_profile(env: dict) -> tuple[float, list]:
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                          cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    total, top_level = 0.0, []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        if name.strip() == "main":
+            total = int(cumulative) / 1e6
+        elif depth <= 1:
+            top_level.append((int(cumulative) / 1e6, name.strip()))
+    return total, sorted(top_level, reverse=True)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _first_request(env: dict, workers: int, timeout: float = 60) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("server did not answer in time")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    bootstrap_env()
+    env = dict(os.environ)
+
+    imports = [_import_profile(env) for _ in range(args.runs)]
+    print(f"import main: median {statistics.median(t for t, _ in imports) * 1000:.0f} ms over {args.runs} runs")
+    for cumulative, name in imports[-1][1][:args.top]:
+        print(f"  {cumulative * 1000:>8.1f} ms  {name}")
+
+    cold, warm = [], []
+    for _ in range(args.runs):
+        env["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench-'), 'startup.db')}"
+        cold.append(_first_request(env, args.workers))
+        warm.append(_first_request(env, args.workers))
+    print(f"time to first request ({args.workers} worker(s)): "
+          f"cold db median {statistics.median(cold) * 1000:.0f} ms, "
+          f"warm db median {statistics.median(warm) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
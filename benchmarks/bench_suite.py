@@ -0,0 +1,332 @@
+"""Load test of the auth endpoints: throughput, latency percentiles and CPU per request.
+
+    python -m benchmarks.bench_suite --transport asgi,uvicorn --users 10000 --requests 500
+    python -m benchmarks.bench_suite --scenarios login,profile --compare benchmarks/results/<old>.json
+
+Scenarios, each run with `--concurrency` clients on a database pre-seeded
+with `--users` verified users:
+
+    register    burst of new sign-ups (bcrypt hash + outbox row)
+    login       login storm across distinct seeded users (bcrypt verify)
+    profile     GET /users/my-profile with each client's access cookie
+    refresh     POST /users/refresh with each client's refresh cookie
+    admin_list  an admin paging through GET /admin/users by cursor
+
+`asgi` drives main.app in-process through httpx.ASGITransport, with the
+lifespan run around it. Its CPU figure is this process, client included.
+`uvicorn` starts `--workers` server processes. Its CPU figure is server
+CPU only, read from /proc. The rate limiter and admission control are
+switched off in both modes, so the scenarios measure the work and not 503s.
+Only 2xx responses count towards latency and throughput; the rest are
+reported as errors.
+
+`--profile-sql` turns on SQL_PROFILE and records the server's X-DB-* headers:
+mean statements and repeated identical statements per request.
+
+Results are written to benchmarks/results/ as JSON. `--compare` prints the
+change against an earlier file. It exits 1 if any p95 or throughput
+regressed by more than `--tolerance`, or if a scenario now issues more
+statements per request.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from benchmarks.common import ROOT, bootstrap_env, prepare_app_database, summarize
+
+SCENARIOS = ("register", "login", "profile", "refresh", "admin_list")
+PASSWORD = "suite-password-1"
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+def _seed(db_path: str, users: int, rounds: int):
+    import bcrypt
+
+    #One hash shared by every seeded user keeps seeding fast while logins still pay full bcrypt cost
+    hashed = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds=rounds)).decode()
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO users (full_name, user_name, email, password, role, is_active, time_registered, email_verified)"
+        " VALUES (?, ?, ?, ?, 'USER', 1, ?, 1)",
+        ((f"Seed {i}", f"seed{i}", f"seed{i}@example.com", hashed, f"2025-01-01 00:00:00.{i % 1000000:06d}")
+         for i in range(users)),
+    )
+    conn.commit()
+    conn.close()
+
+
+##Scenarios
+class Scenario:
+    def __init__(self, run_id: str, users: int):
+        self.run_id = run_id
+        self.users = users
+        self.cursors = {}
+
+    async def setup(self, name: str, client, index: int):
+        if name in ("profile", "refresh"):
+            await self._login(client, f"seed{index % self.users}", PASSWORD)
+        elif name == "admin_list":
+            await self._login(client, "admin", os.environ["ADMIN_PASSWORD"])
+
+    @staticmethod
+    async def _login(client, user_name: str, password: str):
+        response = await client.post("/users/login", json={"user_name": user_name, "password": password})
+        response.raise_for_status()
+
+    async def register(self, client, i: int):
+        return await client.post("/users/register", json={
+            "full_name": f"Load {i}", "user_name": f"load-{self.run_id}-{i}",
+            "email": f"load-{self.run_id}-{i}@example.com", "password": PASSWORD,
+        })
+
+    async def login(self, client, i: int):
+        return await client.post("/users/login", json={"user_name": f"seed{i % self.users}", "password": PASSWORD})
+
+    async def profile(self, client, i: int):
+        return await client.get("/users/my-profile")
+
+    async def refresh(self, client, i: int):
+        return await client.post("/users/refresh")
+
+    async def admin_list(self, client, i: int):
+        params = {"limit": 50}
+        cursor = self.cursors.get(id(client))
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/admin/users", params=params)
+        if response.status_code == 200:
+            self.cursors[id(client)] = response.json()["next_cursor"]
+        return response
+
+
+##CPU probes
+def _proc_cpu_seconds(pid: int) -> float:
+    """utime + stime of pid and all its descendants (Linux /proc)."""
+    ticks = os.sysconf("SC_CLK_TCK")
+    total, pending = 0.0, [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            total += (int(fields[11]) + int(fields[12])) / ticks
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pending.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return total
+
+
+async def _drive(scenario: Scenario, name: str, clients, requests: int, cpu_probe) -> dict:
+    request = getattr(scenario, name)
+    latencies, statuses, sent = [], Counter(), 0
+    queries, repeated = [], []
+    counter = iter(range(requests))
+
+    async def worker(client):
+        nonlocal sent
+        for i in counter:
+            started = time.perf_counter()
+            response = await request(client, i)
+            took = time.perf_counter() - started
+            sent += 1
+            statuses[response.status_code] += 1
+            #A rejection is not a served request: keep its (tiny) latency out of the percentiles
+            if 200 <= response.status_code < 300:
+                latencies.append(took)
+            if "x-db-query-count" in response.headers:
+                queries.append(int(response.headers["x-db-query-count"]))
+                repeated.append(int(response.headers["x-db-duplicate-queries"]))
+
+    cpu_before = cpu_probe()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(client) for client in clients))
+    elapsed = time.perf_counter() - started
+    cpu = cpu_probe() - cpu_before
+    db = {}
+    if queries:
+        db = {
+            "db_queries_per_request": round(sum(queries) / len(queries), 3),
+            "db_repeated_per_request": round(sum(repeated) / len(repeated), 3),
+        }
+    return {
+        **summarize(latencies),
+        **db,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "cpu_ms_per_request": round(cpu / max(sent, 1) * 1000, 3),
+        "errors": sum(n for status, n in statuses.items() if not 200 <= status < 300),
+        "status_counts": {str(status): n for status, n in sorted(statuses.items())},
+    }
+
+
+async def _run_scenarios(make_client, names, args, cpu_probe) -> dict:
+    scenario = Scenario(run_id=f"{os.getpid()}-{int(time.time())}", users=args.users)
+    results = {}
+    for name in names:
+        clients = [make_client() for _ in range(args.concurrency)]
+        try:
+            for index, client in enumerate(clients):
+                await scenario.setup(name, client, index)
+            results[name] = await _drive(scenario, name, clients, args.requests, cpu_probe)
+        finally:
+            for client in clients:
+                await client.aclose()
+        r = results[name]
+        sql = f"  sql {r['db_queries_per_request']}/req ({r['db_repeated_per_request']} repeated)" \
+            if "db_queries_per_request" in r else ""
+        print(f"  {name:<11} {r['throughput_rps']:>8} req/s  p50 {r['p50_ms']:>8} ms  p95 {r['p95_ms']:>8} ms  "
+              f"p99 {r['p99_ms']:>8} ms  cpu {r['cpu_ms_per_request']:>7} ms/req  errors {r['errors']}{sql}")
+    return results
+
+
+##Transports
+async def _run_asgi(names, args) -> dict:
+    import httpx
+    import main
+
+    #Keep the profiler's per-request log lines out of the report; the headers carry the numbers
+    logging.getLogger("user_registration.sql").setLevel(logging.WARNING)
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    async with main.app.router.lifespan_context(main.app):
+        return await _run_scenarios(
+            lambda: httpx.AsyncClient(transport=transport, base_url="http://bench"),
+            names, args, time.process_time,
+        )
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _run_uvicorn(names, args) -> dict:
+    import httpx
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(args.workers),
+         "--log-level", "warning"],
+        cwd=ROOT, env=dict(os.environ), stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL if args.profile_sql else None,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=base_url) as probe:
+            for _ in range(600):
+                try:
+                    if (await probe.get("/")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.05)
+            else:
+                raise RuntimeError("uvicorn did not start")
+        return await _run_scenarios(
+            lambda: httpx.AsyncClient(base_url=base_url, timeout=60),
+            names, args, lambda: _proc_cpu_seconds(server.pid),
+        )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+##Comparison
+def _compare(previous: dict, current: dict, tolerance: float) -> bool:
+    regressed = False
+    print(f"\n{'transport/scenario':<24} {'rps':>16} {'p95 ms':>18}")
+    for transport, scenarios in current["results"].items():
+        for name, now in scenarios.items():
+            before = previous["results"].get(transport, {}).get(name)
+            if not before:
+                continue
+            rps_change = now["throughput_rps"] / before["throughput_rps"] - 1
+            p95_change = now["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+            flag = rps_change < -tolerance or p95_change > tolerance
+            sql = ""
+            if "db_queries_per_request" in before and "db_queries_per_request" in now:
+                sql = f" sql {before['db_queries_per_request']}->{now['db_queries_per_request']}"
+                flag |= now["db_queries_per_request"] > before["db_queries_per_request"]
+            regressed |= flag
+            print(f"{transport + '/' + name:<24} {before['throughput_rps']:>7}->{now['throughput_rps']:<8}"
+                  f" {before['p95_ms']:>8}->{now['p95_ms']:<9}{sql}{'  REGRESSED' if flag else ''}")
+    return regressed
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transport", default="asgi", help="Comma separated: asgi, uvicorn")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--users", type=int, default=10000, help="Users pre-seeded before the run")
+    parser.add_argument("--requests", type=int, default=300, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="Hash cost of seeded and registered users")
+    parser.add_argument("--output", help="Result file (default benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--profile-sql", action="store_true", help="Record statements per request (SQL_PROFILE)")
+    parser.add_argument("--compare", help="Earlier result file to diff against")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    names = [n for n in args.scenarios.split(",") if n]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    #Pin the policy to the seeded cost so logins measure verify, not a one-off rehash
+    db_path = bootstrap_env(
+        "suite.db", RATE_LIMIT_ENABLED="false", ADMISSION_ENABLED="false", SQL_PROFILE=str(args.profile_sql).lower(),
+        PASSWORD_SCHEME="bcrypt", PASSWORD_HASH_COST=args.bcrypt_rounds,
+    )
+    prepare_app_database()
+    _seed(db_path, args.users, args.bcrypt_rounds)
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": {},
+    }
+    runners = {"asgi": _run_asgi, "uvicorn": _run_uvicorn}
+    for transport in args.transport.split(","):
+        print(f"{transport}:")
+        report["results"][transport] = asyncio.run(runners[transport](names, args))
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        if _compare(previous, report, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Cost of jwt.decode versus a verified-token cache hit under cookie reuse.
+
+    python -m benchmarks.bench_token_cache --sessions 500 --reuse 40
+
+Simulates `--sessions` logged-in browsers each sending the same access_token
+cookie `--reuse` times, in shuffled order.
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import bootstrap_env
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--reuse", type=int, default=40)
+    args = parser.parse_args()
+
+    bootstrap_env()
+    import jwt
+    from config import SECRET_KEY, ALGORITHIM
+    from security_utilities.auth import create_access_token
+    from security_utilities.token_cache import VerifiedTokenCache
+
+    tokens = [create_access_token({"sub": f"user{i}@example.com", "role": "user"}) for i in range(args.sessions)]
+    requests = [t for t in tokens for _ in range(args.reuse)]
+    random.Random(0).shuffle(requests)
+
+    started = time.perf_counter()
+    for token in requests:
+        jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHIM])
+    plain = time.perf_counter() - started
+
+    cache = VerifiedTokenCache(maxsize=args.sessions * 2)
+    started = time.perf_counter()
+    for token in requests:
+        cache.decode(token)
+    cached = time.perf_counter() - started
+
+    n = len(requests)
+    stats = cache.stats()
+    print(f"requests           {n}")
+    print(f"jwt.decode         {plain / n * 1e6:8.2f} us/request")
+    print(f"token cache        {cached / n * 1e6:8.2f} us/request  (hit ratio {stats['hit_ratio']})")
+    print(f"speedup            {plain / cached:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def bootstrap_env(db_name: str = "bench.db", db_path: str = None, **overrides):
+    """Point the app at a throwaway database and fill in any missing settings.
+
+    Must run before anything from the app (config, main, routes) is imported.
+    Pass db_path to share one database between several benchmark processes.
+    """
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="bench-"), db_name)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-benchmark-secret-key")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ.setdefault("ADMIN_PASSWORD", "AdminPass123")
+    os.environ.setdefault("FRONTEND_URL", "http://localhost:3000")
+    for key, value in overrides.items():
+        os.environ[key] = str(value)
+    return db_path
+
+
+def prepare_app_database():
+    """Create the schema and the admin, as the app's lifespan does on server start.
+
+    Benchmarks that drive the app through httpx.ASGITransport never run the lifespan.
+    """
+    from database.bootstrap import prepare_database
+
+    prepare_database()
+
+
+def percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples) -> dict:
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+    }
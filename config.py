@@ -1,12 +1,12 @@
 from dotenv import load_dotenv
+from functools import lru_cache
 import os
+import tempfile
 from slowapi import Limiter
-from fastapi import Request, FastAPI
-from fastapi.responses import JSONResponse
-from limits.storage import RedisStorage
+from fastapi import Request
 from fastapi.responses import JSONResponse
+import security_utilities.rate_limit_storage  # noqa: F401  registers the shm:// scheme
 from slowapi.errors import RateLimitExceeded
-from fastapi_mail import ConnectionConfig
 
 load_dotenv()
 
@@ -17,49 +17,143 @@ SECRET_KEY=os.getenv("SECRET_KEY")
 ALGORITHIM=os.getenv("ALGORITHM")
 ADMIN_PASSWORD=os.getenv("ADMIN_PASSWORD")
 FRONT_END_URL=os.getenv("FRONTEND_URL")
-REDIS_STORAGE=os.getenv("REDIS_STORAGE","memory://")
+REDIS_STORAGE=os.getenv("REDIS_STORAGE")
 REFRESH_TOKEN_EXPIRE_DAYS=int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS",30))
 EMAIL_VERIFICATION_TOKEN=int(os.getenv("EMAIL_VERIFICATION_TOKEN",30))
 EMAIL_VERIFICATION_TOKEN_EXPIRY=int(os.getenv("EMAIL_VERIFICATION_TOKEN_EXPIRY",30))
 
-
-if DATABASE_URL:
-    print(f"Database url loaded:{DATABASE_URL}")
-else:
-    print("Database url not loaded")
-
-if ALGORITHIM:
-    print("Algorithim loaded")
-else:
-    print("Algorithim not loaded")
-if SECRET_KEY:
-    print("key loaded")
-else:
-    print("key not loaded")
-if ACCESS_TOKEN_EXPIRE_MINUTES:
-    print("Token expiry time loaded")
-else:
-    print("Token expiry time not loaded")
+##Password hashing pool
+HASH_EXECUTOR=os.getenv("HASH_EXECUTOR","thread")  # thread | process | inline
+HASH_WORKERS=int(os.getenv("HASH_WORKERS",os.cpu_count() or 1))
+HASH_QUEUE_LIMIT=int(os.getenv("HASH_QUEUE_LIMIT",64))
+
+##Password hashing policy (security_utilities/hash_policy.py)
+#Unset PASSWORD_HASH_COST means calibrate on startup to PASSWORD_HASH_TARGET_MS;
+#pin it in production so every worker hashes at the same cost.
+PASSWORD_SCHEME=os.getenv("PASSWORD_SCHEME","bcrypt")  # bcrypt | scrypt | argon2
+PASSWORD_HASH_TARGET_MS=float(os.getenv("PASSWORD_HASH_TARGET_MS",250))
+PASSWORD_HASH_COST=int(os.getenv("PASSWORD_HASH_COST")) if os.getenv("PASSWORD_HASH_COST") else None  # bcrypt rounds | scrypt log2(N) | argon2 time cost
+PASSWORD_HASH_MEMORY_MB=int(os.getenv("PASSWORD_HASH_MEMORY_MB",32))  # argon2 memory, scrypt ceiling
+PASSWORD_HASH_PARALLELISM=int(os.getenv("PASSWORD_HASH_PARALLELISM",1))
+PASSWORD_REHASH_ON_LOGIN=os.getenv("PASSWORD_REHASH_ON_LOGIN","true").lower() in ("1","true","yes")
+
+##Admission control for the password-hashing routes (per worker)
+#Each gate admits ADMISSION_CONCURRENCY requests, queues ADMISSION_QUEUE more for
+#at most ADMISSION_QUEUE_TIMEOUT_MS, and sheds the rest with 503 + Retry-After.
+ADMISSION_ENABLED=os.getenv("ADMISSION_ENABLED","true").lower() in ("1","true","yes")
+ADMISSION_CONCURRENCY=int(os.getenv("ADMISSION_CONCURRENCY",2 * HASH_WORKERS))
+ADMISSION_QUEUE=int(os.getenv("ADMISSION_QUEUE",4 * HASH_WORKERS))
+ADMISSION_QUEUE_TIMEOUT_MS=int(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS",1000))
+ADMISSION_RETRY_AFTER_SECONDS=int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS",2))
+
+##Database profile
+DB_PROFILE=os.getenv("DB_PROFILE","production")  # production | default
+DB_POOL_SIZE=int(os.getenv("DB_POOL_SIZE",10))
+DB_MAX_OVERFLOW=int(os.getenv("DB_MAX_OVERFLOW",20))
+DB_POOL_TIMEOUT=int(os.getenv("DB_POOL_TIMEOUT",30))
+DB_POOL_RECYCLE=int(os.getenv("DB_POOL_RECYCLE",1800))
+DB_READ_POOL_SIZE=int(os.getenv("DB_READ_POOL_SIZE",20))
+SQLITE_BUSY_TIMEOUT_MS=int(os.getenv("SQLITE_BUSY_TIMEOUT_MS",5000))
+SQLITE_MMAP_SIZE=int(os.getenv("SQLITE_MMAP_SIZE",256 * 1024 * 1024))
+SQLITE_CACHE_SIZE_KB=int(os.getenv("SQLITE_CACHE_SIZE_KB",64 * 1024))
+
+##Read replica (database/replica.py)
+#Pure-read routes use DATABASE_REPLICA_URL if set, else a SQLite copy of DATABASE_URL at
+#REPLICA_SNAPSHOT_PATH refreshed every REPLICA_REFRESH_SECONDS, else the primary
+DATABASE_REPLICA_URL=os.getenv("DATABASE_REPLICA_URL")
+REPLICA_SNAPSHOT_PATH=os.getenv("REPLICA_SNAPSHOT_PATH")
+REPLICA_REFRESH_SECONDS=float(os.getenv("REPLICA_REFRESH_SECONDS",5))
+#A client's reads stay on the primary this long after a request that wrote; keep it above the replica lag
+READ_YOUR_WRITES_SECONDS=float(os.getenv("READ_YOUR_WRITES_SECONDS",2 * REPLICA_REFRESH_SECONDS))
+
+##Principal cache
+PRINCIPAL_CACHE_SIZE=int(os.getenv("PRINCIPAL_CACHE_SIZE",10000))
+PRINCIPAL_CACHE_TTL_SECONDS=int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS",60))
+
+##Verified token cache
+TOKEN_CACHE_SIZE=int(os.getenv("TOKEN_CACHE_SIZE",20000))
+
+##Token revocation index (security_utilities/revocation.py)
+#A revocation made by one worker reaches the others within REVOCATION_SYNC_SECONDS
+REVOCATION_SYNC_SECONDS=float(os.getenv("REVOCATION_SYNC_SECONDS",2))
+REVOCATION_PRUNE_SECONDS=int(os.getenv("REVOCATION_PRUNE_SECONDS",3600))
+REVOCATION_BLOOM_CAPACITY=int(os.getenv("REVOCATION_BLOOM_CAPACITY",1000000))
+REVOCATION_BLOOM_ERROR_RATE=float(os.getenv("REVOCATION_BLOOM_ERROR_RATE",0.001))
+#A refresh token presented again this soon after it was spent is a race (two tabs, a retry), not theft
+REFRESH_REUSE_GRACE_SECONDS=float(os.getenv("REFRESH_REUSE_GRACE_SECONDS",10))
+
+##Password reset tokens (services/password_reset.py)
+PASSWORD_RESET_TOKEN_MINUTES=int(os.getenv("PASSWORD_RESET_TOKEN_MINUTES",60))
+RESET_TOKEN_SWEEP_SECONDS=float(os.getenv("RESET_TOKEN_SWEEP_SECONDS",300))
+RESET_TOKEN_SWEEP_CHUNK=int(os.getenv("RESET_TOKEN_SWEEP_CHUNK",500))
+
+##Unverified account purge (services/user_purge.py, scripts/purge_unverified.py)
+UNVERIFIED_PURGE_ENABLED=os.getenv("UNVERIFIED_PURGE_ENABLED","true").lower() in ("1","true","yes")
+UNVERIFIED_MAX_AGE_HOURS=float(os.getenv("UNVERIFIED_MAX_AGE_HOURS",72))
+UNVERIFIED_PURGE_SECONDS=float(os.getenv("UNVERIFIED_PURGE_SECONDS",3600))
+#Ids per DELETE transaction, and the pause between them that lets other writers in
+UNVERIFIED_PURGE_CHUNK=int(os.getenv("UNVERIFIED_PURGE_CHUNK",500))
+UNVERIFIED_PURGE_PAUSE_MS=float(os.getenv("UNVERIFIED_PURGE_PAUSE_MS",50))
+
+##Email outbox worker
+OUTBOX_BATCH_SIZE=int(os.getenv("OUTBOX_BATCH_SIZE",50))
+OUTBOX_POLL_SECONDS=float(os.getenv("OUTBOX_POLL_SECONDS",2))
+OUTBOX_MAX_ATTEMPTS=int(os.getenv("OUTBOX_MAX_ATTEMPTS",8))
+OUTBOX_BACKOFF_SECONDS=int(os.getenv("OUTBOX_BACKOFF_SECONDS",30))
+OUTBOX_LEASE_SECONDS=int(os.getenv("OUTBOX_LEASE_SECONDS",300))
+#Sent rows are deleted after this long, checked every OUTBOX_PRUNE_SECONDS
+OUTBOX_SENT_RETENTION_HOURS=float(os.getenv("OUTBOX_SENT_RETENTION_HOURS",24))
+OUTBOX_PRUNE_SECONDS=float(os.getenv("OUTBOX_PRUNE_SECONDS",300))
+
+##Admin user directory
+ADMIN_PAGE_MAX_LIMIT=int(os.getenv("ADMIN_PAGE_MAX_LIMIT",100))
+ADMIN_COUNT_CACHE_SECONDS=int(os.getenv("ADMIN_COUNT_CACHE_SECONDS",60))
+ADMIN_BATCH_CHUNK_SIZE=int(os.getenv("ADMIN_BATCH_CHUNK_SIZE",500))
+ADMIN_BATCH_MAX_ITEMS=int(os.getenv("ADMIN_BATCH_MAX_ITEMS",50000))
+
+
+##Metrics
+#Workers of one server share METRICS_DIR; give separate deployments on a host separate dirs
+METRICS_ENABLED=os.getenv("METRICS_ENABLED","true").lower() in ("1","true","yes")
+METRICS_DIR=os.getenv("METRICS_DIR",os.path.join(tempfile.gettempdir(),"user-registration-metrics"))
+METRICS_FLUSH_SECONDS=float(os.getenv("METRICS_FLUSH_SECONDS",5))
+
+##SQL profiler (debug): per-request query counts in logs and X-DB-* headers
+SQL_PROFILE=os.getenv("SQL_PROFILE","false").lower() in ("1","true","yes")
+SQL_SLOW_QUERY_MS=float(os.getenv("SQL_SLOW_QUERY_MS",100))
+
+##Startup
+#Each step is guarded (schema version check, admin lookup) and serialised across
+#workers, so leaving them on is safe; turn off when a deploy job runs them instead.
+STARTUP_MIGRATE=os.getenv("STARTUP_MIGRATE","true").lower() in ("1","true","yes")
+STARTUP_SEED_ADMIN=os.getenv("STARTUP_SEED_ADMIN","true").lower() in ("1","true","yes")
+STARTUP_WARMUP=os.getenv("STARTUP_WARMUP","true").lower() in ("1","true","yes")
 
 
+##Rate limiter
+#Counters must be shared by every worker: shm:// covers one host, a
+#Redis-protocol server (REDIS_STORAGE=redis://...) covers several.
+RATE_LIMIT_STORAGE=os.getenv(
+    "RATE_LIMIT_STORAGE",
+    REDIS_STORAGE or f"shm://{os.path.join(tempfile.gettempdir(), 'user-registration-ratelimit.bin')}",
+)
 
+#Off only for load tests, which would otherwise measure 429s
+RATE_LIMIT_ENABLED=os.getenv("RATE_LIMIT_ENABLED","true").lower() in ("1","true","yes")
 
-##Rate limiter
 limiter=Limiter(
     key_func = lambda request: request.client.host,
-    storage_uri="memory://"
+    storage_uri=RATE_LIMIT_STORAGE,
+    strategy="sliding-window-counter",
+    enabled=RATE_LIMIT_ENABLED,
 )
 
 
 
 
 
-app = FastAPI()
-app.state.limiter = limiter
-
 #Rate limiter
-#Custom JSON handler
-@app.exception_handler(RateLimitExceeded)
+#Custom JSON handler, registered on the app in main.py
 async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
     return JSONResponse(
         status_code=429,
@@ -72,15 +166,26 @@ async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
 
 
 ##Email configurations
+#fastapi_mail takes ~0.4s to import, so the config is built on first use:
+#get_mail_config() or plain `config.mail_config`.
+@lru_cache(maxsize=1)
+def get_mail_config():
+    from fastapi_mail import ConnectionConfig
+
+    return ConnectionConfig(
+        MAIL_USERNAME="",
+        MAIL_PASSWORD="",
+        MAIL_FROM="tech_pulse@gmail.com",  # any fake address works
+        MAIL_PORT=1025,
+        MAIL_SERVER="127.0.0.1",
+        MAIL_STARTTLS=False,   # make sure this is False
+        MAIL_SSL_TLS=False,    # and this is False too
+        USE_CREDENTIALS=False, # No login
+        VALIDATE_CERTS=False 
+    )
 
-mail_config = ConnectionConfig(
-    MAIL_USERNAME="",
-    MAIL_PASSWORD="",
-    MAIL_FROM="tech_pulse@gmail.com",  # any fake address works
-    MAIL_PORT=1025,
-    MAIL_SERVER="127.0.0.1",
-    MAIL_STARTTLS=False,   # make sure this is False
-    MAIL_SSL_TLS=False,    # and this is False too
-    USE_CREDENTIALS=False, # No login
-    VALIDATE_CERTS=False 
-)
+
+def __getattr__(name):
+    if name == "mail_config":
+        return get_mail_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
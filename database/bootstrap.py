@@ -0,0 +1,89 @@
+"""Once-per-deployment database preparation, run from the app's lifespan.
+
+Every worker runs the lifespan. Each step therefore starts with a cheap
+read-only check: the schema version, then whether the admin row exists.
+Only a worker that finds work takes the cross-process startup lock: an flock
+next to the SQLite file, or a Postgres advisory lock. It then re-checks,
+because another worker may have finished while it waited.
+"""
+import fcntl
+import os
+from contextlib import contextmanager
+from sqlalchemy import select, text
+from sqlalchemy.exc import IntegrityError
+from config import ADMIN_PASSWORD
+from database import migrations
+from database.database_setup import SessionLocal, engine as default_engine
+from models.user_model import User, UserRole
+from security_utilities.pass_hash import hash_password
+
+ADMIN_EMAIL = "admin@example.com"
+#Arbitrary app-wide key for pg_advisory_lock
+ADVISORY_LOCK_KEY = 0x55524547
+
+
+@contextmanager
+def startup_lock(engine=default_engine):
+    url = engine.url
+    backend = url.get_backend_name()
+    if backend == "sqlite" and url.database not in (None, "", ":memory:"):
+        fd = os.open(f"{url.database}.startup.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            #Closing the descriptor releases the flock
+            os.close(fd)
+    elif backend == "postgresql":
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+    else:
+        yield
+
+
+def schema_is_current(engine=default_engine) -> bool:
+    applied, latest = migrations.status(engine)
+    return applied >= latest
+
+
+def admin_exists() -> bool:
+    with SessionLocal() as db:
+        return db.execute(select(User.id).where(User.email == ADMIN_EMAIL)).first() is not None
+
+
+def seed_admin() -> bool:
+    with SessionLocal() as db:
+        if db.execute(select(User.id).where(User.email == ADMIN_EMAIL)).first() is not None:
+            return False
+        db.add(User(
+            full_name="Peter",
+            user_name="admin",
+            email=ADMIN_EMAIL,
+            password=hash_password(ADMIN_PASSWORD),
+            role=UserRole.ADMIN,
+            email_verified=True
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            #Seeded concurrently by a process that did not share our lock
+            db.rollback()
+            return False
+    print(f"Admin seeded: {ADMIN_EMAIL}")
+    return True
+
+
+def prepare_database(migrate: bool = True, seed: bool = True, engine=default_engine):
+    """Bring the schema to the latest version and make sure the admin exists. Blocking."""
+    needs_migration = migrate and not schema_is_current(engine)
+    if not needs_migration and not (seed and not admin_exists()):
+        return
+    with startup_lock(engine):
+        if needs_migration and not schema_is_current(engine):
+            migrations.upgrade(engine)
+        if seed:
+            seed_admin()
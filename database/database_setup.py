@@ -1,21 +1,217 @@
-from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy import create_engine
-from config import DATABASE_URL
+import time
+from fastapi import Request
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from config import (
+    DATABASE_URL, DB_PROFILE, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+    DB_READ_POOL_SIZE, SQLITE_BUSY_TIMEOUT_MS, SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE_KB, SQL_PROFILE,
+    DATABASE_REPLICA_URL, REPLICA_SNAPSHOT_PATH,
+)
+from services.metrics import db_session_seconds
 
-engine= create_engine(DATABASE_URL)
+#Async drivers used by the API for each sync url scheme
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername)
+    if driver:
+        parsed = parsed.set(drivername=driver)
+    return parsed.render_as_string(hide_password=False)
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+def is_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return is_sqlite(url) and parsed.database in (None, "", ":memory:")
+
+
+##Engine profile
+def engine_options(url: str, pool_size: int = DB_POOL_SIZE) -> dict:
+    """Pool settings for the production profile ({} keeps SQLAlchemy defaults)."""
+    if DB_PROFILE != "production" or is_memory_sqlite(url):
+        return {}
+    return {
+        "pool_size": pool_size,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def apply_sqlite_pragmas(target_engine, read_only: bool = False):
+    """Run the SQLite pragma profile on every new pooled connection."""
+    if not is_sqlite(str(target_engine.url)):
+        return
+    production = DB_PROFILE == "production"
+
+    @event.listens_for(target_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        #Off by default on every SQLite connection; without it ON DELETE CASCADE does nothing, whatever the profile
+        cursor.execute("PRAGMA foreign_keys=ON")
+        if not production:
+            cursor.close()
+            return
+        if not read_only:
+            #WAL lets readers run alongside the single writer; NORMAL only fsyncs on checkpoint
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        #negative cache_size is in KiB
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+#Sync engine: create_all, migrations and CLI scripts
+engine= create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+apply_sqlite_pragmas(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+#Async engine: request handling
+async_engine = create_async_engine(to_async_url(DATABASE_URL), **engine_options(DATABASE_URL))
+apply_sqlite_pragmas(async_engine.sync_engine)
+
+#Read-only engine: query-only routes get their own pool so they never queue behind writers
+read_engine = create_async_engine(
+    to_async_url(DATABASE_URL), **engine_options(DATABASE_URL, pool_size=DB_READ_POOL_SIZE)
+)
+apply_sqlite_pragmas(read_engine.sync_engine, read_only=True)
+
+##Replica
+def replica_url():
+    """Where pure reads go, or None to read from the primary (see config)."""
+    if DATABASE_REPLICA_URL:
+        return DATABASE_REPLICA_URL
+    if REPLICA_SNAPSHOT_PATH:
+        if not is_sqlite(DATABASE_URL) or is_memory_sqlite(DATABASE_URL):
+            raise RuntimeError("REPLICA_SNAPSHOT_PATH needs a file-backed SQLite DATABASE_URL")
+        #Read-only open: before the first refresh a missing file is an error, not a new empty database
+        return f"sqlite:///file:{REPLICA_SNAPSHOT_PATH}?mode=ro&uri=true"
+    return None
+
+
+REPLICA_URL = replica_url()
+#Cookie set on responses to requests that wrote: until the epoch it holds, that client reads the primary
+READ_PIN_COOKIE = "db_read_pin"
+
+if REPLICA_URL:
+    replica_engine = create_async_engine(
+        to_async_url(REPLICA_URL), **engine_options(REPLICA_URL, pool_size=DB_READ_POOL_SIZE)
+    )
+    apply_sqlite_pragmas(replica_engine.sync_engine, read_only=True)
+else:
+    replica_engine = read_engine
+
+if SQL_PROFILE:
+    from database.query_profiler import attach_profiler
+
+    for profiled in {engine, async_engine.sync_engine, read_engine.sync_engine, replica_engine.sync_engine}:
+        attach_profiler(profiled)
+
+class PrimarySession(Session):
+    """Session on the primary that tells the request, via info["request_state"], when a commit wrote."""
+
+
+@event.listens_for(PrimarySession, "do_orm_execute")
+def _note_statement_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(PrimarySession, "after_flush")
+def _note_flush_write(session, flush_context):
+    #Still the pre-flush collections here
+    if session.new or session.deleted or any(session.is_modified(obj) for obj in session.dirty):
+        session.info["wrote"] = True
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def _pin_after_write(session):
+    state = session.info.get("request_state")
+    if session.info.pop("wrote", False) and state is not None:
+        state.wrote_primary = True
+
+
+@event.listens_for(PrimarySession, "after_rollback")
+def _forget_write(session):
+    session.info.pop("wrote", None)
+
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    sync_session_class=PrimarySession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+ReadSessionLocal = async_sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+ReplicaSessionLocal = async_sessionmaker(
+    bind=replica_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+) if REPLICA_URL else ReadSessionLocal
+
 ##Database session
-def get_db():
-    db = SessionLocal()
+async def get_db(request: Request):
+    with db_session_seconds.time("write"):
+        async with AsyncSessionLocal() as db:
+            #A commit that wrote pins this client's next reads to the primary; see database/replica.py
+            db.info["request_state"] = request.state
+            try:
+                yield db
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                print(f"Database error:{e}")
+                raise
+
+def read_pinned(request: Request) -> bool:
     try:
-        yield db
-        db.commit()
-    except Exception as e:
-        db.rollback()
-        print(f"Database error:{e}")
-        raise    
-    finally:
-        db.close()
+        return float(request.cookies.get(READ_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+##Read-only database session
+async def get_read_db(request: Request):
+    """The replica, unless this client wrote recently (read-your-writes), then the primary."""
+    primary = REPLICA_URL is None or read_pinned(request)
+    with db_session_seconds.time("read" if primary else "replica"):
+        async with (ReadSessionLocal if primary else ReplicaSessionLocal)() as db:
+            try:
+                yield db
+            finally:
+                await db.rollback()
+
+
+async def get_primary_read_db():
+    """Read-only session on the primary, for reads that must see writes made by other clients."""
+    with db_session_seconds.time("read"):
+        async with ReadSessionLocal() as db:
+            try:
+                yield db
+            finally:
+                await db.rollback()
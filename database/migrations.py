@@ -0,0 +1,260 @@
+"""In-place schema upgrades for databases created by older releases.
+
+`Base.metadata.create_all` only creates missing tables; it never alters an
+existing one. Each step here is idempotent and brings a live database in line
+with the models. The applied version is kept in the `schema_version` table.
+"""
+from contextlib import contextmanager
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, select, text
+from database.database_setup import Base, engine as default_engine
+from models.user_model import User
+from models.email_outbox_model import EmailKind, EmailOutbox
+from models.revoked_token_model import RevokedToken
+from models.password_reset_token_model import PasswordResetToken
+from models.login_session_model import LoginSession
+
+version_table = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, nullable=False),
+)
+
+
+def _current_version(conn) -> int:
+    version_table.create(conn, checkfirst=True)
+    return conn.execute(select(version_table.c.version)).scalar() or 0
+
+
+def _stamp(conn, version: int):
+    conn.execute(version_table.delete())
+    conn.execute(version_table.insert().values(version=version))
+
+
+def _index_names(conn, table_name: str) -> set:
+    if conn.dialect.name == "sqlite":
+        #The inspector skips expression indexes such as lower(email) on SQLite
+        rows = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :t AND sql IS NOT NULL"),
+            {"t": table_name},
+        )
+        return {row[0] for row in rows}
+    return {index["name"] for index in inspect(conn).get_indexes(table_name)}
+
+
+@contextmanager
+def _sqlite_foreign_keys_off(conn):
+    """SQLite foreign keys off, and renames kept out of other tables' references, for one step.
+
+    Otherwise _rebuild_sqlite_table would point password_reset_tokens at the renamed
+    old table, and dropping that table would cascade into the tokens. Both pragmas
+    must be set outside a transaction.
+    """
+    if conn.dialect.name != "sqlite":
+        yield
+        return
+    conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+    conn.exec_driver_sql("PRAGMA legacy_alter_table=ON")
+    conn.commit()
+    try:
+        yield
+    finally:
+        conn.rollback()
+        conn.exec_driver_sql("PRAGMA legacy_alter_table=OFF")
+        conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+        conn.commit()
+
+
+def _rebuild_sqlite_table(conn, table) -> None:
+    """Recreate `table` from the model and copy rows across.
+
+    SQLite cannot drop a table-level UNIQUE constraint or add NOT NULL columns
+    in place, so the documented rename/create/copy/drop sequence is used.
+    """
+    name = table.name
+    old = f"{name}__old"
+    live_columns = {c["name"] for c in inspect(conn).get_columns(name)}
+
+    #Index names are global in SQLite and would clash with the new table's
+    for index_name in _index_names(conn, name):
+        conn.execute(text(f'DROP INDEX IF EXISTS "{index_name}"'))
+    conn.execute(text(f'ALTER TABLE "{name}" RENAME TO "{old}"'))
+    table.create(conn)
+
+    targets, sources, params = [], [], {}
+    for column in table.columns:
+        if column.name in live_columns:
+            targets.append(f'"{column.name}"')
+            sources.append(f'"{column.name}"')
+        elif column.default is not None and column.default.is_scalar:
+            targets.append(f'"{column.name}"')
+            sources.append(f":default_{column.name}")
+            params[f"default_{column.name}"] = column.default.arg
+    conn.execute(
+        text(f'INSERT INTO "{name}" ({", ".join(targets)}) SELECT {", ".join(sources)} FROM "{old}"'),
+        params,
+    )
+    conn.execute(text(f'DROP TABLE "{old}"'))
+
+
+def _ensure_indexes(conn, table):
+    live = _index_names(conn, table.name)
+    for index in table.indexes:
+        if index.name not in live:
+            index.create(conn)
+            print(f"  created index {index.name}")
+
+
+def upgrade_users_indexes(conn):
+    """Drop the unique index on password hashes and index the real access paths."""
+    inspector = inspect(conn)
+    table = User.__table__
+    if not inspector.has_table(table.name):
+        table.create(conn)
+        return
+
+    live_columns = {c["name"] for c in inspector.get_columns(table.name)}
+    missing = [c.name for c in table.columns if c.name not in live_columns]
+    password_unique = [
+        u for u in inspector.get_unique_constraints(table.name) if u["column_names"] == ["password"]
+    ]
+
+    if conn.dialect.name == "sqlite":
+        if missing or password_unique:
+            print(f"  rebuilding {table.name} (missing columns: {missing or 'none'}, "
+                  f"unique password: {bool(password_unique)})")
+            _rebuild_sqlite_table(conn, table)
+    else:
+        for constraint in password_unique:
+            conn.execute(text(f'ALTER TABLE "{table.name}" DROP CONSTRAINT "{constraint["name"]}"'))
+            print(f"  dropped constraint {constraint['name']}")
+        for name in missing:
+            column = table.c[name]
+            ddl = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{name}" {ddl}'))
+            print(f"  added column {name}")
+
+    if "email_verified" in missing:
+        #Accounts from before verification existed were never asked to verify; the column default would lock them out
+        conn.execute(table.update().values(email_verified=True))
+        print("  marked existing users as verified")
+
+    #The primary key is already the rowid/clustered key
+    conn.execute(text("DROP INDEX IF EXISTS ix_users_id"))
+    _ensure_indexes(conn, table)
+
+
+def create_email_outbox(conn):
+    """Create the email_outbox table drained by scripts/email_worker.py."""
+    EmailOutbox.__table__.create(conn, checkfirst=True)
+    _ensure_indexes(conn, EmailOutbox.__table__)
+
+
+def add_users_listing_indexes(conn):
+    """Index the admin listing filters for keyset pagination."""
+    _ensure_indexes(conn, User.__table__)
+
+
+def create_revoked_tokens(conn):
+    """Create the revoked_tokens table behind refresh-token rotation and logout."""
+    RevokedToken.__table__.create(conn, checkfirst=True)
+    _ensure_indexes(conn, RevokedToken.__table__)
+
+
+def move_reset_tokens(conn):
+    """Move password reset tokens out of users into a hashed, indexed table."""
+    PasswordResetToken.__table__.create(conn, checkfirst=True)
+    _ensure_indexes(conn, PasswordResetToken.__table__)
+    #Outstanding raw tokens are dropped, not migrated: they live an hour and must not be kept in clear
+    live_columns = {c["name"] for c in inspect(conn).get_columns(User.__tablename__)}
+    conn.execute(text("DROP INDEX IF EXISTS ix_users_password_reset_token"))
+    for name in ("password_reset_token", "password_reset_token_expiry"):
+        if name in live_columns:
+            conn.execute(text(f'ALTER TABLE "{User.__tablename__}" DROP COLUMN "{name}"'))
+            print(f"  dropped column users.{name}")
+
+
+def add_users_row_version(conn):
+    """Add users.row_version for ETags."""
+    live_columns = {c["name"] for c in inspect(conn).get_columns(User.__tablename__)}
+    if "row_version" not in live_columns:
+        conn.execute(text(f'ALTER TABLE "{User.__tablename__}" ADD COLUMN row_version INTEGER NOT NULL DEFAULT 1'))
+
+
+def scrub_outbox_reset_tokens(conn):
+    """Remove raw reset tokens from queued and sent password reset emails."""
+    #Reset emails now get their token when sent; pending rows are issued a fresh one
+    conn.execute(
+        EmailOutbox.__table__.update()
+        .where(EmailOutbox.kind == EmailKind.PASSWORD_RESET.value)
+        .values(payload="{}")
+    )
+
+
+def drop_orphaned_reset_tokens(conn):
+    """Delete reset tokens whose user was deleted while SQLite ignored the cascade."""
+    tokens, users = PasswordResetToken.__table__, User.__table__
+    conn.execute(tokens.delete().where(~tokens.c.user_id.in_(select(users.c.id))))
+
+
+def create_login_sessions(conn):
+    """Create the login_sessions table that lets deactivation revoke a user's sessions."""
+    LoginSession.__table__.create(conn, checkfirst=True)
+    _ensure_indexes(conn, LoginSession.__table__)
+
+
+def users_autoincrement(conn):
+    """Rebuild users with AUTOINCREMENT so SQLite never hands out a deleted user's id again."""
+    if conn.dialect.name != "sqlite":
+        return
+    sql = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :t"), {"t": User.__tablename__}
+    ).scalar()
+    if "AUTOINCREMENT" not in sql.upper():
+        print(f"  rebuilding {User.__tablename__} with AUTOINCREMENT")
+        _rebuild_sqlite_table(conn, User.__table__)
+        _ensure_indexes(conn, User.__table__)
+
+
+#Ordered list of (version, step). Append new steps; never reorder.
+MIGRATIONS = [
+    (1, upgrade_users_indexes),
+    (2, create_email_outbox),
+    (3, add_users_listing_indexes),
+    (4, create_revoked_tokens),
+    (5, move_reset_tokens),
+    (6, add_users_row_version),
+    (7, scrub_outbox_reset_tokens),
+    (8, drop_orphaned_reset_tokens),
+    (9, create_login_sessions),
+    (10, users_autoincrement),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def upgrade(engine=default_engine) -> list[int]:
+    """Apply every pending step, each in its own transaction. Returns the versions applied."""
+    applied = []
+    with engine.begin() as conn:
+        current = _current_version(conn)
+    for version, step in MIGRATIONS:
+        if version <= current:
+            continue
+        print(f"Applying migration {version}: {step.__doc__.strip().splitlines()[0]}")
+        with engine.connect() as conn:
+            with _sqlite_foreign_keys_off(conn):
+                with conn.begin():
+                    step(conn)
+                    _stamp(conn, version)
+        applied.append(version)
+    with engine.begin() as conn:
+        Base.metadata.create_all(bind=conn)
+    return applied
+
+
+def status(engine=default_engine) -> tuple[int, int]:
+    """(applied, latest) without writing anything, so workers can check it concurrently."""
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(version_table.name):
+            return 0, LATEST_VERSION
+        return conn.execute(select(version_table.c.version)).scalar() or 0, LATEST_VERSION
@@ -0,0 +1,123 @@
+"""Per-request SQL profile built from engine events. Debug only (SQL_PROFILE).
+
+The middleware gives each request a QueryProfile in a context variable.
+The cursor-execute listeners on every engine then charge each statement to
+the request that ran it: count, total time, statements slower than
+SQL_SLOW_QUERY_MS, and statements repeated with identical parameters.
+Each request is logged as one JSON line on the "user_registration.sql"
+logger and summarised in X-DB-* response headers, which the benchmark suite
+reads (--profile-sql).
+"""
+import json
+import logging
+import re
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+from config import SQL_SLOW_QUERY_MS
+
+logger = logging.getLogger("user_registration.sql")
+
+_current = ContextVar("sql_profile", default=None)
+
+
+def _compact(statement: str, limit: int = 300) -> str:
+    statement = re.sub(r"\s+", " ", statement).strip()
+    return statement if len(statement) <= limit else statement[:limit] + "..."
+
+
+class QueryProfile:
+    __slots__ = ("count", "seconds", "slow", "_seen")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.slow = []
+        self._seen = {}
+
+    def record(self, statement: str, parameters, elapsed: float):
+        self.count += 1
+        self.seconds += elapsed
+        key = (statement, repr(parameters))
+        self._seen[key] = self._seen.get(key, 0) + 1
+        if elapsed * 1000 >= SQL_SLOW_QUERY_MS:
+            self.slow.append({"sql": _compact(statement), "ms": round(elapsed * 1000, 2)})
+
+    @property
+    def duplicates(self) -> list:
+        return [{"sql": _compact(sql), "count": n} for (sql, _), n in self._seen.items() if n > 1]
+
+    @property
+    def repeated(self) -> int:
+        """Executions that repeated an earlier identical statement in the same request."""
+        return sum(n - 1 for n in self._seen.values())
+
+    def headers(self) -> list:
+        return [
+            (b"x-db-query-count", str(self.count).encode()),
+            (b"x-db-time-ms", f"{self.seconds * 1000:.2f}".encode()),
+            (b"x-db-duplicate-queries", str(self.repeated).encode()),
+            (b"x-db-slow-queries", str(len(self.slow)).encode()),
+        ]
+
+
+##Engine events
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current.get() is not None:
+        context._profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    started = getattr(context, "_profile_started", None)
+    if profile is not None and started is not None:
+        profile.record(statement, parameters, time.perf_counter() - started)
+
+
+def attach_profiler(target_engine):
+    """Listen on a sync Engine (pass async_engine.sync_engine for async ones)."""
+    event.listen(target_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target_engine, "after_cursor_execute", _after_cursor_execute)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+class QueryProfilerMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        profile = QueryProfile()
+        token = _current.set(profile)
+        status = 500
+
+        async def send_with_headers(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": list(message.get("headers", [])) + profile.headers()}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            logger.info(json.dumps({
+                "event": "sql_profile",
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None),
+                "status": status,
+                "queries": profile.count,
+                "db_ms": round(profile.seconds * 1000, 2),
+                "repeated": profile.repeated,
+                "duplicates": profile.duplicates,
+                "slow": profile.slow,
+            }))
@@ -0,0 +1,125 @@
+"""Read replica upkeep and read-your-writes pinning.
+
+Pure-read routes take get_read_db, which serves them from the replica engine
+(database_setup.py). Two replica sources are supported:
+
+    DATABASE_REPLICA_URL    a second database kept in sync outside the app
+    REPLICA_SNAPSHOT_PATH   a copy of the primary SQLite file, taken with the
+                            online backup API every REPLICA_REFRESH_SECONDS
+
+A snapshot is copied in one backup step, which is a single read transaction
+on the primary (WAL writers carry on), into a temp file that is then renamed
+over the old copy. Connections already open keep reading the old file until
+they are returned; the replica pool is disposed so new ones open the new
+file. Workers share the file: one that finds a fresh copy only reopens.
+
+A replica lags, so a client that just wrote must not read from it. Every
+request whose get_db session committed a write gets a READ_PIN_COOKIE for
+READ_YOUR_WRITES_SECONDS, and get_read_db sends that client's reads to the
+primary until it lapses. Requests that only read through get_db, such as a
+failed login, are not pinned.
+
+The pin only covers the client that wrote, so get_current_user loads
+principals from the primary: an admin's edit of another user must not be
+undone by the next cache fill from a replica that has not seen it.
+"""
+import asyncio
+import os
+import sqlite3
+import time
+from sqlalchemy.engine import make_url
+from config import (
+    DATABASE_REPLICA_URL, DATABASE_URL, READ_YOUR_WRITES_SECONDS, REPLICA_REFRESH_SECONDS, REPLICA_SNAPSHOT_PATH,
+    SQLITE_BUSY_TIMEOUT_MS,
+)
+from database.database_setup import READ_PIN_COOKIE, replica_engine
+
+
+class SnapshotReplica:
+    """Keeps REPLICA_SNAPSHOT_PATH a recent copy of the primary SQLite file."""
+
+    def __init__(self, source: str, path: str, engine, interval: float):
+        self.source = source
+        self.path = path
+        self.engine = engine
+        self.interval = interval
+        self._inode = None
+        self.refreshes = 0
+        self.last_copy_ms = 0.0
+
+    def _copy(self):
+        started = time.perf_counter()
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        source = sqlite3.connect(f"file:{self.source}?mode=ro", uri=True, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+        target = sqlite3.connect(tmp)
+        try:
+            source.backup(target)
+            #The copy is never written: a rollback journal leaves no -wal file to go stale across renames
+            target.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            target.close()
+            source.close()
+        os.replace(tmp, self.path)
+        self.last_copy_ms = (time.perf_counter() - started) * 1000
+        self.refreshes += 1
+
+    def age(self) -> float:
+        try:
+            return time.time() - os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return float("inf")
+
+    async def _reopen(self):
+        inode = os.stat(self.path).st_ino
+        if inode != self._inode:
+            self._inode = inode
+            await self.engine.dispose()
+
+    async def refresh(self, force: bool = False):
+        #Another worker refreshed the shared file recently: just pick it up
+        if force or self.age() >= self.interval * 0.9:
+            await asyncio.to_thread(self._copy)
+        await self._reopen()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Replica snapshot refresh failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "age_seconds": round(self.age(), 3),
+            "refreshes": self.refreshes,
+            "last_copy_ms": round(self.last_copy_ms, 2),
+        }
+
+
+snapshot_replica = SnapshotReplica(
+    make_url(DATABASE_URL).database, REPLICA_SNAPSHOT_PATH, replica_engine, REPLICA_REFRESH_SECONDS,
+) if REPLICA_SNAPSHOT_PATH and not DATABASE_REPLICA_URL else None
+
+
+class ReadYourWritesMiddleware:
+    """Pure ASGI: adds READ_PIN_COOKIE to responses of requests that committed a write."""
+
+    def __init__(self, app, seconds: float = READ_YOUR_WRITES_SECONDS):
+        self.app = app
+        self.seconds = seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_with_pin(message):
+            #PrimarySession records the write in request.state, which Starlette keeps in scope["state"]
+            if message["type"] == "http.response.start" and scope.get("state", {}).get("wrote_primary"):
+                cookie = (f"{READ_PIN_COOKIE}={time.time() + self.seconds:.0f}; Max-Age={self.seconds:.0f}; "
+                          "Path=/; HttpOnly; SameSite=Lax")
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        await self.app(scope, receive, send_with_pin)
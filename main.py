@@ -1,28 +1,99 @@
-from database.database_setup import Base, SessionLocal, engine
+import asyncio
+from contextlib import asynccontextmanager
+from sqlalchemy import text
+from database.database_setup import REPLICA_URL, async_engine, read_engine, replica_engine
+from database.replica import ReadYourWritesMiddleware, snapshot_replica
+from database.bootstrap import prepare_database
 from security_utilities.dependencies import admin_required
+from security_utilities.pass_hash import HashingQueueFull, get_hash_executor, shutdown_hash_executor
+from security_utilities.hash_policy import get_policy
+from security_utilities.admission import AdmissionRejected
+from security_utilities.revocation import revocation_index
 from fastapi.middleware.cors import CORSMiddleware
-from database.database_setup import SessionLocal
-from config import FRONT_END_URL, ADMIN_PASSWORD
-from fastapi import FastAPI, Depends
-from models.user_model import User, UserRole
-from routes.user_registration import router
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from config import (
+    FRONT_END_URL, METRICS_ENABLED, METRICS_FLUSH_SECONDS, RESET_TOKEN_SWEEP_CHUNK, RESET_TOKEN_SWEEP_SECONDS,
+    REVOCATION_PRUNE_SECONDS, REVOCATION_SYNC_SECONDS, SQL_PROFILE, STARTUP_MIGRATE, STARTUP_SEED_ADMIN, STARTUP_WARMUP,
+    UNVERIFIED_MAX_AGE_HOURS, UNVERIFIED_PURGE_CHUNK, UNVERIFIED_PURGE_ENABLED, UNVERIFIED_PURGE_PAUSE_MS,
+    UNVERIFIED_PURGE_SECONDS, limiter, rate_limit_handler,
+)
+from slowapi.errors import RateLimitExceeded
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
+from routes.user_registration import router, templates
 from routes import admin_routes
+from services.email_service import warm_templates
+from services import metrics
+from services.password_reset import sweep_periodically
+from services.user_purge import purge_periodically
 import logging
 
 
-app=FastAPI()
+logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+
+##Startup
+#Nothing here runs at import time: workers, tests and scripts can import the
+#app for free, and all one-off work happens once the server starts.
+async def warm_up():
+    warm_templates()
+    for name in templates.env.list_templates():
+        templates.get_template(name)
+    get_hash_executor()
+    #Calibrates the hash cost unless PASSWORD_HASH_COST pins it
+    await asyncio.to_thread(get_policy)
+    #One pooled connection per engine, so the first request skips connect and the PRAGMA setup
+    for target in {async_engine, read_engine, replica_engine}:
+        async with target.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    #Schema and admin checks are read-only unless work is pending; see database/bootstrap.py
+    await asyncio.to_thread(prepare_database, STARTUP_MIGRATE, STARTUP_SEED_ADMIN)
+    #The snapshot must exist before anything opens the replica engine
+    replicator = None
+    if snapshot_replica:
+        await snapshot_replica.refresh()
+        replicator = asyncio.create_task(snapshot_replica.run())
+    if STARTUP_WARMUP:
+        await warm_up()
+    await revocation_index.rebuild()
+    revocations = asyncio.create_task(revocation_index.maintain(REVOCATION_SYNC_SECONDS, REVOCATION_PRUNE_SECONDS))
+    sweeper = asyncio.create_task(sweep_periodically(RESET_TOKEN_SWEEP_SECONDS, RESET_TOKEN_SWEEP_CHUNK))
+    purger = asyncio.create_task(purge_periodically(
+        UNVERIFIED_PURGE_SECONDS, UNVERIFIED_MAX_AGE_HOURS, UNVERIFIED_PURGE_CHUNK, UNVERIFIED_PURGE_PAUSE_MS,
+    )) if UNVERIFIED_PURGE_ENABLED else None
+    flusher = asyncio.create_task(metrics.flush_periodically(METRICS_FLUSH_SECONDS)) if METRICS_ENABLED else None
+    yield
+    revocations.cancel()
+    if replicator:
+        replicator.cancel()
+    sweeper.cancel()
+    if purger:
+        purger.cancel()
+    if flusher:
+        flusher.cancel()
+        metrics.discard()
+    shutdown_hash_executor()
 
-##Create tables
-#print("Sqlalchemy knows about the following tables:",
-#Base.metadata.tables.keys())
 
-Base.metadata.create_all(bind=engine)
-#Base.metadata.drop_all(bind=engine)
+app=FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+app.state.limiter = limiter
+app.add_exception_handler(RateLimitExceeded, rate_limit_handler)
 
 origins = [FRONT_END_URL]
 
+if METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+if SQL_PROFILE:
+    from database.query_profiler import QueryProfilerMiddleware
+
+    app.add_middleware(QueryProfilerMiddleware)
+
+if REPLICA_URL:
+    app.add_middleware(ReadYourWritesMiddleware)
+
 #CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -32,41 +103,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Seed the admin user
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+#Hashing pool saturated
+@app.exception_handler(HashingQueueFull)
+async def hashing_queue_full_handler(request: Request, exc: HashingQueueFull):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
 
-def seed_admin():
-    db: Session = SessionLocal()
-    admin_email = "admin@example.com"
-
-    existing = db.query(User).filter(User.email == admin_email).first()
-    if not existing:
-        admin = User(
-            full_name="Peter",
-            user_name="admin",
-            email=admin_email,
-            password=pwd_context.hash(ADMIN_PASSWORD),
-            role=UserRole.ADMIN,
-            email_verified=True
-        )
-        db.add(admin)
-        db.commit()
-        db.refresh(admin)
-        print(f"Admin seeded: {admin.email}")
-    else:
-        print("Admin already exists")
-seed_admin()
+#Admission gate saturated; see security_utilities/admission.py
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, please retry shortly"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 #routes
 @app.get("/")
-def root():
+async def root():
     return {"message":"Server is running"}
 
 
 
+#Prometheus scrape target; sums every live worker, whichever one answers
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/admin/dashboard")
-def admin_dashboard(user=Depends(admin_required)):
+async def admin_dashboard(user=Depends(admin_required)):
     return {"message":f"Welcome Admin {user.full_name}!"}
 
 app.include_router(router)
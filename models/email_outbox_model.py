@@ -0,0 +1,35 @@
+from sqlalchemy import Column, String, Integer, DateTime, Text, Index
+from database.database_setup import Base
+import enum
+from datetime import datetime
+
+class EmailKind(str, enum.Enum):
+    VERIFICATION="verification"
+    PASSWORD_RESET="password_reset"
+
+class OutboxStatus(str, enum.Enum):
+    PENDING="pending"
+    SENDING="sending"
+    SENT="sent"
+    FAILED="failed"
+
+class EmailOutbox(Base):
+    __tablename__="email_outbox"
+
+    id=Column(Integer, primary_key=True, autoincrement=True)
+    kind=Column(String(32), nullable=False)
+    recipient=Column(String, nullable=False)
+    payload=Column(Text, nullable=False)  # JSON template context
+    status=Column(String(16), default=OutboxStatus.PENDING.value, nullable=False)
+    attempts=Column(Integer, default=0, nullable=False)
+    next_attempt_at=Column(DateTime, default=datetime.utcnow, nullable=False)
+    claimed_by=Column(String(64), nullable=True)
+    claimed_at=Column(DateTime, nullable=True)
+    last_error=Column(Text, nullable=True)
+    created_at=Column(DateTime, default=datetime.utcnow, nullable=False)
+    sent_at=Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        #The drain worker's claim query: WHERE status = ? AND next_attempt_at <= ? ORDER BY id
+        Index("ix_email_outbox_status_next_attempt", status, next_attempt_at, id),
+    )
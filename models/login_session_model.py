@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index
+from database.database_setup import Base
+from datetime import datetime
+
+class LoginSession(Base):
+    __tablename__="login_sessions"
+
+    id=Column(Integer, primary_key=True, autoincrement=True)
+    #The fam claim of every access and refresh token of one login
+    family=Column(String(64), nullable=False, unique=True)
+    user_id=Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    expires_at=Column(DateTime, nullable=False)
+    created_at=Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        #Deactivation revokes every family of the affected users
+        Index("ix_login_sessions_user_id", user_id),
+        #Pruned with the revocations: DELETE ... WHERE expires_at < now
+        Index("ix_login_sessions_expires_at", expires_at),
+    )
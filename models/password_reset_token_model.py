@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index
+from database.database_setup import Base
+from datetime import datetime
+
+class PasswordResetToken(Base):
+    __tablename__="password_reset_tokens"
+
+    id=Column(Integer, primary_key=True, autoincrement=True)
+    #SHA-256 of the emailed token; the token itself is never stored
+    token_hash=Column(String(64), nullable=False, unique=True)
+    user_id=Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    expires_at=Column(DateTime, nullable=False)
+    created_at=Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        #One live token per user: a new request or a completed reset deletes by user_id
+        Index("ix_password_reset_tokens_user_id", user_id),
+        #Sweeper: DELETE ... WHERE expires_at < now, in id chunks
+        Index("ix_password_reset_tokens_expires_at", expires_at),
+    )
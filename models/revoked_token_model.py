@@ -0,0 +1,26 @@
+from sqlalchemy import Column, String, Integer, DateTime, Index
+from database.database_setup import Base
+import enum
+from datetime import datetime
+
+class RevocationKind(str, enum.Enum):
+    TOKEN="token"    # one refresh token's jti, spent by rotation
+    FAMILY="family"  # every token of one login session (logout, reuse detected)
+
+class RevokedToken(Base):
+    __tablename__="revoked_tokens"
+
+    #Workers poll for rows with id above the last one they saw, so ids must never be reused
+    id=Column(Integer, primary_key=True, autoincrement=True)
+    token_id=Column(String(64), nullable=False, unique=True)
+    kind=Column(String(16), nullable=False)
+    expires_at=Column(DateTime, nullable=False)
+    revoked_at=Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        #Pruning: DELETE ... WHERE expires_at < now
+        Index("ix_revoked_tokens_expires_at", expires_at),
+        #Workers load families only: WHERE kind = 'family' AND id > ? ORDER BY id
+        Index("ix_revoked_tokens_kind_id", kind, id),
+        {"sqlite_autoincrement": True},
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, Integer, Enum, DateTime
+from sqlalchemy import Column, String, Boolean, Integer, Enum, DateTime, Index, event, func, inspect
 from database.database_setup import Base
 import enum
 from datetime import datetime
@@ -11,15 +11,37 @@ class UserRole(enum.Enum):
 class User(Base):
     __tablename__="users"
 
-    id=Column(Integer, primary_key=True, index=True, autoincrement=True)
+    #Never reused: reset tokens, sessions and ETags ("u{id}.{row_version}") of a deleted user must not carry over
+    id=Column(Integer, primary_key=True, autoincrement=True)
     full_name=Column(String,nullable=False)
     user_name=Column(String, unique=True, nullable=False)
     email=Column(String, unique=True, nullable=False)
-    password=Column(String(255),unique=True,nullable=False)
+    password=Column(String(255),nullable=False)
     role=Column(Enum(UserRole), default=UserRole.ANONYMOUS_USER,nullable=False)
     is_active=Column(Boolean, default=True)
     time_registered=Column(DateTime, default=datetime.utcnow)
     email_verified=Column(Boolean, default=False)
+    #Bumped by every UPDATE; the resource ETags are built from it
+    row_version=Column(Integer, nullable=False, default=1, server_default="1")
 
-    password_reset_token = Column(String(255), nullable=True)
-    password_reset_token_expiry = Column(DateTime, nullable=True)
\ No newline at end of file
+    __table_args__ = (
+        #Case-insensitive lookups: WHERE lower(email) = ? / lower(user_name) = ?
+        Index("ix_users_email_lower", func.lower(email)),
+        Index("ix_users_user_name_lower", func.lower(user_name)),
+        #Admin listings filtered by role and ordered by registration time
+        Index("ix_users_role_time_registered", role, time_registered),
+        #Keyset pagination: every listing filter paired with each sort key (id, time_registered)
+        Index("ix_users_time_registered_id", time_registered, id),
+        Index("ix_users_role_id", role, id),
+        Index("ix_users_verified_active_id", email_verified, is_active, id),
+        Index("ix_users_verified_active_time_registered", email_verified, is_active, time_registered, id),
+        {"sqlite_autoincrement": True},
+    )
+
+
+@event.listens_for(User, "before_update")
+def _bump_row_version(mapper, connection, target):
+    #ORM flushes only; bulk UPDATE statements add row_version=User.row_version + 1 themselves.
+    #Incremented in SQL, so two concurrent writers never settle on the same version
+    if inspect(target).session.is_modified(target, include_collections=False):
+        target.row_version = User.row_version + 1
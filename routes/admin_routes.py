@@ -1,9 +1,22 @@
+from datetime import datetime
+from typing import Literal, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from sqlalchemy.orm import Session
-from database.database_setup import get_db
-from models.user_model import User
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.database_setup import get_db, get_read_db
+from database.replica import snapshot_replica
+from models.user_model import User, UserRole
 from security_utilities.dependencies import admin_required
-from schemas.user_schema import UserResponse
+from security_utilities.principal_cache import Principal, invalidate_principal, principal_cache
+from security_utilities.revocation import revocation_index
+from security_utilities.token_cache import token_cache
+from config import ADMIN_BATCH_MAX_ITEMS, ADMIN_PAGE_MAX_LIMIT
+from schemas.user_schema import BatchResult, BatchTarget, BatchUpdate, UserPage, UserResponse, user_response_encoder
+from services.user_batch import batch_delete, batch_update
+from services.user_directory import InvalidCursor, approximate_total, fetch_page
+from services.etags import conditional_response, page_etag, user_etag
+from services.user_export import EXPORT_COLUMNS, build_export_query, export_csv, export_ndjson
 
 
 
@@ -12,23 +25,105 @@ router = APIRouter(prefix="/admin", tags=["Admin"])
 
 
 
-@router.get("/users", response_model=list[UserResponse])
-def get_all_users(db: Session = Depends(get_db), current_admin: User = Depends(admin_required), skip: int = Query(0), limit: int = Query(10)):
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+@router.get("/users", response_model=UserPage)
+async def get_all_users(
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    current_admin: Principal = Depends(admin_required),
+    limit: int = Query(10, ge=1, le=ADMIN_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    sort: Literal["id", "time_registered"] = Query("id"),
+    descending: bool = Query(False),
+    role: Optional[UserRole] = Query(None),
+    verified: Optional[bool] = Query(None),
+    is_active: Optional[bool] = Query(None),
+    registered_after: Optional[datetime] = Query(None),
+    registered_before: Optional[datetime] = Query(None),
+    include_total: bool = Query(False, description="Add an approximate total instead of an exact COUNT(*)"),
+):
+    filters = dict(role=role, verified=verified, is_active=is_active,
+                   registered_after=registered_after, registered_before=registered_before)
+    try:
+        items, next_cursor = await fetch_page(db, limit, sort, descending, cursor, **filters)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    total = await approximate_total(db, **filters) if include_total else None
+    etag = page_etag(items, sorted(filters.items()), limit, cursor, sort, descending, next_cursor, total)
+    #Rows come from LISTING_COLUMNS and already match UserResponse: encode, don't re-validate
+    return conditional_response(request, etag, lambda: {
+        "items": user_response_encoder.to_dicts(items),
+        "next_cursor": next_cursor,
+        "approximate_total": total,
+    })
 
-@router.get("/users/{email}")
-def get_user_by_email(email: str, db: Session = Depends(get_db), current_admin: User = Depends(admin_required)):
-    user = db.query(User).filter(User.email == email).first()
+##Streaming export (declared before /users/{email} so "export" is not read as an email)
+@router.get("/users/export")
+async def export_users(
+    current_admin: Principal = Depends(admin_required),
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    columns: Optional[str] = Query(None, description="Comma separated, e.g. id,email,role"),
+    role: Optional[UserRole] = Query(None),
+    verified: Optional[bool] = Query(None),
+    is_active: Optional[bool] = Query(None),
+):
+    selected = [c.strip() for c in columns.split(",") if c.strip()] if columns else list(EXPORT_COLUMNS)
+    unknown = [c for c in selected if c not in EXPORT_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+
+    query = build_export_query(selected, role=role, verified=verified, is_active=is_active)
+    if format == "csv":
+        body, media_type = export_csv(query, selected), "text/csv"
+    else:
+        body, media_type = export_ndjson(query, selected), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'},
+    )
+
+@router.get("/users/{email}", response_model=UserResponse)
+async def get_user_by_email(request: Request, email: str, db: AsyncSession = Depends(get_read_db), current_admin: Principal = Depends(admin_required)):
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    #UserResponse fields only; the ORM object itself would serialise the password hash
+    return conditional_response(request, user_etag(user), lambda: user_response_encoder.to_dict(user))
 
 @router.delete("/users/{email}")
-def delete_user(email: str, db: Session = Depends(get_db), current_admin: User = Depends(admin_required)):
-    user = db.query(User).filter(User.email == email).first()
+async def delete_user(email: str, db: AsyncSession = Depends(get_db), current_admin: Principal = Depends(admin_required)):
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
+    invalidate_principal(user.email)
     return {"message": f"User '{email}' deleted successfully"}
+
+##Batch mutations
+def _check_batch_size(target: BatchTarget):
+    items = len(target.emails if target.emails is not None else target.ids or [])
+    if items > ADMIN_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {ADMIN_BATCH_MAX_ITEMS} items per batch")
+
+@router.post("/users/batch-delete", response_model=BatchResult)
+async def delete_users(target: BatchTarget, db: AsyncSession = Depends(get_db), current_admin: Principal = Depends(admin_required)):
+    _check_batch_size(target)
+    #Up to ADMIN_BATCH_MAX_ITEMS results, built to match BatchResult already
+    return ORJSONResponse(await batch_delete(db, target, current_admin.id))
+
+@router.post("/users/batch-update", response_model=BatchResult)
+async def update_users(changes: BatchUpdate, db: AsyncSession = Depends(get_db), current_admin: Principal = Depends(admin_required)):
+    _check_batch_size(changes)
+    return ORJSONResponse(await batch_update(db, changes, current_admin.id))
+
+@router.get("/cache-stats")
+async def get_cache_stats(current_admin: Principal = Depends(admin_required)):
+    return {
+        "principal_cache": principal_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "revocation_index": revocation_index.stats(),
+        "replica_snapshot": snapshot_replica.stats() if snapshot_replica else None,
+    }
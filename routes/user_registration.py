@@ -1,52 +1,56 @@
-import secrets
 import datetime as dt
 from fastapi.responses import HTMLResponse
 import jwt as pwjt
-from pydantic import BaseModel
-from urllib3 import request
 from config import limiter
-from fastapi import  BackgroundTasks,APIRouter, Request, Response
-from sqlalchemy.orm import Session
-from config import ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS, SECRET_KEY, ALGORITHIM
+from fastapi import APIRouter, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import (
+    ACCESS_TOKEN_EXPIRE_MINUTES, PASSWORD_REHASH_ON_LOGIN, REFRESH_REUSE_GRACE_SECONDS, REFRESH_TOKEN_EXPIRE_DAYS,
+)
 from models.user_model import User
-from passlib.context import CryptContext
 from datetime import timedelta, timezone
-from database.database_setup import get_db
+from database.database_setup import get_db, get_primary_read_db
 from fastapi import HTTPException, status, Depends, Cookie
 from fastapi.security import OAuth2PasswordRequestForm
 from security_utilities.auth import create_access_token
 from security_utilities.dependencies import create_refresh_token, get_current_user
-from schemas.user_schema import UserCreate
-from security_utilities.pass_hash import hash_password, verify_password
+from security_utilities.principal_cache import Principal, invalidate_principal
+from security_utilities.token_cache import decode_token, token_cache
+from security_utilities.revocation import family_expiry, new_token_id, revocation_index
+from models.revoked_token_model import RevocationKind
+from schemas.user_schema import UserCreate, UserProfileResponse, user_profile_encoder
+from security_utilities.pass_hash import HashingQueueFull, hash_password_async, verify_password_async
+from security_utilities.hash_policy import needs_rehash
+from security_utilities.admission import admit, login_gate, signup_gate
 from security_utilities.email_verification import create_email_token
-from services.email_service import send_verification_email, send_reset_email
+from services.email_outbox import queue_email
+from services.password_reset import consume_reset_tokens, find_reset_user
+from services.etags import conditional_response, user_etag
+from models.email_outbox_model import EmailKind
 from security_utilities.email_verification import verify_email_token
-from fastapi_mail import FastMail, MessageSchema
-from config import mail_config
-from passlib.hash import bcrypt
 from fastapi import Form
 import fastapi.templating as Jinja
 from schemas.user_schema import UserLogin
+from services.metrics import TimedTemplate
 
 templates = Jinja.Jinja2Templates(directory="templates/email_templates")
+templates.env.template_class = TimedTemplate
 
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 router = APIRouter(prefix="/users")
 
 
 ##Registration endpoint
-@router.post("/register")
+@router.post("/register", dependencies=[admit(signup_gate)])
 @limiter.limit("5/minute")
 async def register_user(
     request:Request,
     user: UserCreate, 
-    background_tasks:BackgroundTasks,
-    db: Session = Depends(get_db)):
+    db: AsyncSession = Depends(get_db)):
 
     #Existing user
-    existing_user = db.query(User).filter(User.email == user.email).first()
-    user_name_exists=db.query(User).filter(User.user_name == user.user_name).first()
+    existing_user = (await db.execute(select(User.id).where(func.lower(User.email) == user.email.lower()))).first()
+    user_name_exists = (await db.execute(select(User.id).where(func.lower(User.user_name) == user.user_name.lower()))).first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -57,8 +61,8 @@ async def register_user(
             status_code=400,
             detail=f"Username {user.user_name} exists, choose another one!"
         )
-    # Hash the password
-    hashed_password = hash_password(user.password)
+    # Hash the password off the event loop
+    hashed_password = await hash_password_async(user.password)
     
 
     new_user = User(
@@ -70,11 +74,10 @@ async def register_user(
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-
+    #Outbox row commits atomically with the user; the email worker delivers it
     token = create_email_token(new_user.email)
-    background_tasks.add_task(send_verification_email, new_user.email, token)
+    queue_email(db, EmailKind.VERIFICATION, new_user.email, token=token)
+    await db.commit()
 
 
     return {
@@ -84,10 +87,11 @@ async def register_user(
 
 
 ##Login route
-@router.post("/login")
-def login(login_req: UserLogin, response:Response, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.user_name == login_req.user_name).first()
-    if not user or not verify_password(login_req.password, user.password):
+@router.post("/login", dependencies=[admit(login_gate)])
+@limiter.limit("5/minute")
+async def login(request: Request, login_req: UserLogin, response:Response, db: AsyncSession = Depends(get_db)):
+    user = (await db.execute(select(User).where(User.user_name == login_req.user_name))).scalars().first()
+    if not user or not await verify_password_async(login_req.password, user.password):
         raise HTTPException(
             status_code=401,
             detail="Invalid credentials",
@@ -99,12 +103,24 @@ def login(login_req: UserLogin, response:Response, db: Session = Depends(get_db)
             detail="Email not verified, please verify your email first!",
             headers={"WWW-Authenticate": "Bearer"}
         )
+    if not user.is_active:
+        raise HTTPException(status_code=403, detail="Account deactivated")
+    if PASSWORD_REHASH_ON_LOGIN and needs_rehash(user.password):
+        #Only login sees the plaintext, so hashes below policy are upgraded here
+        try:
+            user.password = await hash_password_async(login_req.password)
+            await db.commit()
+        except HashingQueueFull:
+            pass  # best effort; the next login retries
 
     token_data = {
         "sub": user.email,
         "role": user.role.value,
-        "exp": dt.datetime.now(timezone.utc) + timedelta(hours=1)
+        "exp": dt.datetime.now(timezone.utc) + timedelta(hours=1),
+        "fam": new_token_id(),  # this login session; logout revokes it
     }
+    #Recorded so that deactivating the user can revoke this session too
+    revocation_index.record_session(db, token_data["fam"], user.id)
     access_token = create_access_token(token_data)
     refresh_token = create_refresh_token(token_data)
 
@@ -130,47 +146,49 @@ def login(login_req: UserLogin, response:Response, db: Session = Depends(get_db)
 
 
 ##User profile
-class UserProfileResponse(BaseModel):
-    id: int
-    full_name: str
-    user_name: str
-    email: str
-    role: str
-
 @router.get("/my-profile", response_model=UserProfileResponse, summary="Get current user's profile")
-def get_my_profile(current_user: User = Depends(get_current_user)) -> UserProfileResponse:
+async def get_my_profile(request: Request, current_user: Principal = Depends(get_current_user)):
     """
     Retrieve the profile information of the currently authenticated user.
     """
-    return UserProfileResponse(
-        id=current_user.id,
-        full_name=current_user.full_name,
-        user_name=current_user.user_name,
-        email=current_user.email,
-        role=current_user.role.value
-    )
+    #Tag from the principal: a poll that changed nothing costs no query and no encoding
+    return conditional_response(request, user_etag(current_user), lambda: user_profile_encoder.to_dict(current_user))
 
 
 ##User Logout
 @router.post("/logout")
-def logout(response: Response):
-    response.delete_cookie(
-        key="access_token",
-        httponly=True,
-        secure=True,      # same flags as login
-        samesite="Strict"
-    )
+async def logout(
+    response: Response,
+    access_token: str = Cookie(None),
+    refresh_token: str = Cookie(None),
+    db: AsyncSession = Depends(get_db)):
+    #Revoking the session family kills every access and refresh token of this login, not just the cookies
+    for token in (refresh_token, access_token):
+        try:
+            family = decode_token(token).get("fam") if token else None
+        except pwjt.PyJWTError:
+            continue
+        if family:
+            await revocation_index.revoke(db, family, RevocationKind.FAMILY, family_expiry())
+            break
+    for key in ("access_token", "refresh_token"):
+        response.delete_cookie(
+            key=key,
+            httponly=True,
+            secure=True,      # same flags as login
+            samesite="Strict"
+        )
     return {"detail": "Logged out successfully"}
 
 
 ##Token refresh
 @router.post("/refresh")
-def refresh_token(response: Response, refresh_token: str = Cookie(None)):
+async def refresh_token(response: Response, refresh_token: str = Cookie(None), db: AsyncSession = Depends(get_db)):
     if not refresh_token:
         raise HTTPException(status_code=401, detail="No refresh token provided")
 
     try:
-        payload = pwjt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHIM])
+        payload = decode_token(refresh_token)
         user_email = payload.get("sub")
         if not user_email:
             raise HTTPException(status_code=401, detail="Invalid refresh token")
@@ -179,8 +197,24 @@ def refresh_token(response: Response, refresh_token: str = Cookie(None)):
     except pwjt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
-    # create new access token
-    new_access_token = create_access_token({"sub": user_email})
+    jti, family = payload.get("jti"), payload.get("fam")
+    if payload.get("typ") != "refresh" or not jti or not family:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    if await revocation_index.is_revoked(db, family):
+        raise HTTPException(status_code=401, detail="Refresh token revoked")
+
+    #Rotation: spending the jti is a unique insert, so each refresh token works once. A second
+    #use means it was copied; revoke the whole session rather than guess which holder is real.
+    #Within REFRESH_REUSE_GRACE_SECONDS it is two tabs or a retry racing, and gets its own rotation.
+    if not await revocation_index.revoke(db, jti, RevocationKind.TOKEN, payload["exp"]):
+        spent_at = await revocation_index.revoked_at(db, jti)
+        if spent_at is None or dt.datetime.utcnow() - spent_at > timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS):
+            await revocation_index.revoke(db, family, RevocationKind.FAMILY, family_expiry())
+            raise HTTPException(status_code=401, detail="Refresh token reuse detected, please log in again")
+    token_cache.discard(refresh_token)
+
+    token_data = {"sub": user_email, "fam": family}
+    new_access_token = create_access_token(token_data)
     response.set_cookie(
         "access_token", 
         new_access_token, 
@@ -188,15 +222,23 @@ def refresh_token(response: Response, refresh_token: str = Cookie(None)):
         secure=True,
         samesite="Strict"
     )
+    response.set_cookie(
+        key="refresh_token",
+        value=create_refresh_token(token_data),
+        httponly=True,
+        secure=False,         # set to True in production
+        samesite="None",
+        max_age=REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+    )
 
     return {"detail": "Token refreshed"}
 
 
 ##email verification
 @router.get("/verify", response_class=HTMLResponse)
-def verify_account(request:Request, token: str, db: Session = Depends(get_db)):
+async def verify_account(request:Request, token: str, db: AsyncSession = Depends(get_db)):
     email = verify_email_token(token)
-    user = db.query(User).filter(User.email == email).first()
+    user = (await db.execute(select(User).where(User.email == email))).scalars().first()
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -204,7 +246,8 @@ def verify_account(request:Request, token: str, db: Session = Depends(get_db)):
         return templates.TemplateResponse("account_already_verified.html", {"request": request})
 
     user.email_verified = True
-    db.commit()
+    await db.commit()
+    invalidate_principal(user.email)
     return templates.TemplateResponse(
         "account_registration_success.html", {"request": request}
     )
@@ -212,29 +255,28 @@ def verify_account(request:Request, token: str, db: Session = Depends(get_db)):
 
 ##Resend verification
 @router.get("/resend-verification")
-async def resend_verification(email: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == email).first()
+async def resend_verification(email: str, db: AsyncSession = Depends(get_db)):
+    user = (await db.execute(select(User).where(User.email == email))).scalars().first()
     if user and not user.email_verified:
-        token = create_email_token(user)
-        await send_verification_email(user.email, token)
+        token = create_email_token(user.email)
+        queue_email(db, EmailKind.VERIFICATION, user.email, token=token)
+        await db.commit()
         return {"detail": "Verification email resent!"}
     return {"detail": "User already verified or not found."}
 
 
 ##reset password
 @router.post("/forgot-password")
-def forgot_password(request: Request, background_tasks: BackgroundTasks, email: str=Form(...), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == email).first()
+@limiter.limit("5/minute")
+async def forgot_password(request: Request, email: str=Form(...), db: AsyncSession = Depends(get_db)):
+    user = (await db.execute(select(User).where(User.email == email))).scalars().first()
     if not user:
         return {"detail": "User not found."}
 
-    token = secrets.token_urlsafe(3)
-    expiry = dt.datetime.now(dt.timezone.utc) + dt.timedelta(hours=1)
-    user.password_reset_token = token
-    user.password_reset_token_expiry = expiry
-    db.commit()
+    #No token yet: the outbox worker issues it when it sends the email, so it is never stored in clear
+    queue_email(db, EmailKind.PASSWORD_RESET, user.email)
+    await db.commit()
 
-    background_tasks.add_task(send_reset_email, user.email, token)  # send email with reset link
     return templates.TemplateResponse(
         "reset_password_request.html",
         {"request": request, "detail": "Password reset email sent if the email is registered."}
@@ -243,8 +285,8 @@ def forgot_password(request: Request, background_tasks: BackgroundTasks, email:
     
 ##Reset password form
 @router.get("/reset-password")
-def reset_password_form(request: Request, token: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.password_reset_token == token).first()
+async def reset_password_form(request: Request, token: str, db: AsyncSession = Depends(get_primary_read_db)):
+    user = await find_reset_user(db, token)
     if not user:
         return templates.TemplateResponse(
             "reset_password_request.html",
@@ -258,10 +300,10 @@ def reset_password_form(request: Request, token: str, db: Session = Depends(get_
     )
 
 ##Reset Password
-@router.post("/reset-password")
-def reset_password_post(request: Request, token: str = Form(...), new_password: str = Form(...), confirm_password: str = Form(...), db: Session = Depends(get_db)):
-    # Step 1: Validate token
-    user = db.query(User).filter(User.password_reset_token == token).first()
+@router.post("/reset-password", dependencies=[admit(signup_gate)])
+async def reset_password_post(request: Request, token: str = Form(...), new_password: str = Form(...), confirm_password: str = Form(...), db: AsyncSession = Depends(get_db)):
+    # Step 1: Validate token (unknown and expired tokens both miss)
+    user = await find_reset_user(db, token)
     if not user:
         return templates.TemplateResponse("reset_password_request.html", {"request": request, "valid_token": False})
 
@@ -273,13 +315,11 @@ def reset_password_post(request: Request, token: str = Form(...), new_password:
         )
     # Step 3: Hash new password
     
-    hashed_password = bcrypt.hash(new_password)
-
-    # Step 4: Update user password in DB
-    update_user_password(user.id, hashed_password, db)
+    hashed_password = await hash_password_async(new_password)
 
-    # Step 5: Invalidate token
-    invalidate_token(token, db)
+    # Step 4: Update user password in DB and invalidate the token, on the row loaded in step 1
+    await update_user_password(user, hashed_password, db)
+    invalidate_principal(user.email)
 
     return templates.TemplateResponse(
         "password_reset_success.html",
@@ -288,25 +328,18 @@ def reset_password_post(request: Request, token: str = Form(...), new_password:
     # Step 6: Show success page or redirect to login
   
 
-async def update_user_password(user_id: int, hashed_password: str, db: Session):
-    user = db.query(User).filter(User.id == user_id).first()
-    if user:
-        user.password = hashed_password
-        user.password_reset_token = None
-        user.password_reset_token_expiry = None
-        db.commit()
-
-async def invalidate_token(token: str, db: Session):
-    user = db.query(User).filter(User.password_reset_token == token).first()
-    if user:
-        user.password_reset_token = None
-        user.password_reset_token_expiry = None
-        db.commit()
+async def update_user_password(user: User, hashed_password: str, db: AsyncSession):
+    user.password = hashed_password
+    await consume_reset_tokens(db, user.id)
+    await db.commit()
 
 
 ##Testmail
 @router.get("/test-email")
 async def test_email():
+    from fastapi_mail import FastMail, MessageSchema
+    from config import mail_config
+
     message = MessageSchema(
         subject="Hello from Tech Pulse 🚀",
         recipients=["test@receiver.com"],  # Doesn’t matter, MailHog catches everything
@@ -1,5 +1,7 @@
+import operator
 from datetime import datetime
-from pydantic import BaseModel, EmailStr
+from typing import Literal, Optional
+from pydantic import BaseModel, EmailStr, model_validator
 from models.user_model import UserRole
 
 class UserCreate(BaseModel):
@@ -21,9 +23,95 @@ class UserResponse(BaseModel):
 
     class Config:
         from_attributes=True
+
+class UserProfileResponse(BaseModel):
+    id:int
+    full_name:str
+    user_name:str
+    email:str
+    role:str
+
+class UserPage(BaseModel):
+    items:list[UserResponse]
+    next_cursor:Optional[str]=None
+    approximate_total:Optional[int]=None
+
 class UserLogin(BaseModel):
     user_name:str
     password:str
 
     class Config:
         from_attributes=True
+
+
+##Admin batch operations
+class UserFilter(BaseModel):
+    role:Optional[UserRole]=None
+    verified:Optional[bool]=None
+    is_active:Optional[bool]=None
+    registered_after:Optional[datetime]=None
+    registered_before:Optional[datetime]=None
+
+class BatchTarget(BaseModel):
+    """Exactly one of emails, ids or filter. A filter must set at least one field."""
+    emails:Optional[list[str]]=None
+    ids:Optional[list[int]]=None
+    filter:Optional[UserFilter]=None
+
+    @model_validator(mode="after")
+    def one_selector(self):
+        given=[name for name in ("emails", "ids", "filter") if getattr(self, name) is not None]
+        if len(given) != 1:
+            raise ValueError("Provide exactly one of emails, ids or filter")
+        if self.filter is not None and not self.filter.model_dump(exclude_none=True):
+            raise ValueError("An empty filter would match every user")
+        return self
+
+class BatchUpdate(BatchTarget):
+    is_active:Optional[bool]=None
+    role:Optional[UserRole]=None
+
+    @model_validator(mode="after")
+    def has_changes(self):
+        if self.is_active is None and self.role is None:
+            raise ValueError("Nothing to change: set is_active and/or role")
+        return self
+
+class BatchItemResult(BaseModel):
+    key:str
+    id:Optional[int]=None
+    outcome:Literal["deleted", "updated", "unchanged", "not_found", "skipped"]
+
+class BatchResult(BaseModel):
+    matched:int
+    affected:int
+    results:list[BatchItemResult]
+
+
+##Precompiled serializers
+class ObjectEncoder:
+    """Builds a response schema's JSON-ready dicts straight from attributes.
+
+    The field list and getter are compiled once per schema. Rows, ORM objects
+    and Principals from our own tables already satisfy the schema, so routes
+    return `ORJSONResponse(encoder.to_dict(obj))` and skip the pydantic model
+    per object, its re-validation (EmailStr is most of the cost) and
+    jsonable_encoder. orjson writes enums by value and naive datetimes in the
+    same ISO 8601 form as pydantic. Keep `response_model` on the route for the
+    OpenAPI schema; FastAPI passes a returned Response through untouched.
+    """
+
+    def __init__(self, model: type[BaseModel]):
+        self.fields = tuple(model.model_fields)
+        self._values = operator.attrgetter(*self.fields)
+
+    def to_dict(self, obj) -> dict:
+        return dict(zip(self.fields, self._values(obj)))
+
+    def to_dicts(self, objs) -> list[dict]:
+        fields, values = self.fields, self._values
+        return [dict(zip(fields, values(obj))) for obj in objs]
+
+
+user_response_encoder = ObjectEncoder(UserResponse)
+user_profile_encoder = ObjectEncoder(UserProfileResponse)
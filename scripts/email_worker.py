@@ -0,0 +1,50 @@
+import asyncio
+import typer
+from config import OUTBOX_BATCH_SIZE, OUTBOX_POLL_SECONDS, OUTBOX_SENT_RETENTION_HOURS
+from services.email_outbox import outbox_counts, prune_sent, run_worker
+
+app = typer.Typer(help="Deliver queued emails from the email_outbox table.")
+
+
+@app.command("run")
+def run(
+    batch_size: int = typer.Option(OUTBOX_BATCH_SIZE, "--batch-size", "-b", help="Rows claimed per batch"),
+    poll_seconds: float = typer.Option(OUTBOX_POLL_SECONDS, "--poll", help="Sleep between empty polls"),
+    once: bool = typer.Option(False, "--once", help="Exit when no due emails remain"),
+):
+    """
+    Claim due outbox rows in batches, send them and record delivery state.
+    """
+    typer.secho(f"Email worker started (batch={batch_size}, poll={poll_seconds}s)", fg=typer.colors.GREEN)
+    try:
+        asyncio.run(run_worker(batch_size=batch_size, poll_seconds=poll_seconds, once=once))
+    except KeyboardInterrupt:
+        typer.secho("Email worker stopped", fg=typer.colors.YELLOW)
+
+
+@app.command("prune")
+def prune(
+    retention_hours: float = typer.Option(OUTBOX_SENT_RETENTION_HOURS, "--retention-hours", help="Keep sent rows this long"),
+):
+    """
+    Delete sent rows older than the retention window (the worker also does this periodically).
+    """
+    removed = asyncio.run(prune_sent(retention_hours))
+    typer.secho(f"✔ Pruned {removed} sent emails", fg=typer.colors.GREEN)
+
+
+@app.command("status")
+def status():
+    """
+    Show outbox row counts by delivery state.
+    """
+    counts = asyncio.run(outbox_counts())
+    if not counts:
+        typer.secho("Outbox is empty", fg=typer.colors.YELLOW)
+    for state, count in sorted(counts.items()):
+        typer.echo(f"{state:<8} {count}")
+
+
+if __name__ == "__main__":
+    # `python -m scripts.email_worker run`
+    app()
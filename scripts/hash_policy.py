@@ -0,0 +1,57 @@
+import time
+from typing import Optional
+import typer
+from config import PASSWORD_HASH_MEMORY_MB, PASSWORD_HASH_PARALLELISM, PASSWORD_HASH_TARGET_MS
+from security_utilities.hash_policy import SCHEMES, calibrate, get_policy, hash_with, verify
+
+app = typer.Typer(help="Calibrate and inspect the password hashing policy.")
+
+
+def measure(policy, runs: int = 3) -> tuple[float, float]:
+    """Best hash and verify time in ms at this policy."""
+    hash_ms, verify_ms = float("inf"), float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        hashed = hash_with("calibration-password", policy)
+        hash_ms = min(hash_ms, (time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        verify("calibration-password", hashed)
+        verify_ms = min(verify_ms, (time.perf_counter() - started) * 1000)
+    return hash_ms, verify_ms
+
+
+@app.command("calibrate")
+def calibrate_cmd(
+    target_ms: float = typer.Option(PASSWORD_HASH_TARGET_MS, "--target-ms", help="Time one hash should take"),
+    scheme: Optional[str] = typer.Option(None, "--scheme", help="bcrypt, scrypt or argon2 (default: all)"),
+    memory_mb: int = typer.Option(PASSWORD_HASH_MEMORY_MB, "--memory-mb", help="argon2 memory, scrypt ceiling"),
+    parallelism: int = typer.Option(PASSWORD_HASH_PARALLELISM, "--parallelism"),
+):
+    """
+    Find the cost that hits --target-ms on this host and print the settings to pin.
+    """
+    for name in [scheme] if scheme else SCHEMES:
+        try:
+            policy = calibrate(name, target_ms, memory_mb, parallelism)
+        except (RuntimeError, ValueError) as e:
+            typer.secho(f"✘ {name}: {e}", fg=typer.colors.RED)
+            continue
+        hash_ms, verify_ms = measure(policy)
+        typer.secho(f"{policy.describe()}: hash {hash_ms:.0f}ms, verify {verify_ms:.0f}ms", fg=typer.colors.GREEN)
+        typer.echo(f"  PASSWORD_SCHEME={name} PASSWORD_HASH_COST={policy.cost}"
+                   + (f" PASSWORD_HASH_MEMORY_MB={memory_mb}" if name == "argon2" else ""))
+
+
+@app.command("show")
+def show():
+    """
+    Print the active policy (from the environment) and what one hash costs here.
+    """
+    policy = get_policy()
+    hash_ms, verify_ms = measure(policy)
+    typer.echo(f"hash {hash_ms:.0f}ms, verify {verify_ms:.0f}ms")
+
+
+if __name__ == "__main__":
+    # `python -m scripts.hash_policy calibrate --target-ms 250`
+    app()
@@ -0,0 +1,43 @@
+from typing import Optional
+import typer
+from sqlalchemy import create_engine
+from database.database_setup import engine as app_engine
+from database import migrations
+
+app = typer.Typer(help="Upgrade an existing database (e.g. users.db) to the current schema.")
+
+
+def resolve_engine(database_url: Optional[str]):
+    return create_engine(database_url) if database_url else app_engine
+
+
+@app.command("upgrade")
+def upgrade(
+    database_url: Optional[str] = typer.Option(None, "--database-url", help="Defaults to DATABASE_URL"),
+):
+    """
+    Apply all pending migrations in place.
+    """
+    engine = resolve_engine(database_url)
+    applied = migrations.upgrade(engine)
+    if applied:
+        typer.secho(f"✔ Applied migrations: {', '.join(map(str, applied))}", fg=typer.colors.GREEN)
+    else:
+        typer.secho("ℹ Database already up to date", fg=typer.colors.YELLOW)
+
+
+@app.command("status")
+def status(
+    database_url: Optional[str] = typer.Option(None, "--database-url", help="Defaults to DATABASE_URL"),
+):
+    """
+    Show the applied and latest schema versions.
+    """
+    current, latest = migrations.status(resolve_engine(database_url))
+    colour = typer.colors.GREEN if current == latest else typer.colors.YELLOW
+    typer.secho(f"Schema version {current} (latest {latest})", fg=colour)
+
+
+if __name__ == "__main__":
+    # `python -m scripts.migrate_db upgrade`
+    app()
@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime, timedelta
+import typer
+from config import UNVERIFIED_MAX_AGE_HOURS, UNVERIFIED_PURGE_CHUNK, UNVERIFIED_PURGE_PAUSE_MS
+from services.user_purge import purge_bounds, purge_unverified
+
+app = typer.Typer(help="Delete accounts that never verified their email.")
+
+
+@app.command("run")
+def run(
+    max_age_hours: float = typer.Option(UNVERIFIED_MAX_AGE_HOURS, "--max-age-hours", help="Only accounts registered before this"),
+    chunk_size: int = typer.Option(UNVERIFIED_PURGE_CHUNK, "--chunk-size", "-c", help="Ids per DELETE transaction"),
+    pause_ms: float = typer.Option(UNVERIFIED_PURGE_PAUSE_MS, "--pause-ms", help="Pause between chunks"),
+    quiet: bool = typer.Option(False, "--quiet", "-q", help="Only print the summary"),
+):
+    """
+    Purge stale unverified accounts in id-range chunks, reporting each chunk's lock time.
+    """
+    def report(chunk):
+        if not quiet:
+            typer.echo(f"  ids {chunk.first_id}-{chunk.last_id}: removed {chunk.removed}, lock {chunk.lock_ms:.1f}ms")
+
+    result = asyncio.run(purge_unverified(max_age_hours, chunk_size, pause_ms, on_chunk=report))
+    if not result.removed:
+        typer.secho(f"ℹ No unverified accounts registered before {result.cutoff:%Y-%m-%d %H:%M} UTC", fg=typer.colors.YELLOW)
+        return
+    typer.secho(
+        f"✔ Purged {result.removed} unverified accounts in {len(result.chunks)} chunks "
+        f"(longest lock {result.max_lock_ms:.1f}ms)", fg=typer.colors.GREEN,
+    )
+
+
+@app.command("status")
+def status(
+    max_age_hours: float = typer.Option(UNVERIFIED_MAX_AGE_HOURS, "--max-age-hours"),
+):
+    """
+    Count the accounts a run would delete, without deleting anything.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+    low, high, count = asyncio.run(purge_bounds(cutoff))
+    if not count:
+        typer.secho("Nothing to purge", fg=typer.colors.YELLOW)
+        return
+    typer.echo(f"{count} unverified accounts registered before {cutoff:%Y-%m-%d %H:%M} UTC (ids {low}-{high})")
+
+
+if __name__ == "__main__":
+    # `python -m scripts.purge_unverified run`
+    app()
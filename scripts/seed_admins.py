@@ -2,9 +2,7 @@
 from sqlalchemy.orm import Session
 from database.database_setup import SessionLocal, engine, Base
 import models
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from security_utilities.pass_hash import hash_password
 
 def seed_admin():
     Base.metadata.create_all(bind=engine)
@@ -15,7 +13,7 @@ def seed_admin():
     if not existing:
         admin = models.User(
             email=admin_email,
-            password=pwd_context.hash("AdminPass123"),
+            password=hash_password("AdminPass123"),
             is_admin=True
         )
         db.add(admin)
@@ -1,12 +1,16 @@
+import os
+import resource
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from typing import Optional
 import typer
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, insert, select, update
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import IntegrityError
 from models.user_model import User, UserRole
 from database.database_setup import Base
-from security_utilities.pass_hash import hash_password
+from security_utilities.pass_hash import hash_password, hash_passwords
 
 DATABASE_URL= "sqlite:///./users.db"
 app = typer.Typer(help="Seed users into the database (admin + regular).")
@@ -131,76 +135,141 @@ def seed_admin(
         session.close()
 
 
+def _read_chunks(path: str, chunk_size: int):
+    """Yield lists of at most chunk_size CSV rows without loading the whole file."""
+    import csv
+
+    with open(path, newline="", encoding="utf-8") as f:
+        chunk = []
+        for row in csv.DictReader(f):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _existing(session, column, values):
+    """Map value -> user id for the values of `column` already in the table (one query per chunk)."""
+    if not values:
+        return {}
+    rows = session.execute(select(column, User.id).where(column.in_(values)))
+    return {value: user_id for value, user_id in rows}
+
+
 @app.command("bulk-csv")
 def bulk_csv(
     path: str = typer.Argument(..., help="CSV with columns: full_name,user_name,email,password,role,is_active"),
     skip_existing: bool = typer.Option(True, "--skip-existing/--no-skip-existing", help="Skip rows where email/username exists"),
+    chunk_size: int = typer.Option(2000, "--chunk-size", "-c", help="Rows read, hashed and committed per batch"),
+    workers: int = typer.Option(os.cpu_count() or 1, "--workers", "-w", help="Processes used for password hashing"),
 ):
     """
     Bulk import users from a CSV file.
-    """
-    import csv
 
+    The file is streamed in chunks. Each chunk is checked against the database
+    with two set-based queries, its passwords are hashed across all cores, and
+    it is written with executemany inserts/updates in a single commit.
+    """
     session = get_session()
     created = 0
     skipped = 0
     updated = 0
+    rows_read = 0
+    started = time.perf_counter()
 
     try:
-        with open(path, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                fn = row["full_name"].strip()
-                un = row["user_name"].strip()
-                em = row["email"].strip()
-                pw = row["password"]
-                role_raw = row.get("role", "USER").strip().upper()
-                is_active_raw = row.get("is_active", "true").strip().lower()
-
-                # Convert role
-                try:
-                    role = UserRole[role_raw]  # allows USER / ADMIN / ANONYMOUS_USER
-                except KeyError:
-                    typer.secho(f"✖ Invalid role '{role_raw}' for {em}. Skipping.", fg=typer.colors.RED)
-                    skipped += 1
-                    continue
-
-                is_active = is_active_raw in ("true", "1", "yes", "y")
-
-                existing_email = session.query(User).filter(User.email == em).first()
-                existing_uname = session.query(User).filter(User.user_name == un).first()
-
-                if (existing_email or existing_uname) and skip_existing:
-                    skipped += 1
-                    continue
-
-                if existing_email and not skip_existing:
-                    # update existing by email
-                    existing_email.full_name = fn
-                    existing_email.user_name = un
-                    existing_email.password = hash_password(pw)
-                    existing_email.role = role
-                    existing_email.is_active = is_active
-                    updated += 1
-                else:
-                    # new user
-                    u = User(
-                        full_name=fn,
-                        user_name=un,
-                        email=em,
-                        password=hash_password(pw),
-                        role=role,
-                        is_active=is_active,
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk in _read_chunks(path, chunk_size):
+                rows_read += len(chunk)
+                parsed = []
+                for row in chunk:
+                    em = row["email"].strip()
+                    role_raw = row.get("role", "USER").strip().upper()
+
+                    # Convert role
+                    try:
+                        role = UserRole[role_raw]  # allows USER / ADMIN / ANONYMOUS_USER
+                    except KeyError:
+                        typer.secho(f"✖ Invalid role '{role_raw}' for {em}. Skipping.", fg=typer.colors.RED)
+                        skipped += 1
+                        continue
+
+                    parsed.append({
+                        "full_name": row["full_name"].strip(),
+                        "user_name": row["user_name"].strip(),
+                        "email": em,
+                        "password": row["password"],
+                        "role": role,
+                        "is_active": row.get("is_active", "true").strip().lower() in ("true", "1", "yes", "y"),
+                    })
+
+                existing_emails = _existing(session, User.email, {r["email"] for r in parsed})
+                existing_unames = _existing(session, User.user_name, {r["user_name"] for r in parsed})
+
+                inserts, updates = [], []
+                seen_emails, seen_unames = set(), set()
+                for r in parsed:
+                    email_id = existing_emails.get(r["email"])
+                    uname_id = existing_unames.get(r["user_name"])
+                    duplicate_in_file = r["email"] in seen_emails or r["user_name"] in seen_unames
+                    seen_emails.add(r["email"])
+                    seen_unames.add(r["user_name"])
+
+                    if duplicate_in_file or ((email_id or uname_id) and skip_existing):
+                        skipped += 1
+                    elif email_id:
+                        if uname_id not in (None, email_id):
+                            typer.secho(f"✖ Username {r['user_name']} belongs to another user. Skipping.", fg=typer.colors.RED)
+                            skipped += 1
+                            continue
+                        # update existing by email
+                        updates.append({**r, "id": email_id})
+                    elif uname_id:
+                        typer.secho(f"✖ Username already exists: {r['user_name']}. Skipping.", fg=typer.colors.RED)
+                        skipped += 1
+                    else:
+                        # new user
+                        inserts.append(r)
+
+                # Hash only the rows that will be written, spread over all cores
+                to_write = inserts + updates
+                for r, hashed in zip(to_write, hash_passwords([r["password"] for r in to_write], executor)):
+                    r["password"] = hashed
+
+                if inserts:
+                    session.execute(insert(User), inserts)
+                if updates:
+                    session.execute(update(User), updates)
+                    #Bulk updates by primary key skip the ORM's before_update hook
+                    session.execute(
+                        update(User).where(User.id.in_([r["id"] for r in updates]))
+                        .values(row_version=User.row_version + 1)
                     )
-                    session.add(u)
-                    created += 1
+                session.commit()
+                created += len(inserts)
+                updated += len(updates)
 
-        session.commit()
+                elapsed = time.perf_counter() - started
+                typer.echo(f"  {rows_read} rows, {rows_read / elapsed:.0f} rows/s")
+
+        elapsed = time.perf_counter() - started
+        peak_self = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        peak_children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
         typer.secho(f"✔ Bulk import done. Created={created}, Updated={updated}, Skipped={skipped}", fg=typer.colors.GREEN)
+        typer.echo(
+            f"  {rows_read} rows in {elapsed:.1f}s ({rows_read / elapsed if elapsed else 0:.0f} rows/s), "
+            f"peak RSS {peak_self:.0f} MiB (largest hashing worker {peak_children:.0f} MiB)"
+        )
 
     except FileNotFoundError:
         typer.secho(f"✖ CSV not found: {path}", fg=typer.colors.RED)
         raise typer.Exit(code=1)
+    except IntegrityError as ie:
+        session.rollback()
+        typer.secho(f"✖ Integrity error: {ie}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
     finally:
         session.close()
 
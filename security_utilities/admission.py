@@ -0,0 +1,108 @@
+"""Admission control for the routes that hash or verify passwords.
+
+Each gate is a separate budget: ADMISSION_CONCURRENCY requests in flight per
+worker, then a FIFO queue of ADMISSION_QUEUE with a ADMISSION_QUEUE_TIMEOUT_MS
+deadline. Anything beyond that is shed at once with 503 + Retry-After, before
+the request takes a database connection or a hashing slot, so a login flood
+cannot starve sign-ups or the routes without a gate (/users/my-profile, /).
+"""
+import asyncio
+import time
+from collections import deque
+from fastapi import Depends
+from config import (
+    ADMISSION_CONCURRENCY, ADMISSION_ENABLED, ADMISSION_QUEUE, ADMISSION_QUEUE_TIMEOUT_MS, ADMISSION_RETRY_AFTER_SECONDS,
+)
+from services.metrics import admission_in_flight, admission_queue_depth, admission_rejections_total, admission_wait_seconds
+
+
+class AdmissionRejected(Exception):
+    """Raised when a gate is saturated; answered with 503 in main.py."""
+
+    def __init__(self, gate: str, reason: str):
+        super().__init__(f"{gate} gate {reason}")
+        self.gate = gate
+        self.reason = reason
+        self.retry_after = ADMISSION_RETRY_AFTER_SECONDS
+
+
+class AdmissionGate:
+    """Bounded in-flight limit plus a short deadline queue. Per event loop, not thread safe."""
+
+    def __init__(self, name: str, concurrency: int = ADMISSION_CONCURRENCY, queue: int = ADMISSION_QUEUE,
+                 timeout_ms: int = ADMISSION_QUEUE_TIMEOUT_MS):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.timeout = timeout_ms / 1000
+        self.in_flight = 0
+        self._waiters = deque()
+
+    def _report(self):
+        admission_in_flight.set(self.in_flight, self.name)
+        admission_queue_depth.set(len(self._waiters), self.name)
+
+    def _reject(self, reason: str):
+        admission_rejections_total.inc(self.name, reason)
+        raise AdmissionRejected(self.name, reason)
+
+    async def acquire(self):
+        if self.in_flight < self.concurrency and not self._waiters:
+            self.in_flight += 1
+            self._report()
+            return
+        if len(self._waiters) >= self.queue:
+            self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._report()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            self._reject("timeout")
+        except BaseException:
+            #Cancelled (client gone) after release() handed us the slot: pass it on
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._report()
+        admission_wait_seconds.observe(time.perf_counter() - started, self.name)
+
+    def release(self):
+        #Hand the slot straight to the oldest live waiter, so in_flight never dips
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._report()
+                return
+        self.in_flight -= 1
+        self._report()
+
+
+login_gate = AdmissionGate("login")
+signup_gate = AdmissionGate("signup")
+
+
+def admit(gate: AdmissionGate):
+    """Route dependency holding a slot of `gate` for the whole request.
+
+    Put it in the route's `dependencies=[...]`: those are solved before the
+    endpoint's own parameters, so a shed request never opens a DB session.
+    """
+    async def dependency():
+        if not ADMISSION_ENABLED:
+            yield
+            return
+        await gate.acquire()
+        try:
+            yield
+        finally:
+            gate.release()
+
+    return Depends(dependency)
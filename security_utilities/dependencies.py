@@ -1,40 +1,65 @@
 import jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jwt.exceptions import PyJWTError
 from config import SECRET_KEY, ALGORITHIM, REFRESH_TOKEN_EXPIRE_DAYS
-from database.database_setup import get_db
+from database.database_setup import get_primary_read_db
 from fastapi import Depends, HTTPException, Request
 from models.user_model import User, UserRole
+from security_utilities.principal_cache import Principal, principal_cache
+from security_utilities.token_cache import decode_token
+from security_utilities.revocation import new_token_id, revocation_index
+from services.metrics import jwt_seconds
 from datetime import datetime, timezone, timedelta
 
 
 
 
-def get_current_user(request:Request,db:Session=Depends(get_db)):
+def _active(principal:Principal):
+    if not principal.is_active:
+        raise HTTPException(status_code=403, detail="Account deactivated!")
+    return principal
+
+#Primary, not the replica: the principal is cached, and an admin's edit of this user only pins the admin
+async def get_current_user(request:Request,db:AsyncSession=Depends(get_primary_read_db)):
     token=request.cookies.get("access_token")
     if not token:
         raise HTTPException(status_code=401, detail="Missing token!")
     try:
-        payload=jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHIM])
+        payload=decode_token(token)
         email:str=payload.get("sub")
-        if email is None:
+        #Only access tokens: refresh and email-verification tokens share SECRET_KEY, and a token
+        #without a session family could not be revoked by logout
+        if email is None or payload.get("typ") != "access" or not payload.get("fam"):
             raise HTTPException(status_code=401, detail="invalid token payload")
     except PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token!")
+    #Bloom filter miss in microseconds; only a hit costs a query
+    if await revocation_index.is_revoked(db, payload.get("fam")):
+        raise HTTPException(status_code=401, detail="Session revoked!")
+
+    principal=principal_cache.get(email)
+    if principal is not None:
+        return _active(principal)
 
-    user=db.query(User).filter(User.email == email).first()
+    result=await db.execute(select(User).where(User.email == email))
+    user=result.scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found!")
-    return user
+    principal=Principal.from_user(user)
+    principal_cache.put(email, principal)
+    return _active(principal)
 
-def admin_required(current_user:User=Depends(get_current_user)):
+async def admin_required(current_user:Principal=Depends(get_current_user)):
     if not current_user.role == UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin privileges required!")
     return current_user
 
 
 def create_refresh_token(data: dict):
+    #Single use: jti is spent on refresh. fam ties it to its login session for logout and reuse detection
     expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode = {"sub": data["sub"], "exp": expire}
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHIM)
+    to_encode = {"sub": data["sub"], "exp": expire, "typ": "refresh", "jti": new_token_id(), "fam": data["fam"]}
+    with jwt_seconds.time("encode"):
+        return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHIM)
 
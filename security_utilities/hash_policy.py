@@ -0,0 +1,196 @@
+"""Password hashing policy: one scheme, one cost, shared by every hash we store.
+
+PASSWORD_SCHEME picks bcrypt, scrypt (stdlib) or argon2 (argon2-cffi). The cost
+comes from PASSWORD_HASH_COST, or is calibrated on first use so one hash takes
+about PASSWORD_HASH_TARGET_MS on this host, never below the floors below.
+Calibrated costs can differ slightly between workers, so production should pin
+the value that `python -m scripts.hash_policy calibrate` prints.
+
+Stored hashes keep their own parameters, so verify() accepts every scheme and
+cost, and needs_rehash() tells login when a hash is weaker than the policy.
+"""
+import base64
+import hashlib
+import hmac
+import math
+import os
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+import bcrypt
+from config import (
+    PASSWORD_HASH_COST, PASSWORD_HASH_MEMORY_MB, PASSWORD_HASH_PARALLELISM, PASSWORD_HASH_TARGET_MS, PASSWORD_SCHEME,
+)
+
+SCHEMES = ("bcrypt", "scrypt", "argon2")
+
+#Calibration never goes below these (OWASP password storage minimums)
+BCRYPT_MIN_ROUNDS = 10
+SCRYPT_MIN_LN = 14
+SCRYPT_BLOCK_SIZE = 8
+ARGON2_MIN_TIME_COST = 2
+
+
+@dataclass(frozen=True)
+class HashPolicy:
+    scheme: str
+    cost: int  # bcrypt rounds | scrypt log2(N) | argon2 time cost
+    memory_kib: int = 0  # argon2 memory; scrypt memory follows from cost
+    parallelism: int = 1
+
+    def describe(self) -> str:
+        if self.scheme == "bcrypt":
+            return f"bcrypt rounds={self.cost}"
+        if self.scheme == "scrypt":
+            mib = (128 * SCRYPT_BLOCK_SIZE << self.cost) // 2**20
+            return f"scrypt ln={self.cost} r={SCRYPT_BLOCK_SIZE} p={self.parallelism} ({mib} MiB)"
+        return f"argon2id t={self.cost} m={self.memory_kib // 1024} MiB p={self.parallelism}"
+
+
+def _argon2():
+    try:
+        import argon2
+    except ImportError as e:
+        raise RuntimeError("argon2 hashes need argon2-cffi (pip install argon2-cffi)") from e
+    return argon2
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode().rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password: str, salt: bytes, ln: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode("utf-8"), salt=salt, n=1 << ln, r=SCRYPT_BLOCK_SIZE, p=p,
+        maxmem=2 * 128 * SCRYPT_BLOCK_SIZE << ln, dklen=32,
+    )
+
+
+##Hash and verify
+#Plain module functions taking the policy as an argument, so the hashing pool
+#can ship them to worker processes.
+def hash_with(password: str, policy: HashPolicy) -> str:
+    if policy.scheme == "bcrypt":
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=policy.cost)).decode("utf-8")
+    if policy.scheme == "scrypt":
+        salt = os.urandom(16)
+        digest = _scrypt(password, salt, policy.cost, policy.parallelism)
+        return f"$scrypt$ln={policy.cost},r={SCRYPT_BLOCK_SIZE},p={policy.parallelism}${_b64(salt)}${_b64(digest)}"
+    if policy.scheme == "argon2":
+        hasher = _argon2().PasswordHasher(
+            time_cost=policy.cost, memory_cost=policy.memory_kib, parallelism=policy.parallelism,
+        )
+        return hasher.hash(password)
+    raise ValueError(f"Unknown password scheme: {policy.scheme}")
+
+
+def identify(hashed: str):
+    if hashed.startswith(("$2a$", "$2b$", "$2y$")):
+        return "bcrypt"
+    if hashed.startswith("$scrypt$"):
+        return "scrypt"
+    if hashed.startswith("$argon2"):
+        return "argon2"
+    return None
+
+
+def _scrypt_params(hashed: str):
+    _, _, params, salt, digest = hashed.split("$")
+    values = dict(item.split("=") for item in params.split(","))
+    return int(values["ln"]), int(values["r"]), int(values["p"]), _unb64(salt), _unb64(digest)
+
+
+def verify(password: str, hashed: str) -> bool:
+    scheme = identify(hashed)
+    if scheme == "bcrypt":
+        return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+    if scheme == "scrypt":
+        ln, r, p, salt, digest = _scrypt_params(hashed)
+        if r != SCRYPT_BLOCK_SIZE:
+            return False
+        return hmac.compare_digest(_scrypt(password, salt, ln, p), digest)
+    if scheme == "argon2":
+        argon2 = _argon2()
+        try:
+            return argon2.PasswordHasher().verify(hashed, password)
+        except argon2.exceptions.VerificationError:
+            return False
+    return False
+
+
+def needs_rehash(hashed: str, policy: HashPolicy = None) -> bool:
+    """True when the stored hash uses another scheme or a lower cost than the policy.
+
+    Only upgrades: a hash stronger than the policy is left alone.
+    """
+    policy = policy or get_policy()
+    scheme = identify(hashed)
+    if scheme != policy.scheme:
+        return scheme is not None
+    if scheme == "bcrypt":
+        return int(hashed.split("$")[2]) < policy.cost
+    if scheme == "scrypt":
+        ln, _, p, _, _ = _scrypt_params(hashed)
+        return ln < policy.cost or p < policy.parallelism
+    params = _argon2().extract_parameters(hashed)
+    return (
+        params.time_cost < policy.cost
+        or params.memory_cost < policy.memory_kib
+        or params.parallelism < policy.parallelism
+    )
+
+
+##Calibration
+def _best_of(runs: int, policy: HashPolicy) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        hash_with("calibration-password", policy)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def calibrate(scheme: str, target_ms: float, memory_mb: int = PASSWORD_HASH_MEMORY_MB,
+              parallelism: int = PASSWORD_HASH_PARALLELISM) -> HashPolicy:
+    """Highest cost whose hash stays within target_ms here, measured at a cheap cost and extrapolated."""
+    target = target_ms / 1000
+    if scheme == "bcrypt":
+        #Each round doubles the work
+        probe = _best_of(3, HashPolicy("bcrypt", 8))
+        rounds = 8 + math.floor(math.log2(target / probe))
+        return HashPolicy("bcrypt", min(max(rounds, BCRYPT_MIN_ROUNDS), 31))
+    if scheme == "scrypt":
+        #Work and memory both double with ln; memory_mb caps ln, the floor wins over the cap
+        max_ln = int(math.log2(memory_mb * 2**20 // (128 * SCRYPT_BLOCK_SIZE)))
+        probe = _best_of(3, HashPolicy("scrypt", 12, parallelism=parallelism))
+        ln = min(12 + math.floor(math.log2(target / probe)), max_ln)
+        return HashPolicy("scrypt", max(ln, SCRYPT_MIN_LN), parallelism=parallelism)
+    if scheme == "argon2":
+        #Memory is fixed by memory_mb; each pass adds a constant on top of the allocation
+        memory_kib = memory_mb * 1024
+        one = _best_of(2, HashPolicy("argon2", 1, memory_kib, parallelism))
+        per_pass = max(_best_of(2, HashPolicy("argon2", 2, memory_kib, parallelism)) - one, 1e-6)
+        passes = 1 + math.floor((target - one) / per_pass)
+        return HashPolicy("argon2", max(passes, ARGON2_MIN_TIME_COST), memory_kib, parallelism)
+    raise ValueError(f"Unknown password scheme: {scheme}")
+
+
+@lru_cache(maxsize=1)
+def get_policy() -> HashPolicy:
+    if PASSWORD_SCHEME not in SCHEMES:
+        raise ValueError(f"PASSWORD_SCHEME must be one of {', '.join(SCHEMES)}")
+    if PASSWORD_HASH_COST is not None:
+        policy = HashPolicy(
+            PASSWORD_SCHEME, PASSWORD_HASH_COST,
+            PASSWORD_HASH_MEMORY_MB * 1024 if PASSWORD_SCHEME == "argon2" else 0,
+            PASSWORD_HASH_PARALLELISM,
+        )
+        print(f"Password hashing: {policy.describe()}")
+    else:
+        policy = calibrate(PASSWORD_SCHEME, PASSWORD_HASH_TARGET_MS)
+        print(f"Password hashing: {policy.describe()} (calibrated to {PASSWORD_HASH_TARGET_MS:g}ms)")
+    return policy
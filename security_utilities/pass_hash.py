@@ -1,26 +1,83 @@
-import bcrypt
-from datetime import datetime, timedelta
-import secrets
+import asyncio
+import threading
+from itertools import repeat
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from config import HASH_EXECUTOR, HASH_WORKERS, HASH_QUEUE_LIMIT
+from services.metrics import password_hash_seconds
+from security_utilities.hash_policy import get_policy, hash_with, verify
+
+
+class HashingQueueFull(Exception):
+    """Raised when every hashing worker is busy and the wait queue is full."""
+
+
+##Hashing pool
+#Hashing is CPU bound (PASSWORD_HASH_TARGET_MS a hash), so it runs on a bounded
+#pool instead of the event loop. At most HASH_WORKERS jobs run and HASH_QUEUE_LIMIT wait.
+#The policy is resolved here, not in the pool, so process workers never recalibrate.
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_LIMIT)
+
+
+def get_hash_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                if HASH_EXECUTOR == "process":
+                    _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+                else:
+                    _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="pass-hash")
+    return _executor
+
+
+def shutdown_hash_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+def _submit(fn, *args) -> Future:
+    if not _slots.acquire(blocking=False):
+        raise HashingQueueFull("Password hashing queue is full")
+    try:
+        future = get_hash_executor().submit(fn, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
 
 def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+    with password_hash_seconds.time("hash"):
+        if HASH_EXECUTOR == "inline":
+            return hash_with(password, get_policy())
+        return _submit(hash_with, password, get_policy()).result()
 
 def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    with password_hash_seconds.time("verify"):
+        if HASH_EXECUTOR == "inline":
+            return verify(password, hashed)
+        return _submit(verify, password, hashed).result()
 
 
-##password resest
+def hash_passwords(passwords, executor, chunksize: int = 16) -> list[str]:
+    """Hash many passwords on a caller-owned executor (e.g. a ProcessPoolExecutor for bulk imports)."""
+    return list(executor.map(hash_with, passwords, repeat(get_policy()), chunksize=chunksize))
 
 
-async def save_reset_token(user_id, token, expiry):
-    # TODO: Implement saving the token and expiry to the database for the user
-    pass
+async def hash_password_async(password: str) -> str:
+    with password_hash_seconds.time("hash"):
+        if HASH_EXECUTOR == "inline":
+            return hash_with(password, get_policy())
+        return await asyncio.wrap_future(_submit(hash_with, password, get_policy()))
 
-async def create_reset_token(user):
-    token = secrets.token_urlsafe(32)
-    expiry = datetime.utcnow() + timedelta(hours=1)
-    # Save token and expiry to DB associated with user
-    await save_reset_token(user.id, token, expiry)
-    return token
+async def verify_password_async(password: str, hashed: str) -> bool:
+    with password_hash_seconds.time("verify"):
+        if HASH_EXECUTOR == "inline":
+            return verify(password, hashed)
+        return await asyncio.wrap_future(_submit(verify, password, hashed))
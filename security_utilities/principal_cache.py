@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from config import PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_SECONDS
+from models.user_model import User, UserRole
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Read-only snapshot of the authenticated user, safe to share between requests."""
+    id: int
+    email: str
+    user_name: str
+    full_name: str
+    role: UserRole
+    is_active: bool
+    email_verified: bool
+    row_version: int
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            user_name=user.user_name,
+            full_name=user.full_name,
+            role=user.role,
+            is_active=bool(user.is_active),
+            email_verified=bool(user.email_verified),
+            row_version=user.row_version,
+        )
+
+
+class PrincipalCache:
+    """LRU cache of principals keyed by token subject, with a per-entry TTL.
+
+    Entries are per worker process; the TTL bounds how long another worker can
+    keep serving a snapshot after this one invalidates it.
+    """
+
+    def __init__(self, maxsize: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple[float, Principal]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, subject: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[subject]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(subject)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, subject: str, principal: Principal):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[subject] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, subject: str):
+        with self._lock:
+            if self._entries.pop(subject, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+principal_cache = PrincipalCache()
+
+
+##Invalidation hooks
+#Call after any change to a user's row that the snapshot carries (delete,
+#password reset, role/active/verified changes).
+def invalidate_principal(email: str):
+    principal_cache.invalidate(email)
+
+def invalidate_all_principals():
+    principal_cache.clear()
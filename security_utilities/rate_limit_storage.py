@@ -0,0 +1,205 @@
+"""Host-wide rate limit counters in a memory-mapped file.
+
+`memory://` keeps counters per process, so under `uvicorn --workers N` every
+limit is effectively N times looser. `shm://` keeps them in one mmap'd hash
+table that every worker on the host maps, serialised by flock, so all workers
+see the same counts. Use `redis://` (any Redis-protocol server) once the app
+runs on more than one host.
+
+    RATE_LIMIT_STORAGE=shm:///run/user-registration/ratelimit.bin?slots=65536
+
+Each slot is (64-bit key hash, count, expires_at). Lookups probe a fixed
+number of slots, so every check is O(1); when all probed slots are live the
+one closest to expiry is evicted.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import urllib.parse
+from math import floor
+from limits.storage import Storage, SlidingWindowCounterSupport
+from limits.storage.base import TimestampedSlidingWindow
+
+MAGIC = b"RLSHM001"
+HEADER = struct.Struct("<8sQ")
+SLOT = struct.Struct("<Qqd")
+MAX_PROBES = 16
+DEFAULT_SLOTS = 65536
+
+
+class SharedMemoryStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    STORAGE_SCHEME = ["shm"]
+
+    def __init__(self, uri: str = None, wrap_exceptions: bool = False, **options):
+        parsed = urllib.parse.urlparse(uri or "shm://")
+        query = urllib.parse.parse_qs(parsed.query)
+        self.path = parsed.path or os.path.join("/tmp", "user-registration-ratelimit.bin")
+        self.requested_slots = int(query.get("slots", [DEFAULT_SLOTS])[0])
+        self._thread_lock = threading.Lock()
+        #The table is mapped on first use rather than here: config builds the
+        #limiter at import time, and importing the app should not touch the disk.
+        self._pid = None
+        self._map = None
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            size = os.fstat(fd).st_size
+            if size < HEADER.size:
+                size = HEADER.size + self.requested_slots * SLOT.size
+                os.ftruncate(fd, size)
+                os.pwrite(fd, HEADER.pack(MAGIC, self.requested_slots), 0)
+            self._map = mmap.mmap(fd, size)
+            magic, slots = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{self.path} is not a rate limit table")
+            self.slots = slots
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._pid = os.getpid()
+
+    def _lock(self):
+        #A forked child shares the parent's open file description, which would
+        #make flock a no-op between them; give each process its own.
+        if self._pid != os.getpid():
+            self._open()
+        return _FileLock(self._thread_lock, self._fd)
+
+    @property
+    def base_exceptions(self):
+        return OSError
+
+    ##Slot table
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+    def _find(self, key: str, now: float):
+        """Return (offset, count, expires_at) for key; count is 0 if absent or expired."""
+        h = self._hash(key)
+        start = h % self.slots
+        free = None
+        victim, victim_expiry = None, float("inf")
+        for i in range(MAX_PROBES):
+            offset = HEADER.size + ((start + i) % self.slots) * SLOT.size
+            slot_hash, count, expires = SLOT.unpack_from(self._map, offset)
+            if slot_hash == h:
+                if expires <= now:
+                    return offset, 0, 0.0
+                return offset, count, expires
+            if free is None and (slot_hash == 0 or expires <= now):
+                free = offset
+            if expires < victim_expiry:
+                victim, victim_expiry = offset, expires
+        return (free if free is not None else victim), 0, 0.0
+
+    def _write(self, offset: int, key: str, count: int, expires: float):
+        SLOT.pack_into(self._map, offset, self._hash(key), count, expires)
+
+    def _incr(self, key: str, expiry: float, amount: int, now: float) -> int:
+        offset, count, expires = self._find(key, now)
+        if count == 0:
+            expires = now + expiry
+        count += amount
+        self._write(offset, key, count, expires)
+        return count
+
+    ##Storage API
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        with self._lock():
+            return self._incr(key, expiry, amount, time.time())
+
+    def decr(self, key: str, amount: int = 1) -> int:
+        with self._lock():
+            offset, count, expires = self._find(key, time.time())
+            if count == 0:
+                return 0
+            count = max(count - amount, 0)
+            self._write(offset, key, count, expires)
+            return count
+
+    def get(self, key: str) -> int:
+        with self._lock():
+            return self._find(key, time.time())[1]
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        with self._lock():
+            _, count, expires = self._find(key, now)
+        return expires if count else now
+
+    def clear(self, key: str) -> None:
+        with self._lock():
+            offset, count, _ = self._find(key, time.time())
+            if count:
+                SLOT.pack_into(self._map, offset, 0, 0, 0.0)
+
+    def check(self) -> bool:
+        self._lock()
+        return not self._map.closed
+
+    def reset(self) -> int:
+        with self._lock():
+            live = 0
+            now = time.time()
+            for i in range(self.slots):
+                offset = HEADER.size + i * SLOT.size
+                slot_hash, _, expires = SLOT.unpack_from(self._map, offset)
+                if slot_hash and expires > now:
+                    live += 1
+            self._map[HEADER.size:] = bytes(self.slots * SLOT.size)
+            return live
+
+    ##Sliding window counter
+    def _window(self, key: str, expiry: int, now: float):
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        previous_count = self._find(previous_key, now)[1]
+        current_count = self._find(current_key, now)[1]
+        previous_ttl = 0.0 if previous_count == 0 else (1 - (((now - expiry) / expiry) % 1)) * expiry
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return current_key, previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        now = time.time()
+        #Check and increment under one lock, so concurrent workers cannot overshoot
+        with self._lock():
+            current_key, previous_count, previous_ttl, current_count, _ = self._window(key, expiry, now)
+            if floor(previous_count * previous_ttl / expiry + current_count) + amount > limit:
+                return False
+            self._incr(current_key, 2 * expiry, amount, now)
+            return True
+
+    def get_sliding_window(self, key: str, expiry: int):
+        with self._lock():
+            return self._window(key, expiry, time.time())[1:]
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+        self.clear(previous_key)
+        self.clear(current_key)
+
+
+class _FileLock:
+    __slots__ = ("thread_lock", "fd")
+
+    def __init__(self, thread_lock, fd):
+        self.thread_lock = thread_lock
+        self.fd = fd
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.thread_lock.release()
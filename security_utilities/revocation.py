@@ -0,0 +1,234 @@
+"""Revoked refresh tokens and login sessions, checked without a query.
+
+The revoked_tokens table is the exact, persistent set. Each worker keeps a
+Bloom filter of its revoked session families in memory: a miss (almost every
+check) proves the session is live in a few microseconds, and only a hit
+(revoked, or a false positive at REVOCATION_BLOOM_ERROR_RATE) is confirmed
+with a unique-index lookup.
+
+The filter is built on startup in id order, then extended every
+REVOCATION_SYNC_SECONDS with the families other workers revoked since. Expired
+rows are deleted every REVOCATION_PRUNE_SECONDS and the filter is rebuilt,
+since a Bloom filter cannot forget.
+
+Spent refresh-token ids (one row per refresh) stay out of the filter. Rotation
+spends a jti with a unique-key INSERT, which catches a replay on any worker
+without a prior check, and requests only ever check their family.
+
+Every login records its family and user in login_sessions, so deactivating a
+user revokes all of that user's live sessions in the same transaction.
+"""
+import asyncio
+import hashlib
+import math
+import secrets
+import time
+from datetime import datetime, timezone
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
+from config import (
+    REFRESH_TOKEN_EXPIRE_DAYS, REVOCATION_BLOOM_CAPACITY, REVOCATION_BLOOM_ERROR_RATE,
+)
+from database.database_setup import async_engine
+from models.login_session_model import LoginSession
+from models.revoked_token_model import RevocationKind, RevokedToken
+
+#Re-read this many ids behind the last one seen: a concurrent writer on a
+#server database can commit a lower id after a higher one is visible
+SYNC_OVERLAP = 256
+LOAD_CHUNK = 10000
+
+
+def new_token_id() -> str:
+    return secrets.token_urlsafe(16)
+
+
+def family_expiry() -> float:
+    """No token of a session outlives this, so neither must its revocation."""
+    return time.time() + REFRESH_TOKEN_EXPIRE_DAYS * 86400
+
+
+def _utc(epoch: float) -> datetime:
+    return datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None)
+
+
+class BloomFilter:
+    """Fixed-size bit array with k positions per key from one blake2b digest (double hashing)."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(capacity, 1)
+        self.size = max(64, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        bits = self._bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class RevocationIndex:
+    """Per-worker, event-loop only; see the module docstring."""
+
+    def __init__(self, capacity: int = REVOCATION_BLOOM_CAPACITY, error_rate: float = REVOCATION_BLOOM_ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._last_id = 0
+        #Ids revoked here while a rebuild is reading the table; replayed into the new filter
+        self._rebuild_log = None
+        self.checks = 0
+        self.exact_lookups = 0
+        self.confirmed = 0
+
+    ##Checks
+    async def is_revoked(self, db, *token_ids) -> bool:
+        """db=None confirms on the primary, for callers holding a replica session that may lag."""
+        self.checks += 1
+        candidates = [token_id for token_id in token_ids if token_id and token_id in self._bloom]
+        if not candidates:
+            return False
+        self.exact_lookups += 1
+        query = select(RevokedToken.id).where(RevokedToken.token_id.in_(candidates)).limit(1)
+        if db is None:
+            async with async_engine.connect() as conn:
+                hit = (await conn.execute(query)).first()
+        else:
+            hit = (await db.execute(query)).first()
+        if hit:
+            self.confirmed += 1
+        return hit is not None
+
+    async def revoked_at(self, db, token_id: str):
+        """When token_id was revoked, or None. Always a query: spent jtis are not in the filter."""
+        return (await db.execute(select(RevokedToken.revoked_at).where(RevokedToken.token_id == token_id))).scalar()
+
+    async def revoke(self, db, token_id: str, kind: RevocationKind, expires_at: float) -> bool:
+        """Persist a revocation and commit. False if token_id was already revoked."""
+        try:
+            await db.execute(insert(RevokedToken).values(
+                token_id=token_id, kind=kind.value, expires_at=_utc(expires_at), revoked_at=datetime.utcnow(),
+            ))
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            return False
+        finally:
+            if kind == RevocationKind.FAMILY:
+                self._bloom.add(token_id)
+                if self._rebuild_log is not None:
+                    self._rebuild_log.append(token_id)
+        return True
+
+    def record_session(self, db, family: str, user_id: int):
+        """Remember a new login's family against its user; committed with the caller's transaction."""
+        db.add(LoginSession(family=family, user_id=user_id, expires_at=_utc(family_expiry())))
+
+    async def revoke_user_sessions(self, db, user_ids) -> int:
+        """Revoke every live session of `user_ids` in the caller's transaction, without committing."""
+        now = datetime.utcnow()
+        families = (await db.execute(
+            select(LoginSession.family, LoginSession.expires_at)
+            .where(LoginSession.user_id.in_(user_ids), LoginSession.expires_at >= now)
+            .where(LoginSession.family.not_in(select(RevokedToken.token_id)))
+        )).all()
+        if families:
+            await db.execute(insert(RevokedToken), [
+                {"token_id": row.family, "kind": RevocationKind.FAMILY.value, "expires_at": row.expires_at,
+                 "revoked_at": now}
+                for row in families
+            ])
+        for row in families:
+            self._bloom.add(row.family)
+            if self._rebuild_log is not None:
+                self._rebuild_log.append(row.family)
+        return len(families)
+
+    ##Sync with the table
+    async def _load(self, conn, bloom: BloomFilter, after_id: int) -> int:
+        """Add families with id > after_id to bloom in chunks; returns the highest id seen."""
+        while True:
+            rows = (await conn.execute(
+                select(RevokedToken.id, RevokedToken.token_id)
+                .where(RevokedToken.kind == RevocationKind.FAMILY.value, RevokedToken.id > after_id)
+                .order_by(RevokedToken.id).limit(LOAD_CHUNK)
+            )).all()
+            for row in rows:
+                bloom.add(row.token_id)
+            if rows:
+                after_id = rows[-1].id
+            if len(rows) < LOAD_CHUNK:
+                return after_id
+
+    async def rebuild(self, engine=async_engine):
+        self._rebuild_log = []
+        try:
+            async with engine.connect() as conn:
+                rows = (await conn.execute(
+                    select(func.count()).where(RevokedToken.kind == RevocationKind.FAMILY.value)
+                )).scalar()
+                #Size for twice the live rows, so a table past the configured capacity keeps the error rate
+                bloom = BloomFilter(max(self.capacity, 2 * rows), self.error_rate)
+                last_id = await self._load(conn, bloom, 0)
+            for token_id in self._rebuild_log:
+                bloom.add(token_id)
+            self._bloom, self._last_id = bloom, last_id
+        finally:
+            self._rebuild_log = None
+
+    async def sync(self, engine=async_engine):
+        async with engine.connect() as conn:
+            self._last_id = max(self._last_id, await self._load(conn, self._bloom, max(self._last_id - SYNC_OVERLAP, 0)))
+
+    async def prune(self, engine=async_engine) -> int:
+        async with engine.begin() as conn:
+            removed = (await conn.execute(
+                delete(RevokedToken).where(RevokedToken.expires_at < datetime.utcnow())
+            )).rowcount
+            await conn.execute(delete(LoginSession).where(LoginSession.expires_at < datetime.utcnow()))
+        await self.rebuild(engine)
+        return removed
+
+    async def maintain(self, sync_seconds: float, prune_seconds: float):
+        last_prune = time.monotonic()
+        while True:
+            await asyncio.sleep(sync_seconds)
+            try:
+                if time.monotonic() - last_prune >= prune_seconds:
+                    last_prune = time.monotonic()
+                    await self.prune()
+                else:
+                    await self.sync()
+            except Exception as e:
+                print(f"Revocation index sync failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "entries": self._bloom.count,
+            "capacity": self._bloom.capacity,
+            "bloom_bytes": len(self._bloom._bits),
+            "hashes": self._bloom.hashes,
+            "last_id": self._last_id,
+            "checks": self.checks,
+            "exact_lookups": self.exact_lookups,
+            "confirmed": self.confirmed,
+        }
+
+
+revocation_index = RevocationIndex()
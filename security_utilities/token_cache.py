@@ -0,0 +1,85 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+import jwt
+from config import SECRET_KEY, ALGORITHIM, TOKEN_CACHE_SIZE
+from services.metrics import jwt_seconds
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of JWTs whose signature and claims have already been checked.
+
+    Keys are a digest of the raw token, never the token itself. Each entry
+    expires at the token's own `exp`, so a hit is never more permissive than
+    re-running jwt.decode.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, tuple[float, MappingProxyType]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+
+    def decode(self, token: str):
+        """Drop-in for jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHIM]).
+
+        Raises the same PyJWTError subclasses; the returned payload is read-only.
+        """
+        key = self._key(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self.misses += 1
+
+        with jwt_seconds.time("decode"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHIM])
+        exp = payload.get("exp")
+        frozen = MappingProxyType(payload)
+        if exp is not None and self.maxsize > 0:
+            with self._lock:
+                self._entries[key] = (float(exp), frozen)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return frozen
+
+    def discard(self, token: str):
+        with self._lock:
+            self._entries.pop(self._key(token), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+token_cache = VerifiedTokenCache()
+
+
+def decode_token(token: str):
+    return token_cache.decode(token)
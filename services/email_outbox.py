@@ -0,0 +1,172 @@
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import (
+    OUTBOX_BATCH_SIZE, OUTBOX_POLL_SECONDS, OUTBOX_MAX_ATTEMPTS, OUTBOX_BACKOFF_SECONDS, OUTBOX_LEASE_SECONDS,
+    OUTBOX_PRUNE_SECONDS, OUTBOX_SENT_RETENTION_HOURS, METRICS_ENABLED,
+)
+from database.database_setup import AsyncSessionLocal
+from models.email_outbox_model import EmailKind, EmailOutbox, OutboxStatus
+from models.user_model import User
+from services.email_service import render_reset_email, render_verification_email
+from services import metrics
+from services.mail_dispatcher import MailDispatcher
+from services.password_reset import issue_reset_token
+
+RENDERERS = {
+    EmailKind.VERIFICATION.value: render_verification_email,
+}
+PRUNE_CHUNK = 1000
+
+MAX_BACKOFF_SECONDS = 3600
+
+
+def queue_email(db: AsyncSession, kind: EmailKind, recipient: str, **context):
+    """Stage an email on the caller's session so it commits (or rolls back) with the caller's writes."""
+    db.add(EmailOutbox(kind=kind.value, recipient=recipient, payload=json.dumps(context)))
+
+
+async def _render(db: AsyncSession, row: EmailOutbox):
+    if row.kind == EmailKind.PASSWORD_RESET.value:
+        #Issued at send time and only ever stored hashed: the outbox row holds no secret
+        user_id = (await db.execute(select(User.id).where(User.email == row.recipient))).scalar()
+        if user_id is None:
+            raise LookupError("Recipient is no longer registered")
+        return render_reset_email(row.recipient, await issue_reset_token(db, user_id))
+    renderer = RENDERERS.get(row.kind)
+    if renderer is None:
+        raise ValueError(f"Unknown email kind {row.kind!r}")
+    return renderer(row.recipient, **json.loads(row.payload))
+
+
+async def claim_batch(db: AsyncSession, batch_size: int = OUTBOX_BATCH_SIZE) -> list[EmailOutbox]:
+    """Atomically mark up to `batch_size` due rows as ours and return them.
+
+    Rows stuck in `sending` longer than the lease (a crashed worker) are
+    reclaimed.
+    """
+    now = datetime.utcnow()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    due = (
+        select(EmailOutbox.id)
+        .where(or_(
+            and_(EmailOutbox.status == OutboxStatus.PENDING.value, EmailOutbox.next_attempt_at <= now),
+            and_(EmailOutbox.status == OutboxStatus.SENDING.value,
+                 EmailOutbox.claimed_at < now - timedelta(seconds=OUTBOX_LEASE_SECONDS)),
+        ))
+        .order_by(EmailOutbox.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    await db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(due.scalar_subquery()))
+        .values(status=OutboxStatus.SENDING.value, claimed_by=worker_id, claimed_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    result = await db.execute(
+        select(EmailOutbox).where(EmailOutbox.claimed_by == worker_id).order_by(EmailOutbox.id)
+    )
+    return list(result.scalars())
+
+
+def _record(row: EmailOutbox, error, now: datetime) -> str:
+    """Apply a delivery outcome to `row`; returns "sent", "retry" or "failed"."""
+    if error is None:
+        row.status = OutboxStatus.SENT.value
+        row.sent_at = now
+        row.last_error = None
+        return "sent"
+    row.attempts += 1
+    row.last_error = str(error)[:1000]
+    if row.attempts >= OUTBOX_MAX_ATTEMPTS:
+        row.status = OutboxStatus.FAILED.value
+        return "failed"
+    row.status = OutboxStatus.PENDING.value
+    row.next_attempt_at = now + timedelta(seconds=min(OUTBOX_BACKOFF_SECONDS * 2 ** (row.attempts - 1), MAX_BACKOFF_SECONDS))
+    return "retry"
+
+
+async def drain_once(dispatcher: MailDispatcher, batch_size: int = OUTBOX_BATCH_SIZE) -> dict:
+    """Claim one batch, send it over a single SMTP connection and record each outcome."""
+    outcome = {"claimed": 0, "sent": 0, "retry": 0, "failed": 0}
+    async with AsyncSessionLocal() as db:
+        rows = await claim_batch(db, batch_size)
+        if not rows:
+            return outcome
+        outcome["claimed"] = len(rows)
+
+        messages, errors = [], {}
+        for row in rows:
+            try:
+                messages.append((row, await _render(db, row)))
+            except Exception as e:
+                errors[row.id] = e
+        #Reset tokens issued while rendering must be live before their emails go out
+        await db.commit()
+        results = await dispatcher.send_batch([message for _, message in messages])
+        errors.update({row.id: error for (row, _), error in zip(messages, results)})
+
+        now = datetime.utcnow()
+        for row in rows:
+            outcome[_record(row, errors.get(row.id), now)] += 1
+        await db.commit()
+    return outcome
+
+
+async def run_worker(batch_size: int = OUTBOX_BATCH_SIZE, poll_seconds: float = OUTBOX_POLL_SECONDS,
+                     once: bool = False, dispatcher: MailDispatcher = None):
+    dispatcher = dispatcher or MailDispatcher()
+    last_prune = 0.0
+    try:
+        while True:
+            if time.monotonic() - last_prune >= OUTBOX_PRUNE_SECONDS:
+                last_prune = time.monotonic()
+                pruned = await prune_sent()
+                if pruned:
+                    print(f"Pruned {pruned} sent emails")
+            outcome = await drain_once(dispatcher, batch_size)
+            #Publish this process's email timings to the app's /metrics
+            if METRICS_ENABLED:
+                metrics.flush()
+            if outcome["claimed"]:
+                print(f"Outbox batch: {outcome}")
+                continue
+            if once:
+                return
+            await asyncio.sleep(poll_seconds)
+    finally:
+        if METRICS_ENABLED:
+            metrics.discard()
+
+
+async def prune_sent(retention_hours: float = OUTBOX_SENT_RETENTION_HOURS, chunk_size: int = PRUNE_CHUNK) -> int:
+    """Delete sent rows older than `retention_hours`, `chunk_size` per transaction. Returns the number removed."""
+    cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+    removed = 0
+    while True:
+        sent = (
+            select(EmailOutbox.id)
+            .where(EmailOutbox.status == OutboxStatus.SENT.value, EmailOutbox.sent_at < cutoff)
+            .limit(chunk_size)
+            .scalar_subquery()
+        )
+        async with AsyncSessionLocal() as db:
+            deleted = (await db.execute(delete(EmailOutbox).where(EmailOutbox.id.in_(sent)))).rowcount
+            await db.commit()
+        removed += deleted
+        if deleted < chunk_size:
+            return removed
+
+
+async def outbox_counts() -> dict:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(EmailOutbox.status, func.count()).group_by(EmailOutbox.status))
+        return {status: count for status, count in result.all()}
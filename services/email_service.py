@@ -1,50 +1,51 @@
-from fastapi_mail import FastMail, MessageSchema
-from config import mail_config
+from email.message import EmailMessage
 from jinja2 import Environment, FileSystemLoader
+from services.mail_dispatcher import build_message
+from services.metrics import TimedTemplate
 
-async def send_verification_email(email: str, token: str):
+#Compiled once per worker; auto_reload off so renders never stat the template files
+env = Environment(loader=FileSystemLoader("templates"), auto_reload=False)
+env.template_class = TimedTemplate
+
+EMAIL_TEMPLATES = (
+    "email_templates/verify_account.html",
+    "email_templates/password_reset_email.html",
+)
+
+
+def warm_templates():
+    for name in EMAIL_TEMPLATES:
+        env.get_template(name)
+
+
+def render_verification_email(email: str, token: str) -> EmailMessage:
     verification_link = f"http://127.0.0.1:8000/users/verify?token={token}"
 
-    env = Environment(loader=FileSystemLoader("templates"))
     template = env.get_template("email_templates/verify_account.html")
     body = template.render(email=email, verification_link=verification_link)
 
-    message = MessageSchema(
+    return build_message(
         subject="Verify your Tech Pulse account",
         recipients=[email],
         cc=["support@techpulse.com"],
         bcc=["audit@techpulse.com"],
         reply_to=["noreply@techpulse.com"],
         body=body,
-        subtype="html"
-)
-
-    ##Send the email
-    print(f"Verification email queued for {email} with token {token}")
-
-    fm = FastMail(mail_config)
-    await fm.send_message(message)
+    )
 
 
-async def send_reset_email(email: str, token: str):
+def render_reset_email(email: str, token: str) -> EmailMessage:
     reset_link = f"http://127.0.0.1:8000/users/reset-password?token={token}"
 
-    env = Environment(loader=FileSystemLoader("templates"))
     template = env.get_template("email_templates/password_reset_email.html")
     body = template.render(email=email, reset_link=reset_link)
 
-    message = MessageSchema(
+    return build_message(
         subject="Reset your Tech Pulse password",
         recipients=[email],
         cc=["support@techpulse.com"],
         bcc=["audit@techpulse.com"],
         reply_to=["noreply@techpulse.com"],
         body=body,
-        subtype="html"
     )
 
-    ##Send the email
-    print(f"Password reset email queued for {email} with token {token}")
-
-    fm = FastMail(mail_config)
-    await fm.send_message(message)
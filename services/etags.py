@@ -0,0 +1,49 @@
+"""ETags and conditional GET for the user resources.
+
+A user's ETag is its id and row_version, which every UPDATE bumps (see
+models/user_model.py), so it is known as soon as the row, or the cached
+Principal, is in hand. A listing page's ETag hashes the request's filter and
+paging parameters with the (id, row_version) of every row on the page and the
+cursor and total sent with it: any edit, insert or delete that changes what
+the page shows changes the tag. Taking only the highest version would miss
+edits to the other rows and every delete.
+
+Either way the tag is compared before the body is encoded, so an unchanged
+resource costs its query and a 304, not serialisation.
+"""
+import hashlib
+from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse
+
+#Browsers and the SPA may keep a copy but must revalidate it on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+def user_etag(user) -> str:
+    return f'"u{user.id}.{user.row_version}"'
+
+
+def page_etag(rows, *parts) -> str:
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(repr(parts).encode("utf-8"))
+    digest.update(b"|")
+    digest.update(",".join(f"{row.id}.{row.row_version}" for row in rows).encode("ascii"))
+    return f'"p{digest.hexdigest()}"'
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match already names `etag` (weak tags compare equal)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def conditional_response(request: Request, etag: str, encode) -> Response:
+    """304 when the client has `etag`, else `encode()` sent as JSON with the tag."""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return ORJSONResponse(encode(), headers=headers)
@@ -0,0 +1,113 @@
+from email.message import EmailMessage
+import aiosmtplib
+from services.metrics import email_send_seconds, emails_total
+from config import get_mail_config
+
+
+class MailDispatcher:
+    """SMTP sender for the outbox worker (services/email_outbox.py).
+
+    Each send_batch call sends its messages over one connection, opened on
+    demand and reconnected once if the server drops it, so a drained batch
+    costs one connect and handshake rather than one per email.
+    """
+
+    def __init__(self, config=None):
+        self._config = config
+        self.sent = 0
+        self.failed = 0
+        self.connections_opened = 0
+
+    @property
+    def config(self):
+        return self._config or get_mail_config()
+
+    def _new_client(self) -> aiosmtplib.SMTP:
+        cfg = self.config
+        return aiosmtplib.SMTP(
+            hostname=cfg.MAIL_SERVER,
+            port=cfg.MAIL_PORT,
+            use_tls=cfg.MAIL_SSL_TLS,
+            start_tls=cfg.MAIL_STARTTLS,
+            validate_certs=cfg.VALIDATE_CERTS,
+            timeout=cfg.TIMEOUT,
+            local_hostname=cfg.LOCAL_HOSTNAME,
+        )
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        cfg = self.config
+        client = self._new_client()
+        await client.connect()
+        if cfg.USE_CREDENTIALS:
+            await client.login(cfg.MAIL_USERNAME, cfg.MAIL_PASSWORD.get_secret_value())
+        self.connections_opened += 1
+        return client
+
+    @staticmethod
+    async def _close(client):
+        if client is not None and client.is_connected:
+            try:
+                await client.quit()
+            except aiosmtplib.SMTPException:
+                client.close()
+
+    async def _send(self, client, message: EmailMessage):
+        """Send on the worker's connection, reconnecting once if the server dropped it."""
+        if client is None or not client.is_connected:
+            client = await self._connect()
+        try:
+            await client.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            client = await self._connect()
+            await client.send_message(message)
+        return client
+
+    async def send_batch(self, messages: list[EmailMessage]) -> list:
+        """Send `messages` over one connection now; returns None or the error for each."""
+        results = []
+        client = None
+        try:
+            with email_send_seconds.time():
+                for message in messages:
+                    try:
+                        client = await self._send(client, message)
+                        self.sent += 1
+                        emails_total.inc("sent")
+                        results.append(None)
+                    except (aiosmtplib.SMTPException, OSError) as e:
+                        self.failed += 1
+                        emails_total.inc("failed")
+                        results.append(e)
+                        await self._close(client)
+                        client = None
+        finally:
+            await self._close(client)
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "connections_opened": self.connections_opened,
+        }
+
+
+def build_message(subject: str, recipients: list[str], body: str, cc: list[str] = (), bcc: list[str] = (),
+                  reply_to: list[str] = ()) -> EmailMessage:
+    message = EmailMessage()
+    mail_config = get_mail_config()
+    sender = mail_config.MAIL_FROM
+    if mail_config.MAIL_FROM_NAME:
+        sender = f"{mail_config.MAIL_FROM_NAME} <{sender}>"
+    message["From"] = sender
+    message["To"] = ", ".join(recipients)
+    if cc:
+        message["Cc"] = ", ".join(cc)
+    if bcc:
+        #aiosmtplib adds Bcc to the envelope and strips the header before sending
+        message["Bcc"] = ", ".join(bcc)
+    if reply_to:
+        message["Reply-To"] = ", ".join(reply_to)
+    message["Subject"] = subject
+    message.set_content(body, subtype="html")
+    return message
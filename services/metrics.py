@@ -0,0 +1,260 @@
+"""In-process latency histograms, served as Prometheus text at /metrics.
+
+Observing is a bisect plus a few integer adds under a per-metric lock; no I/O.
+Every uvicorn worker keeps its own registry and writes a snapshot to
+METRICS_DIR/<pid>.json every METRICS_FLUSH_SECONDS. /metrics merges its own
+live registry with the snapshots of the other workers that are still alive,
+so a scrape sees the whole server whichever worker answers it. A dead
+worker's file is dropped, and Prometheus treats the drop in its counters as
+a reset.
+"""
+import asyncio
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+import jinja2
+from config import METRICS_DIR
+
+#Prometheus client defaults, plus finer steps below 5ms for JWT and cache paths
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = {}
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        #label values -> [per-bucket counts (last is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def observe(self, value: float, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labelvalues):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(labels), list(counts), total] for labels, (counts, total) in self._series.items()]
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._series[labelvalues] = self._series.get(labelvalues, 0) + amount
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._series.items()]
+
+
+class Gauge(Counter):
+    """Current level (queue depth, in flight). Workers' values are summed like counters."""
+    kind = "gauge"
+
+    def set(self, value: float, *labelvalues):
+        with self._lock:
+            self._series[labelvalues] = value
+
+
+##Hot-path metrics
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "Time to serve a request, by route template",
+    ("method", "route", "status"),
+)
+password_hash_seconds = Histogram(
+    "password_hash_seconds", "Password hash/verify including time queued for the hashing pool", ("op",),
+)
+jwt_seconds = Histogram("jwt_seconds", "PyJWT encode/decode (cache hits are not decodes)", ("op",))
+db_session_seconds = Histogram("db_session_seconds", "Lifetime of a request's database session", ("engine",))
+template_render_seconds = Histogram("template_render_seconds", "Jinja template render time", ("template",))
+email_send_seconds = Histogram("email_send_seconds", "SMTP delivery of one batch over a pooled connection")
+emails_total = Counter("emails_total", "Emails handed to SMTP, by outcome", ("outcome",))
+admission_in_flight = Gauge("admission_in_flight", "Requests holding an admission slot", ("gate",))
+admission_queue_depth = Gauge("admission_queue_depth", "Requests waiting for an admission slot", ("gate",))
+admission_wait_seconds = Histogram("admission_wait_seconds", "Time spent queued before admission", ("gate",))
+admission_rejections_total = Counter(
+    "admission_rejections_total", "Requests shed with 503, by reason (queue_full, timeout)", ("gate", "reason"),
+)
+purge_chunk_lock_seconds = Histogram("purge_chunk_lock_seconds", "Write transaction of one unverified-user purge chunk")
+unverified_users_purged_total = Counter("unverified_users_purged_total", "Unverified accounts deleted by the purge job")
+
+
+class TimedTemplate(jinja2.Template):
+    """Template class that records every render; set as `env.template_class`."""
+
+    def render(self, *args, **kwargs):
+        with template_render_seconds.time(self.name or "<string>"):
+            return super().render(*args, **kwargs)
+
+
+class MetricsMiddleware:
+    """Pure ASGI, so it adds one timer and a send wrapper rather than a BaseHTTPMiddleware task."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            #FastAPI stores the matched route in the scope; raw paths would explode label cardinality
+            route = scope.get("route")
+            http_request_seconds.observe(
+                time.perf_counter() - started, scope["method"], getattr(route, "path", "unmatched"), str(status)
+            )
+
+
+##Cross-worker aggregation
+def snapshot() -> dict:
+    return {name: metric.snapshot() for name, metric in REGISTRY.items()}
+
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"{pid}.json")
+
+
+def flush():
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = _snapshot_path(os.getpid())
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(snapshot(), f)
+    os.replace(f"{path}.tmp", path)
+
+
+async def flush_periodically(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            flush()
+        except OSError as e:
+            print(f"Metrics flush failed: {e}")
+
+
+def discard(path: str = None):
+    try:
+        os.unlink(path or _snapshot_path(os.getpid()))
+    except FileNotFoundError:
+        pass
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _worker_snapshots():
+    yield snapshot()
+    for path in glob.glob(os.path.join(METRICS_DIR, "*.json")):
+        try:
+            pid = int(os.path.basename(path).split(".")[0])
+        except ValueError:
+            continue
+        if pid == os.getpid():
+            continue
+        if not _alive(pid):
+            discard(path)
+            continue
+        try:
+            with open(path) as f:
+                yield json.load(f)
+        except (OSError, ValueError):
+            continue
+
+
+def merged() -> dict:
+    totals = {name: {} for name in REGISTRY}
+    for worker in _worker_snapshots():
+        for name, series in worker.items():
+            if name not in totals:
+                continue
+            merged_series = totals[name]
+            for entry in series:
+                labels = tuple(entry[0])
+                if REGISTRY[name].kind == "histogram":
+                    counts, total = merged_series.get(labels, ([0] * len(entry[1]), 0.0))
+                    merged_series[labels] = ([a + b for a, b in zip(counts, entry[1])], total + entry[2])
+                else:
+                    merged_series[labels] = merged_series.get(labels, 0) + entry[1]
+    return totals
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render_prometheus() -> str:
+    lines = []
+    for name, series in merged().items():
+        metric = REGISTRY[name]
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for labels, value in sorted(series.items()):
+            if metric.kind != "histogram":
+                lines.append(f"{name}{_labels(metric.labelnames, labels)} {value}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _labels(metric.labelnames, labels, f'le="{le}"')
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric.labelnames, labels)} {total}")
+            lines.append(f"{name}_count{_labels(metric.labelnames, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
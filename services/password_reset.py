@@ -0,0 +1,79 @@
+"""Password reset tokens: hashed, indexed, expiring.
+
+The emailed token is 32 random bytes; only its SHA-256 is stored (a slow hash
+adds nothing for a secret with that much entropy). Redeeming a token is one
+probe of the unique token_hash index, with expiry checked in the same query.
+Expired rows are purged by sweep_periodically in short chunked transactions,
+so the sweeper never holds SQLite's write lock for long.
+"""
+import asyncio
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select
+from config import PASSWORD_RESET_TOKEN_MINUTES
+from database.database_setup import async_engine
+from models.password_reset_token_model import PasswordResetToken
+from models.user_model import User
+
+
+def _digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+async def issue_reset_token(db, user_id: int) -> str:
+    """Replace the user's reset token and return the raw value to email. The caller commits."""
+    token = secrets.token_urlsafe(32)
+    await db.execute(delete(PasswordResetToken).where(PasswordResetToken.user_id == user_id))
+    db.add(PasswordResetToken(
+        token_hash=_digest(token),
+        user_id=user_id,
+        expires_at=datetime.utcnow() + timedelta(minutes=PASSWORD_RESET_TOKEN_MINUTES),
+    ))
+    return token
+
+
+async def find_reset_user(db, token: str):
+    """The user a live token belongs to, or None if it is unknown or expired."""
+    return (await db.execute(
+        select(User)
+        .join(PasswordResetToken, PasswordResetToken.user_id == User.id)
+        .where(PasswordResetToken.token_hash == _digest(token), PasswordResetToken.expires_at > datetime.utcnow())
+    )).scalars().first()
+
+
+async def consume_reset_tokens(db, user_id: int):
+    await db.execute(delete(PasswordResetToken).where(PasswordResetToken.user_id == user_id))
+
+
+##Sweeper
+async def sweep_expired(chunk_size: int, engine=async_engine) -> int:
+    """Delete expired tokens `chunk_size` rows per transaction. Returns the number removed."""
+    removed = 0
+    while True:
+        expired = (
+            select(PasswordResetToken.id)
+            .where(PasswordResetToken.expires_at < datetime.utcnow())
+            .limit(chunk_size)
+            .scalar_subquery()
+        )
+        async with engine.begin() as conn:
+            deleted = (await conn.execute(
+                delete(PasswordResetToken).where(PasswordResetToken.id.in_(expired))
+            )).rowcount
+        removed += deleted
+        if deleted < chunk_size:
+            return removed
+        #Let queued writers take the lock between chunks
+        await asyncio.sleep(0)
+
+
+async def sweep_periodically(interval: float, chunk_size: int):
+    while True:
+        try:
+            removed = await sweep_expired(chunk_size)
+            if removed:
+                print(f"Swept {removed} expired reset tokens")
+        except Exception as e:
+            print(f"Reset token sweep failed: {e}")
+        await asyncio.sleep(interval)
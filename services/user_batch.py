@@ -0,0 +1,101 @@
+"""Set-based admin mutations over many users.
+
+Each chunk is two statements in its own transaction, whatever its size:
+a SELECT that resolves the requested emails/ids (or the next keyset slice
+of a filter) to rows, and one DELETE/UPDATE ... WHERE id IN (...) RETURNING.
+Deactivation also revokes the users' login sessions in the same
+transaction.
+Cached principals of the affected users are dropped after every commit.
+"""
+from sqlalchemy import delete, func, or_, select, update
+from config import ADMIN_BATCH_CHUNK_SIZE
+from models.user_model import User
+from security_utilities.principal_cache import invalidate_principal
+from security_utilities.revocation import revocation_index
+from services.user_directory import apply_filters
+
+
+def _chunks(items, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _unique(keys):
+    return list(dict.fromkeys(keys))
+
+
+async def _resolve(db, target, chunk_size: int):
+    """Yield lists of (key, row or None) covering the target, one chunk at a time."""
+    if target.emails is not None:
+        for chunk in _chunks(_unique(e.strip().lower() for e in target.emails), chunk_size):
+            result = await db.execute(select(User.id, User.email).where(func.lower(User.email).in_(chunk)))
+            found = {row.email.lower(): row for row in result}
+            yield [(key, found.get(key)) for key in chunk]
+    elif target.ids is not None:
+        for chunk in _chunks(_unique(target.ids), chunk_size):
+            result = await db.execute(select(User.id, User.email).where(User.id.in_(chunk)))
+            found = {row.id: row for row in result}
+            yield [(str(key), found.get(key)) for key in chunk]
+    else:
+        #Keyset over id, so rows the mutation moves out of the filter do not shift later chunks
+        last_id = 0
+        while True:
+            query = apply_filters(select(User.id, User.email), **target.filter.model_dump())
+            result = await db.execute(query.where(User.id > last_id).order_by(User.id).limit(chunk_size))
+            rows = result.all()
+            if not rows:
+                return
+            last_id = rows[-1].id
+            yield [(row.email, row) for row in rows]
+
+
+async def _run(db, target, actor_id: int, statement_for, applied_outcome: str, chunk_size: int, on_changed=None):
+    results, matched, affected = [], 0, 0
+    async for chunk in _resolve(db, target, chunk_size):
+        ids = [row.id for _, row in chunk if row is not None and row.id != actor_id]
+        changed = set()
+        if ids:
+            statement = statement_for(ids).returning(User.id).execution_options(synchronize_session=False)
+            changed = {row.id for row in await db.execute(statement)}
+            if changed and on_changed is not None:
+                await on_changed(db, changed)
+        await db.commit()
+
+        for key, row in chunk:
+            if row is None:
+                results.append({"key": key, "id": None, "outcome": "not_found"})
+                continue
+            matched += 1
+            if row.id == actor_id:
+                #Admins cannot delete, deactivate or demote themselves
+                outcome = "skipped"
+            elif row.id in changed:
+                outcome = applied_outcome
+                affected += 1
+                invalidate_principal(row.email)
+            else:
+                outcome = "unchanged"
+            results.append({"key": key, "id": row.id, "outcome": outcome})
+    return {"matched": matched, "affected": affected, "results": results}
+
+
+async def batch_delete(db, target, actor_id: int, chunk_size: int = ADMIN_BATCH_CHUNK_SIZE):
+    return await _run(db, target, actor_id, lambda ids: delete(User).where(User.id.in_(ids)),
+                      "deleted", chunk_size)
+
+
+async def batch_update(db, target, actor_id: int, chunk_size: int = ADMIN_BATCH_CHUNK_SIZE):
+    changes, differs = {}, []
+    if target.is_active is not None:
+        changes["is_active"] = target.is_active
+        differs.append(User.is_active.is_distinct_from(target.is_active))
+    if target.role is not None:
+        changes["role"] = target.role
+        differs.append(User.role != target.role)
+    #Deactivated users lose their sessions in the same transaction, on every worker, not just their cached principal
+    on_changed = revocation_index.revoke_user_sessions if target.is_active is False else None
+    #Rows that already hold the new values are reported as unchanged, not rewritten
+    return await _run(db, target, actor_id,
+                      lambda ids: update(User).where(User.id.in_(ids), or_(*differs))
+                      .values(**changes, row_version=User.row_version + 1),
+                      "updated", chunk_size, on_changed=on_changed)
@@ -0,0 +1,139 @@
+"""Keyset pagination for the admin user directory.
+
+OFFSET makes the database walk and throw away every earlier row, so page N
+costs O(N). Here each page resumes from the last (sort key, id) it returned.
+The opaque cursor carries that position, and each query is a single range
+scan on one of the ix_users_*_id / *_time_registered indexes.
+"""
+import base64
+import binascii
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import func, select, text, tuple_
+from config import ADMIN_COUNT_CACHE_SECONDS
+from models.user_model import User
+
+SORT_KEYS = ("id", "time_registered")
+
+#What UserResponse needs plus row_version for the page ETag; the password hash never leaves the database
+LISTING_COLUMNS = (
+    User.id, User.email, User.role, User.is_active, User.time_registered, User.email_verified, User.row_version,
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+##Cursor
+def encode_cursor(sort: str, descending: bool, row) -> str:
+    if sort == "time_registered":
+        key = [row.time_registered.isoformat() if row.time_registered else None, row.id]
+    else:
+        key = [row.id]
+    raw = json.dumps({"s": sort, "d": descending, "k": key}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, sort: str, descending: bool) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        key = data["k"]
+        if data["s"] != sort or data["d"] != descending:
+            raise InvalidCursor("Cursor was issued for a different sort order")
+        if sort == "time_registered":
+            return [datetime.fromisoformat(key[0]), int(key[1])]
+        return [int(key[0])]
+    except InvalidCursor:
+        raise
+    except (binascii.Error, ValueError, KeyError, IndexError, TypeError) as e:
+        raise InvalidCursor("Malformed cursor") from e
+
+
+##Query
+def apply_filters(query, role=None, verified=None, is_active=None, registered_after=None, registered_before=None):
+    if role is not None:
+        query = query.where(User.role == role)
+    if verified is not None:
+        query = query.where(User.email_verified == verified)
+    if is_active is not None:
+        query = query.where(User.is_active == is_active)
+    if registered_after is not None:
+        query = query.where(User.time_registered >= registered_after)
+    if registered_before is not None:
+        query = query.where(User.time_registered < registered_before)
+    return query
+
+
+def build_page_query(limit: int, sort: str = "id", descending: bool = False, cursor: str = None, **filters):
+    """Select `limit + 1` rows after `cursor`; the extra row only signals that a next page exists."""
+    keys = [User.time_registered, User.id] if sort == "time_registered" else [User.id]
+    query = apply_filters(select(*LISTING_COLUMNS), **filters)
+    if cursor:
+        position = decode_cursor(cursor, sort, descending)
+        current = tuple_(*keys) if len(keys) > 1 else keys[0]
+        after = tuple_(*position) if len(keys) > 1 else position[0]
+        query = query.where(current < after if descending else current > after)
+    order = [k.desc() for k in keys] if descending else keys
+    return query.order_by(*order).limit(limit + 1)
+
+
+async def fetch_page(db, limit: int, sort: str = "id", descending: bool = False, cursor: str = None, **filters):
+    result = await db.execute(build_page_query(limit, sort, descending, cursor, **filters))
+    rows = result.all()
+    next_cursor = encode_cursor(sort, descending, rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+##Approximate total
+#Filtered counts are exact but computed at most once per ADMIN_COUNT_CACHE_SECONDS per filter set
+_count_cache = OrderedDict()
+_COUNT_CACHE_SIZE = 256
+
+
+async def _estimated_table_rows(db) -> int:
+    """Row estimate from planner statistics, without scanning the table."""
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        estimate = (await db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:t AS regclass)"),
+            {"t": User.__tablename__},
+        )).scalar()
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+    elif dialect == "sqlite":
+        has_stats = (await db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+        )).scalar()
+        if has_stats:
+            stat = (await db.execute(
+                text("SELECT stat FROM sqlite_stat1 WHERE tbl = :t LIMIT 1"), {"t": User.__tablename__}
+            )).scalar()
+            if stat:
+                return int(stat.split()[0])
+    #No statistics yet: the id span is two index probes and close enough for a directory total
+    low, high = (await db.execute(
+        select(select(func.min(User.id)).scalar_subquery(), select(func.max(User.id)).scalar_subquery())
+    )).one()
+    return 0 if high is None else high - low + 1
+
+
+async def approximate_total(db, **filters) -> int:
+    if not any(v is not None for v in filters.values()):
+        return await _estimated_table_rows(db)
+
+    key = tuple(sorted((k, str(v)) for k, v in filters.items() if v is not None))
+    now = time.monotonic()
+    cached = _count_cache.get(key)
+    if cached and cached[0] > now:
+        _count_cache.move_to_end(key)
+        return cached[1]
+    count = (await db.execute(apply_filters(select(func.count()).select_from(User), **filters))).scalar()
+    _count_cache[key] = (now + ADMIN_COUNT_CACHE_SECONDS, count)
+    _count_cache.move_to_end(key)
+    while len(_count_cache) > _COUNT_CACHE_SIZE:
+        _count_cache.popitem(last=False)
+    return count
@@ -0,0 +1,71 @@
+import csv
+import enum
+import io
+import orjson
+from datetime import datetime
+from sqlalchemy import select
+from database.database_setup import ReplicaSessionLocal
+from models.user_model import User
+
+#Columns an export may contain; credentials and reset tokens are never exported
+EXPORT_COLUMNS = {
+    "id": User.id,
+    "full_name": User.full_name,
+    "user_name": User.user_name,
+    "email": User.email,
+    "role": User.role,
+    "is_active": User.is_active,
+    "time_registered": User.time_registered,
+    "email_verified": User.email_verified,
+}
+
+EXPORT_BATCH_SIZE = 1000
+
+
+def _plain(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def build_export_query(columns: list[str], role=None, verified=None, is_active=None):
+    query = select(*(EXPORT_COLUMNS[name] for name in columns)).order_by(User.id)
+    if role is not None:
+        query = query.where(User.role == role)
+    if verified is not None:
+        query = query.where(User.email_verified == verified)
+    if is_active is not None:
+        query = query.where(User.is_active == is_active)
+    return query
+
+
+async def stream_rows(query):
+    """Yield lists of plain tuples straight from a server-side cursor, one batch at a time.
+
+    Opens its own session: the response body is produced after the request's
+    dependencies may already have been torn down.
+    """
+    async with ReplicaSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for batch in result.partitions(EXPORT_BATCH_SIZE):
+            yield [tuple(_plain(v) for v in row) for row in batch]
+
+
+async def export_ndjson(query, columns: list[str]):
+    async for batch in stream_rows(query):
+        yield b"".join(orjson.dumps(dict(zip(columns, row))) + b"\n" for row in batch)
+
+
+async def export_csv(query, columns: list[str]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for batch in stream_rows(query):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
@@ -0,0 +1,93 @@
+"""Purge of registrations that never verified their email.
+
+Rows are deleted in primary-key ranges of `chunk_size` ids, one short
+transaction each, with `pause_ms` between chunks. A range bounds the rows
+each DELETE visits no matter how the candidates are spread, so SQLite's
+write lock is held for one chunk at a time and queued sign-ups, logins and
+token writes get in between. Admins are never purged.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, func, select
+from database.database_setup import async_engine
+from models.user_model import User, UserRole
+from services.metrics import purge_chunk_lock_seconds, unverified_users_purged_total
+
+
+@dataclass
+class ChunkReport:
+    first_id: int
+    last_id: int
+    removed: int
+    lock_ms: float
+
+
+@dataclass
+class PurgeReport:
+    cutoff: datetime
+    chunks: list = field(default_factory=list)
+
+    @property
+    def removed(self) -> int:
+        return sum(chunk.removed for chunk in self.chunks)
+
+    @property
+    def max_lock_ms(self) -> float:
+        return max((chunk.lock_ms for chunk in self.chunks), default=0.0)
+
+
+def _stale(cutoff: datetime):
+    return and_(User.email_verified.is_(False), User.time_registered < cutoff, User.role != UserRole.ADMIN)
+
+
+async def purge_bounds(cutoff: datetime, engine=async_engine):
+    """(lowest id, highest id, count) of the purgeable rows; (None, None, 0) when there are none."""
+    async with engine.connect() as conn:
+        return (await conn.execute(
+            select(func.min(User.id), func.max(User.id), func.count()).where(_stale(cutoff))
+        )).one()
+
+
+async def purge_unverified(max_age_hours: float, chunk_size: int, pause_ms: float = 0, engine=async_engine,
+                           on_chunk=None) -> PurgeReport:
+    """Delete unverified accounts registered more than `max_age_hours` ago.
+
+    `on_chunk(ChunkReport)` is called after each committed chunk.
+    """
+    report = PurgeReport(cutoff=datetime.utcnow() - timedelta(hours=max_age_hours))
+    low, high, _ = await purge_bounds(report.cutoff, engine)
+    if low is None:
+        return report
+
+    for first_id in range(low, high + 1, chunk_size):
+        last_id = min(first_id + chunk_size - 1, high)
+        in_range = and_(User.id.between(first_id, last_id), _stale(report.cutoff))
+        started = time.perf_counter()
+        async with engine.begin() as conn:
+            removed = (await conn.execute(delete(User).where(in_range))).rowcount
+        lock_s = time.perf_counter() - started
+
+        chunk = ChunkReport(first_id, last_id, removed, lock_s * 1000)
+        report.chunks.append(chunk)
+        purge_chunk_lock_seconds.observe(lock_s)
+        unverified_users_purged_total.inc(amount=removed)
+        if on_chunk:
+            on_chunk(chunk)
+        if last_id < high:
+            await asyncio.sleep(pause_ms / 1000)
+    return report
+
+
+async def purge_periodically(interval: float, max_age_hours: float, chunk_size: int, pause_ms: float):
+    while True:
+        #Sleep first: a restart should not start with a burst of deletes
+        await asyncio.sleep(interval)
+        try:
+            report = await purge_unverified(max_age_hours, chunk_size, pause_ms)
+            if report.removed:
+                print(f"Purged {report.removed} unverified users in {len(report.chunks)} chunks "
+                      f"(longest lock {report.max_lock_ms:.1f}ms)")
+        except Exception as e:
+            print(f"Unverified user purge failed: {e}")
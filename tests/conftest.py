@@ -0,0 +1,76 @@
+import os
+import pytest
+from benchmarks.common import bootstrap_env
+
+#Before anything from the app is imported: config is read at import time
+DB_PATH = bootstrap_env(
+    "tests.db", RATE_LIMIT_ENABLED="false", PASSWORD_SCHEME="bcrypt", PASSWORD_HASH_COST=4,
+    METRICS_ENABLED="false", UNVERIFIED_PURGE_ENABLED="false",
+)
+#A replica that never lags, so the read-your-writes middleware is installed
+os.environ["DATABASE_REPLICA_URL"] = f"sqlite:///{DB_PATH}"
+
+ADMIN_EMAIL = "admin@example.com"
+ADMIN_PASSWORD = "AdminPass123"
+
+
+@pytest.fixture(scope="session")
+def app_client():
+    from fastapi.testclient import TestClient
+    import main
+
+    #One client for the session: the async engines' pooled connections belong to its event loop
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def client(app_client):
+    app_client.cookies.clear()
+    yield app_client
+    app_client.cookies.clear()
+
+
+def register_verified(client, name: str, password: str = "password-1"):
+    from security_utilities.email_verification import create_email_token
+
+    email = f"{name}@example.com"
+    response = client.post("/users/register", json={
+        "full_name": name.title(), "user_name": name, "email": email, "password": password,
+    })
+    assert response.status_code == 200, response.text
+    assert client.get("/users/verify", params={"token": create_email_token(email)}).status_code == 200
+    return email
+
+
+def login(client, user_name: str, password: str):
+    return client.post("/users/login", json={"user_name": user_name, "password": password})
+
+
+class CapturingDispatcher:
+    """Stands in for MailDispatcher: keeps the messages instead of sending them."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def send_batch(self, messages):
+        self.messages.extend(messages)
+        return [None] * len(messages)
+
+
+def drain_outbox(client) -> list:
+    """Run the outbox worker over every due row on the app's event loop; returns the messages."""
+    from services.email_outbox import drain_once
+
+    dispatcher = CapturingDispatcher()
+    while client.portal.call(drain_once, dispatcher)["claimed"]:
+        pass
+    return dispatcher.messages
+
+
+def reset_token_for(client, email: str) -> str:
+    import re
+
+    messages = [m for m in drain_outbox(client) if m["To"] == email and "password" in m["Subject"].lower()]
+    assert messages, f"no reset email for {email}"
+    return re.search(r"token=([\w-]+)", messages[-1].get_content()).group(1)
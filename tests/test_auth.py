@@ -0,0 +1,86 @@
+from security_utilities.auth import create_access_token
+from security_utilities.email_verification import create_email_token
+from security_utilities.revocation import new_token_id
+from tests.conftest import ADMIN_EMAIL, ADMIN_PASSWORD, login, register_verified
+
+
+def test_login_session_reaches_profile(client):
+    assert login(client, "admin", ADMIN_PASSWORD).status_code == 200
+    response = client.get("/users/my-profile")
+    assert response.status_code == 200
+    assert response.json()["email"] == ADMIN_EMAIL
+
+
+def test_verification_token_is_not_an_access_token(client):
+    client.cookies.set("access_token", create_email_token(ADMIN_EMAIL))
+    assert client.get("/users/my-profile").status_code == 401
+
+
+def test_access_token_without_session_family_is_rejected(client):
+    client.cookies.set("access_token", create_access_token({"sub": ADMIN_EMAIL, "role": "admin"}))
+    assert client.get("/users/my-profile").status_code == 401
+
+
+def test_deactivation_ends_sessions_and_blocks_login(client):
+    email = register_verified(client, "dave")
+    assert login(client, "dave", "password-1").status_code == 200
+    dave = dict(client.cookies)
+
+    client.cookies.clear()
+    assert login(client, "admin", ADMIN_PASSWORD).status_code == 200
+    response = client.post("/admin/users/batch-update", json={"emails": [email], "is_active": False})
+    assert response.json()["affected"] == 1
+
+    client.cookies.clear()
+    client.cookies.update(dave)
+    response = client.get("/users/my-profile")
+    assert response.status_code == 401 and response.json()["detail"] == "Session revoked!"
+    assert client.post("/users/refresh").status_code == 401
+    client.cookies.clear()
+    assert login(client, "dave", "password-1").status_code == 403
+    #A session the deactivation could not know about still meets the is_active check
+    client.cookies.set("access_token", create_access_token({"sub": email, "fam": new_token_id()}))
+    assert client.get("/users/my-profile").status_code == 403
+
+    client.cookies.clear()
+    assert login(client, "admin", ADMIN_PASSWORD).status_code == 200
+    client.post("/admin/users/batch-update", json={"emails": [email], "is_active": True})
+    client.cookies.clear()
+    assert login(client, "dave", "password-1").status_code == 200
+    assert client.get("/users/my-profile").status_code == 200
+
+
+def _tokens(client) -> dict:
+    return {cookie.name: cookie.value for cookie in client.cookies.jar
+            if cookie.name in ("access_token", "refresh_token")}
+
+
+def _refresh_with(client, cookies):
+    client.cookies.clear()
+    client.cookies.update(cookies)
+    return client.post("/users/refresh")
+
+
+def test_concurrent_refresh_within_grace_keeps_the_session(client):
+    register_verified(client, "twotabs")
+    assert login(client, "twotabs", "password-1").status_code == 200
+    tabs = _tokens(client)
+
+    assert _refresh_with(client, tabs).status_code == 200
+    #The other tab still holds the refresh token the first one just spent
+    assert _refresh_with(client, tabs).status_code == 200
+    assert client.get("/users/my-profile").status_code == 200
+
+
+def test_refresh_replay_after_grace_revokes_the_session(client, monkeypatch):
+    from routes import user_registration
+
+    register_verified(client, "replayed")
+    assert login(client, "replayed", "password-1").status_code == 200
+    stolen = _tokens(client)
+    assert _refresh_with(client, stolen).status_code == 200
+    rotated = _tokens(client)
+
+    monkeypatch.setattr(user_registration, "REFRESH_REUSE_GRACE_SECONDS", -1)
+    assert _refresh_with(client, stolen).status_code == 401
+    assert _refresh_with(client, rotated).status_code == 401
@@ -0,0 +1,25 @@
+import sqlite3
+from sqlalchemy import create_engine
+from database.migrations import LATEST_VERSION, status, upgrade
+
+
+def test_upgrade_keeps_existing_users_verified(tmp_path):
+    path = tmp_path / "old.db"
+    #users as created before email verification, unique password hashes and all
+    with sqlite3.connect(path) as conn:
+        conn.executescript("""
+            CREATE TABLE users (id INTEGER PRIMARY KEY, full_name VARCHAR, user_name VARCHAR UNIQUE,
+                email VARCHAR UNIQUE, password VARCHAR UNIQUE, role VARCHAR, is_active BOOLEAN,
+                time_registered DATETIME);
+            INSERT INTO users VALUES (1, 'Admin', 'admin', 'admin@example.com', 'h', 'ADMIN', 1, '2025-01-01');
+        """)
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        upgrade(engine)
+        assert status(engine) == (LATEST_VERSION, LATEST_VERSION)
+    finally:
+        engine.dispose()
+
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT email_verified FROM users WHERE id = 1").fetchone() == (1,)
+        assert "AUTOINCREMENT" in conn.execute("SELECT sql FROM sqlite_master WHERE name = 'users'").fetchone()[0]
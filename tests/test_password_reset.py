@@ -0,0 +1,41 @@
+import sqlite3
+from tests.conftest import DB_PATH, drain_outbox, login, register_verified, reset_token_for
+
+
+def _reset(client, token: str, password: str):
+    return client.post("/users/reset-password", data={
+        "token": token, "new_password": password, "confirm_password": password,
+    })
+
+
+def test_reset_email_link_changes_password(client):
+    email = register_verified(client, "resetter", "old-password")
+    client.post("/users/forgot-password", data={"email": email})
+    token = reset_token_for(client, email)
+
+    assert _reset(client, token, "new-password").status_code == 200
+    assert login(client, "resetter", "old-password").status_code == 401
+    assert login(client, "resetter", "new-password").status_code == 200
+    #Consumed on use
+    _reset(client, token, "third-password")
+    assert login(client, "resetter", "third-password").status_code == 401
+
+
+def test_outbox_never_stores_the_reset_token(client):
+    email = register_verified(client, "outboxed")
+    client.post("/users/forgot-password", data={"email": email})
+    token = reset_token_for(client, email)
+
+    with sqlite3.connect(DB_PATH) as conn:
+        payloads = [row[0] for row in conn.execute("SELECT payload FROM email_outbox WHERE recipient = ?", (email,))]
+    assert payloads and all(token not in payload for payload in payloads)
+
+
+def test_sent_emails_are_pruned(client):
+    from services.email_outbox import prune_sent
+
+    register_verified(client, "pruned")
+    assert drain_outbox(client)
+    assert client.portal.call(prune_sent, 0) > 0
+    with sqlite3.connect(DB_PATH) as conn:
+        assert conn.execute("SELECT count(*) FROM email_outbox WHERE status = 'sent'").fetchone()[0] == 0
@@ -0,0 +1,60 @@
+import sqlite3
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+import main
+from database.database_setup import READ_PIN_COOKIE, get_read_db
+from tests.conftest import ADMIN_PASSWORD, DB_PATH, login, register_verified
+
+
+def _pin_cookie(response):
+    return next((c for c in response.headers.get_list("set-cookie") if c.startswith(f"{READ_PIN_COOKIE}=")), None)
+
+
+def test_registration_pins_reads_to_the_primary(client):
+    response = client.post("/users/register", json={
+        "full_name": "Pinned", "user_name": "pinned", "email": "pinned@example.com", "password": "password-1",
+    })
+    assert response.status_code == 200
+    cookie = _pin_cookie(response)
+    assert cookie and "SameSite=Lax" in cookie
+
+
+def test_requests_that_only_read_do_not_pin(client):
+    register_verified(client, "unpinned")
+    client.cookies.clear()
+
+    assert _pin_cookie(login(client, "unpinned", "wrong-password")) is None
+    assert _pin_cookie(client.get("/users/verify", params={"token": "not-a-token"})) is None
+    assert _pin_cookie(client.post("/users/forgot-password", data={"email": "nobody@example.com"})) is None
+
+
+def test_principal_is_loaded_from_the_primary(client, tmp_path):
+    email = register_verified(client, "carol")
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute("UPDATE users SET role = 'ADMIN' WHERE email = ?", (email,))
+    assert login(client, "carol", "password-1").status_code == 200
+    carol = dict(client.cookies)
+
+    #A replica that stopped at carol's promotion
+    stale_path = tmp_path / "stale.db"
+    with sqlite3.connect(DB_PATH) as source, sqlite3.connect(stale_path) as target:
+        source.backup(target)
+    stale = create_async_engine(f"sqlite+aiosqlite:///{stale_path}")
+
+    async def stale_read_db():
+        async with async_sessionmaker(stale)() as db:
+            yield db
+
+    main.app.dependency_overrides[get_read_db] = stale_read_db
+    try:
+        client.cookies.clear()
+        assert login(client, "admin", ADMIN_PASSWORD).status_code == 200
+        response = client.post("/admin/users/batch-update", json={"emails": [email], "role": "user"})
+        assert response.json()["affected"] == 1
+
+        client.cookies.clear()
+        client.cookies.update(carol)
+        assert client.get("/admin/users").status_code == 403
+        assert client.get("/users/my-profile").json()["role"] == "user"
+    finally:
+        main.app.dependency_overrides.pop(get_read_db, None)
+        client.portal.call(stale.dispose)
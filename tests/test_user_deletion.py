@@ -0,0 +1,40 @@
+import sqlite3
+import pytest
+from tests.conftest import ADMIN_PASSWORD, DB_PATH, login, register_verified, reset_token_for
+from tests.test_password_reset import _reset
+
+
+def _user_id(email: str) -> int:
+    with sqlite3.connect(DB_PATH) as conn:
+        return conn.execute("SELECT id FROM users WHERE email = ?", (email,)).fetchone()[0]
+
+
+def _delete_as_admin(client, email: str, batch: bool):
+    assert login(client, "admin", ADMIN_PASSWORD).status_code == 200
+    if batch:
+        response = client.post("/admin/users/batch-delete", json={"emails": [email]})
+        assert response.json()["affected"] == 1
+    else:
+        assert client.delete(f"/admin/users/{email}").status_code == 200
+    client.cookies.clear()
+
+
+@pytest.mark.parametrize("batch", [False, True], ids=["single", "batch"])
+def test_reset_token_dies_with_its_user(client, batch):
+    suffix = "batch" if batch else "single"
+    old = register_verified(client, f"departed{suffix}")
+    client.post("/users/forgot-password", data={"email": old})
+    token = reset_token_for(client, old)
+    old_id = _user_id(old)
+
+    _delete_as_admin(client, old, batch)
+    with sqlite3.connect(DB_PATH) as conn:
+        assert conn.execute("SELECT count(*) FROM password_reset_tokens WHERE user_id = ?", (old_id,)).fetchone()[0] == 0
+
+    #AUTOINCREMENT: not even the highest id is handed out again
+    new = register_verified(client, f"newcomer{suffix}", "newcomer-password")
+    assert _user_id(new) != old_id
+
+    _reset(client, token, "attacker-password")
+    assert login(client, f"newcomer{suffix}", "attacker-password").status_code == 401
+    assert login(client, f"newcomer{suffix}", "newcomer-password").status_code == 200